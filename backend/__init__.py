@@ -3,6 +3,10 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_cors import CORS
 import os
+from .workers import engine_options
+from .replicas import RoutingSession, replica_binds, init_replica_routing
+from .logs import init_logging
+from .sqlite_profile import sqlite_engine_options, init_sqlite
 
 # Ensure instance folder exists
 instance_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance')
@@ -10,17 +14,31 @@ os.makedirs(instance_path, exist_ok=True)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(instance_path, 'app.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(instance_path, 'app.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Connection pool sized for the gunicorn worker mode (WORKER_MODE=sync|gthread|gevent)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+# SQLite (development and single-box installs): WAL, busy timeout and cache pragmas per connection
+app.config['SQLALCHEMY_ENGINE_OPTIONS'].update(sqlite_engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+# Optional read replicas (DATABASE_REPLICA_URLS) for lists, exports and reports
+app.config['SQLALCHEMY_BINDS'] = replica_binds()
 
 CORS(app, supports_credentials=True)
-db = SQLAlchemy(app)
+# JSON logs written by a background thread; registered first so request latency covers every hook
+init_logging(app)
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+init_replica_routing(db)
+init_sqlite(app, db)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
-from . import models, routes
+from . import models, routes, partitioning, lookup, audit, idempotency, payouts, reconciliation, profiling
+audit.init_audit(db.session)
+idempotency.init_idempotency(db.session)
 
 def create_app():
     with app.app_context():
         db.create_all()
+        partitioning.ensure_partitions()
+        lookup.ensure_lookup_indexes()
     return app
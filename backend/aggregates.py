@@ -0,0 +1,166 @@
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import islice
+from sqlalchemy import func, cast, select, BigInteger
+from . import db
+from .money import from_paise, money_json, to_paise
+from .partitioning import read_source
+
+try:
+    import numpy as np
+except ImportError:  # without NumPy in-process summaries fall back to Python ints
+    np = None
+
+# Money aggregates. Every sum is taken over integer paise, in SQL where possible
+# (one GROUP BY round trip) and otherwise over batched int64 arrays, so totals are
+# exact no matter how many rows go in.
+
+def paise(column):
+    """SQL expression for a money column in integer paise."""
+    return cast(func.round(column * 100), BigInteger)
+
+def month_of(date_column):
+    """SQL expression for the YYYY-MM part of a date string column."""
+    return func.substr(date_column, 1, 7)
+
+# Report columns are built against read_source(), which covers archived years too
+REPORTS = {
+    'collections': {
+        'access': 'COLLECTIONS',
+        'table': 'collection',
+        'amount': lambda src: paise(src.c.amount),
+        'groups': {
+            'center': lambda src: src.c.center_id,
+            'month': lambda src: month_of(src.c.date),
+            'date': lambda src: src.c.date,
+        },
+    },
+    'sales': {
+        'access': 'SALES',
+        'table': 'sale',
+        'amount': lambda src: src.c.quantity * paise(src.c.price),
+        'groups': {
+            'customer': lambda src: src.c.customer_id,
+            'month': lambda src: month_of(src.c.date),
+            'item': lambda src: src.c.item,
+        },
+    },
+}
+
+def _average(total_paise, count):
+    if not count:
+        return Decimal('0.00')
+    return (Decimal(int(total_paise)) / count / 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+def _summary_row(key, count, total_paise, min_paise=None, max_paise=None):
+    row = {
+        'key': key,
+        'count': int(count),
+        'total': money_json(from_paise(total_paise or 0)),
+        'average': money_json(_average(total_paise or 0, count)),
+    }
+    if min_paise is not None:
+        row['min'] = money_json(from_paise(min_paise))
+        row['max'] = money_json(from_paise(max_paise))
+    return row
+
+def _filtered(query, src, date_from=None, date_to=None):
+    if date_from:
+        query = query.where(src.c.date >= date_from)
+    if date_to:
+        query = query.where(src.c.date <= date_to)
+    return query
+
+def sql_summary(report, group_by=None, date_from=None, date_to=None):
+    """Count, total, average, min and max for a report, grouped in SQL.
+
+    group_by is one of the keys in REPORTS[report]['groups'] or None for a
+    single grand-total row. Dates are inclusive YYYY-MM-DD strings.
+    """
+    spec = REPORTS[report]
+    src = read_source(spec['table'])
+    amount = spec['amount'](src)
+    aggregates = [func.count(), func.coalesce(func.sum(amount), 0), func.min(amount), func.max(amount)]
+    if group_by:
+        key = spec['groups'][group_by](src)
+        query = select(key, *aggregates).group_by(key).order_by(key)
+    else:
+        query = select(*aggregates)
+    query = _filtered(query.select_from(src), src, date_from, date_to)
+    if not group_by:
+        count, total, low, high = db.session.execute(query).one()
+        return [_summary_row(None, count, total, low, high)] if count else []
+    return [_summary_row(*row) for row in db.session.execute(query).all()]
+
+class PaiseAccumulator:
+    """Per-group count and total over (key, paise) pairs, fed in batches.
+
+    Keys are mapped to dense integer codes once; each batch is then added with a
+    single vectorized int64 scatter-add instead of a Python float loop.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.keys = []
+        self.totals = np.zeros(0, dtype=np.int64) if np is not None else []
+        self.counts = np.zeros(0, dtype=np.int64) if np is not None else []
+
+    def _code(self, key):
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.keys)
+            self.keys.append(key)
+        return code
+
+    def add_batch(self, keys, amounts_paise):
+        codes = [self._code(k) for k in keys]
+        if np is None:
+            grow = len(self.keys) - len(self.totals)
+            self.totals.extend([0] * grow)
+            self.counts.extend([0] * grow)
+            for code, amount in zip(codes, amounts_paise):
+                self.totals[code] += int(amount)
+                self.counts[code] += 1
+            return
+        if len(self.keys) > len(self.totals):
+            grow = len(self.keys) - len(self.totals)
+            self.totals = np.concatenate([self.totals, np.zeros(grow, dtype=np.int64)])
+            self.counts = np.concatenate([self.counts, np.zeros(grow, dtype=np.int64)])
+        code_array = np.fromiter(codes, dtype=np.int64, count=len(codes))
+        np.add.at(self.totals, code_array, np.asarray(amounts_paise, dtype=np.int64))
+        self.counts += np.bincount(code_array, minlength=len(self.keys))
+
+    def rows(self):
+        """Summary rows sorted by key, in the same shape as sql_summary()."""
+        order = sorted(range(len(self.keys)), key=lambda i: (self.keys[i] is None, self.keys[i]))
+        return [_summary_row(self.keys[i], int(self.counts[i]), int(self.totals[i])) for i in order]
+
+def array_summary(report, group_by=None, date_from=None, date_to=None, batch_size=10000):
+    """Same figures as sql_summary() (without min/max), computed in-process.
+
+    Rows are streamed from the database batch_size at a time, so memory stays
+    bounded; use this when the grouping has to happen in Python.
+    """
+    spec = REPORTS[report]
+    src = read_source(spec['table'])
+    key = spec['groups'][group_by](src) if group_by else db.literal(None)
+    query = _filtered(select(key, spec['amount'](src)).select_from(src), src, date_from, date_to)
+    rows = db.session.execute(query.execution_options(yield_per=batch_size))
+    return summarize_pairs(rows, batch_size)
+
+def summarize_pairs(pairs, batch_size=10000):
+    """Accumulate an iterable of (key, paise) pairs batch by batch."""
+    accumulator = PaiseAccumulator()
+    iterator = iter(pairs)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            break
+        keys, amounts = zip(*batch)
+        accumulator.add_batch(keys, [int(a or 0) for a in amounts])
+    return accumulator.rows()
+
+def total_paise(values):
+    """Exact sum of money values (Decimal, float or str) in paise."""
+    if np is not None:
+        return int(np.fromiter((to_paise(v) for v in values), dtype=np.int64).sum())
+    return sum(to_paise(v) for v in values)
@@ -5,9 +5,11 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from flask_cors import CORS
 import os
 from datetime import datetime, timedelta
+from static_assets import AssetManifest
+from health import HealthProbe
 
-# Initialize Flask app
-app = Flask(__name__)
+# Initialize Flask app (no Flask static folder: /static/ belongs to the React build)
+app = Flask(__name__, static_folder=None)
 
 # Load configuration
 config_name = os.environ.get('FLASK_ENV', 'production')
@@ -30,6 +32,11 @@ login_manager.login_view = 'login'
 # Enable CORS
 CORS(app, origins=['https://littlesonagrofoods.com', 'https://www.littlesonagrofoods.com'])
 
+# Manifest of the React build (STATIC_ROOT, default /var/www/html), built once at startup
+static_assets = AssetManifest()
+# Readiness probe (backend/health.py) on its own thread; /api/health only reads its last result
+health_probe = HealthProbe(app, db)
+
 # Define models directly in app.py for now
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -45,7 +52,7 @@ class Center(db.Model):
 
 class Collection(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.Numeric(14, 2), nullable=False)
     date = db.Column(db.String(50), nullable=False)
     center_id = db.Column(db.Integer, db.ForeignKey('center.id'))
 
@@ -53,13 +60,13 @@ class Sale(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     item = db.Column(db.String(150), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Numeric(14, 2), nullable=False)
     date = db.Column(db.String(50), nullable=False)
 
 class Account(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
-    balance = db.Column(db.Float, nullable=False, default=0.0)
+    balance = db.Column(db.Numeric(14, 2), nullable=False, default=0)
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -68,9 +75,9 @@ def load_user(user_id):
 # Routes
 @app.route('/')
 def index():
-    try:
-        return send_from_directory('/var/www/html', 'index.html')
-    except:
+    if static_assets.has_shell:
+        return static_assets.serve_shell()
+    else:
         return render_template_string("""
         <!DOCTYPE html>
         <html>
@@ -114,33 +121,26 @@ def index():
 
 @app.route('/<path:path>')
 def static_files(path):
-    try:
-        return send_from_directory('/var/www/html', path)
-    except:
+    # Unknown API paths must not fall through to the SPA shell
+    if path.startswith('api/'):
+        return jsonify({'error': 'Not found'}), 404
+    if not static_assets.has_shell:
         return index()
+    return static_assets.serve(path)
 
 # API Routes
+# Health checks, as in routes.py: liveness never touches the database; readiness
+# (and the legacy /api/health) is the cached result of the background probe
+@app.route('/api/health/live')
+def health_live():
+    return jsonify({'status': 'ok'}), 200
+
 @app.route('/api/health')
+@app.route('/api/health/ready')
 def health_check():
-    try:
-        # Test database connection
-        from sqlalchemy import text
-        with db.engine.connect() as connection:
-            connection.execute(text('SELECT 1'))
-        db_status = "Connected"
-        db_tables = db.engine.table_names() if hasattr(db.engine, 'table_names') else []
-    except Exception as e:
-        db_status = f"Error: {str(e)}"
-        db_tables = []
-    
-    return jsonify({
-        'status': 'OK',
-        'timestamp': datetime.now().isoformat(),
-        'database': db_status,
-        'tables': len(db_tables),
-        'version': '1.0.0',
-        'environment': config_name
-    })
+    ready, report = health_probe.readiness()
+    report['environment'] = config_name
+    return jsonify(report), 200 if ready else 503
 
 # OTP-based login endpoints (to match frontend expectations)
 @app.route('/api/login/request_otp', methods=['POST'])
@@ -263,9 +263,9 @@ def load_user(user_id):
 # Routes
 @app.route('/')
 def index():
-    try:
-        return send_from_directory('/var/www/html', 'index.html')
-    except:
+    if static_assets.has_shell:
+        return static_assets.serve_shell()
+    else:
         return render_template_string("""
         <!DOCTYPE html>
         <html>
@@ -299,29 +299,18 @@ def index():
 
 @app.route('/<path:path>')
 def static_files(path):
-    try:
-        return send_from_directory('/var/www/html', path)
-    except:
+    # Unknown API paths must not fall through to the SPA shell
+    if path.startswith('api/'):
+        return jsonify({'error': 'Not found'}), 404
+    if not static_assets.has_shell:
         return index()
+    return static_assets.serve(path)
 
 # API Routes
 @app.route('/api/health')
 def health_check():
-    try:
-        # Test database connection
-        from sqlalchemy import text
-        with db.engine.connect() as connection:
-            connection.execute(text('SELECT 1'))
-        db_status = "Connected"
-    except Exception as e:
-        db_status = f"Error: {str(e)}"
-    
-    return jsonify({
-        'status': 'OK',
-        'timestamp': datetime.now().isoformat(),
-        'database': db_status,
-        'version': '1.0.0'
-    })
+    ready, report = health_probe.readiness()
+    return jsonify(report), 200 if ready else 503
 
 @app.route('/api/login', methods=['POST'])
 def api_login():
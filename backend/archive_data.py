@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Script to manage the time-based layout of the Collection and Sale tables.
+
+    python backend/archive_data.py partition        # PostgreSQL: convert to monthly partitions (one-off)
+    python backend/archive_data.py ensure           # create upcoming monthly partitions (run from cron)
+    python backend/archive_data.py archive [KEEP]   # archive financial years older than the last KEEP (default 1)
+    python backend/archive_data.py status           # list archived shards
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__) + '/..'))
+from backend import create_app
+from backend.partitioning import (PARTITIONED_TABLES, convert_to_partitioned, ensure_partitions,
+                                  archive_closed_years, archive_status, is_postgres)
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    app = create_app()
+    with app.app_context():
+        if command == 'partition':
+            if not is_postgres():
+                print("ℹ️  Partitioning needs PostgreSQL; SQLite uses archive shards instead.")
+                return
+            for table in PARTITIONED_TABLES:
+                converted = convert_to_partitioned(table)
+                print(f"{'✅ Converted' if converted else 'ℹ️  Already partitioned:'} {table}")
+        elif command == 'ensure':
+            ensure_partitions()
+            print("✅ Monthly partitions are in place.")
+        elif command == 'archive':
+            keep = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+            results = archive_closed_years(keep_years=keep)
+            if not results:
+                print("ℹ️  No closed financial years to archive.")
+            for table, fy, moved in results:
+                print(f"📦 {table} FY {fy}-{str(fy + 1)[-2:]}: {moved} row(s) archived")
+        elif command == 'status':
+            for shard in archive_status():
+                print(f"{shard['shard_table']}: {shard['row_count']} row(s), "
+                      f"{shard['date_from']} to {shard['date_to']}, archived {shard['archived_at']}")
+        else:
+            print(__doc__)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
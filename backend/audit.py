@@ -0,0 +1,296 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from flask import g, has_request_context
+from sqlalchemy import event, inspect, insert
+from . import app, db
+from .models import User, Center, Collection, Sale, Account, CenterAccountDetails, Customer
+
+log = logging.getLogger(__name__)
+
+# Audit trail of every create/update/delete on the business tables.
+#
+# A session after_flush hook diffs each changed row while its attribute history
+# is still available and parks the entries on the session. When the transaction
+# commits, they are handed to a per-process AuditWriter that inserts them in
+# batches from a background thread, so a save never waits on the audit insert.
+# Rolled-back transactions are never audited. If the bounded queue is full, the
+# request writes its own entries synchronously instead of dropping them.
+
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 200))
+AUDIT_FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', 1.0))
+AUDIT_WRITE_RETRIES = 3
+
+# Audited model -> entity name (the same names as the /api/<entity> endpoints)
+AUDITED_MODELS = {
+    Center: 'centers',
+    Collection: 'collections',
+    Sale: 'sales',
+    Customer: 'customers',
+    User: 'employees',
+    Account: 'accounts',
+    CenterAccountDetails: 'center_account_details',
+}
+REDACTED_FIELDS = {'password'}
+_PENDING = 'audit_pending'
+
+class AuditLog(db.Model):
+    __tablename__ = 'audit_log'
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)
+    entity_key = db.Column(db.String(255), nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # insert, update, delete
+    user_id = db.Column(db.Integer, nullable=True)
+    username = db.Column(db.String(80), nullable=True)
+    changes = db.Column(db.Text, nullable=False)  # JSON {field: [before, after]}
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_audit_log_entity_key_created', 'entity', 'entity_key', 'created_at'),
+        db.Index('ix_audit_log_user_created', 'user_id', 'created_at'),
+        db.Index('ix_audit_log_created', 'created_at'),
+    )
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _field_value(key, value):
+    return '***' if key in REDACTED_FIELDS and value is not None else _json_value(value)
+
+def _entity_key(state):
+    key = state.mapper.primary_key_from_instance(state.obj())
+    return '/'.join('' if part is None else str(part) for part in key)
+
+def _diff(state, action):
+    """{field: [before, after]} for the column attributes of one flushed row."""
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        if action == 'insert':
+            before, after = None, state.attrs[attr.key].value
+        elif action == 'delete':
+            history = state.attrs[attr.key].history
+            before = history.deleted[0] if history.deleted else state.attrs[attr.key].value
+            after = None
+        else:
+            history = state.attrs[attr.key].history
+            if not history.has_changes():
+                continue
+            before = history.deleted[0] if history.deleted else None
+            after = history.added[0] if history.added else None
+        if before == after or (action != 'update' and before is None and after is None):
+            continue
+        changes[attr.key] = [_field_value(attr.key, before), _field_value(attr.key, after)]
+    return changes
+
+def _actor(session):
+    # Background jobs (imports.py) act for a user outside any request
+    if 'audit_actor' in session.info:
+        return session.info['audit_actor']
+    # flask_login keeps the loaded user on g; reading it here never triggers a query
+    user = g.get('_login_user') if has_request_context() else None
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return None, None
+    return user.id, user.username
+
+def _capture(session, flush_context):
+    user_id, username = _actor(session)
+    now = datetime.utcnow()
+    transaction = session.get_nested_transaction() or session.get_transaction()
+    pending = session.info.setdefault(_PENDING, [])
+    for action, objects in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objects:
+            entity = AUDITED_MODELS.get(type(obj))
+            if entity is None:
+                continue
+            state = inspect(obj)
+            changes = _diff(state, action)
+            if action == 'update' and not changes:
+                continue
+            pending.append({
+                'entity': entity,
+                'entity_key': _entity_key(state),
+                'action': action,
+                'user_id': user_id,
+                'username': username,
+                'changes': json.dumps(changes, default=str),
+                'created_at': now,
+                '_transaction': transaction,
+            })
+
+def record_bulk_update(session, entity, rows):
+    """Audit Core bulk UPDATEs, which skip the flush hook; rows are (entity_key, changes).
+
+    The entries follow the session's transaction like captured ones: written on
+    commit, dropped on rollback.
+    """
+    user_id, username = _actor(session)
+    now = datetime.utcnow()
+    transaction = session.get_nested_transaction() or session.get_transaction()
+    session.info.setdefault(_PENDING, []).extend({
+        'entity': entity,
+        'entity_key': entity_key,
+        'action': 'update',
+        'user_id': user_id,
+        'username': username,
+        'changes': json.dumps(changes, default=str),
+        'created_at': now,
+        '_transaction': transaction,
+    } for entity_key, changes in rows)
+
+def _committed(session):
+    entries = session.info.pop(_PENDING, None)
+    if entries:
+        for entry in entries:
+            entry.pop('_transaction', None)
+        audit_writer.submit(entries)
+
+def _transaction_ended(session, transaction):
+    # after_rollback also fires for a rolled-back SAVEPOINT, so entries are only
+    # dropped when the root transaction ends; a commit has taken them already
+    if transaction.parent is None:
+        session.info.pop(_PENDING, None)
+
+def _savepoint_rolled_back(session, previous_transaction):
+    # Changes flushed inside a rolled-back SAVEPOINT never happened
+    if previous_transaction.nested and _PENDING in session.info:
+        session.info[_PENDING] = [e for e in session.info[_PENDING]
+                                  if e['_transaction'] is not previous_transaction]
+
+class AuditWriter:
+    """Background batch inserter for audit entries, one per worker process."""
+
+    def __init__(self, maxsize=AUDIT_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._pid = None
+        self.stats = {'queued': 0, 'written': 0, 'batches': 0, 'sync_writes': 0, 'failed': 0}
+
+    def _count(self, stat, n=1):
+        with self._lock:
+            self.stats[stat] += n
+
+    def _ensure_thread(self):
+        # Started lazily so each gunicorn worker (after fork) gets its own thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name='vks-audit-writer', daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit(self, entries):
+        self._ensure_thread()
+        for entry in entries:
+            try:
+                self.queue.put_nowait(entry)
+                self._count('queued')
+            except queue.Full:
+                # Back-pressure instead of losing audit history
+                self._write([entry])
+                self._count('sync_writes')
+
+    def _write(self, batch):
+        for attempt in range(AUDIT_WRITE_RETRIES):
+            try:
+                with app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(insert(AuditLog), batch)
+                self._count('written', len(batch))
+                self._count('batches')
+                return True
+            except Exception as e:
+                log.warning('Audit write error (attempt %d): %s', attempt + 1, e)
+                time.sleep(0.5 * (attempt + 1))
+        self._count('failed', len(batch))
+        return False
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + AUDIT_FLUSH_SECONDS
+            while len(batch) < AUDIT_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        if self._pid == os.getpid():
+            self.queue.join()
+
+    def stats_dict(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['pending'] = self.queue.qsize()
+        return stats
+
+audit_writer = AuditWriter()
+atexit.register(audit_writer.flush)
+
+def init_audit(session):
+    event.listen(session, 'after_flush', _capture)
+    event.listen(session, 'after_commit', _committed)
+    event.listen(session, 'after_transaction_end', _transaction_ended)
+    event.listen(session, 'after_soft_rollback', _savepoint_rolled_back)
+
+def audit_entry_to_dict(entry):
+    return {
+        'id': entry.id,
+        'entity': entry.entity,
+        'entity_key': entry.entity_key,
+        'action': entry.action,
+        'user_id': entry.user_id,
+        'username': entry.username,
+        'changes': json.loads(entry.changes),
+        'created_at': entry.created_at.isoformat()
+    }
+
+def query_audit_log(entity=None, entity_key=None, user=None, date_from=None, date_to=None, page=1, per_page=50):
+    """One page of audit entries, newest first.
+
+    user is a user id or username. date_from/date_to are inclusive ISO dates or
+    datetimes (a bare date_to covers that whole day).
+    """
+    query = AuditLog.query
+    if entity:
+        query = query.filter(AuditLog.entity == entity)
+        if entity_key:
+            query = query.filter(AuditLog.entity_key == str(entity_key))
+    if user:
+        query = query.filter(AuditLog.user_id == int(user)) if str(user).isdigit() else \
+            query.filter(AuditLog.username == user)
+    if date_from:
+        query = query.filter(AuditLog.created_at >= datetime.fromisoformat(date_from))
+    if date_to:
+        end = datetime.fromisoformat(date_to)
+        if len(date_to) == 10:
+            end = end.replace(hour=23, minute=59, second=59, microsecond=999999)
+        query = query.filter(AuditLog.created_at <= end)
+    entries = (query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
+               .offset((page - 1) * per_page)
+               .limit(per_page + 1)
+               .all())
+    return {
+        'entries': [audit_entry_to_dict(e) for e in entries[:per_page]],
+        'page': page,
+        'per_page': per_page,
+        'has_more': len(entries) > per_page
+    }
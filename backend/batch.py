@@ -0,0 +1,141 @@
+import json
+import logging
+import re
+from decimal import Decimal, InvalidOperation
+from urllib.parse import unquote
+from flask import g, request
+from . import app, db
+from .logs import REQUEST_ID_HEADER
+
+log = logging.getLogger(__name__)
+
+# Batched replay of writes queued offline by the service worker.
+#
+# Each operation is dispatched as an internal sub-request to the regular
+# endpoint, so login, access checks, validation, audit and live events behave
+# exactly as for a direct request. Sub-requests run in their own app context,
+# so they get their own g (request id, idempotency state) and session instead
+# of overwriting the batch request's. The operation id is sent as the
+# Idempotency-Key, so an operation whose original request did reach the server
+# is answered from the stored response instead of being applied twice. For
+# updates, the client's view of the row ('base') is compared with the current
+# row first; if someone changed it meanwhile, the operation is reported as a
+# conflict and not applied. The batch stops at the first operation that has to
+# be retried: later operations may touch the same rows and must not be applied
+# before it.
+
+BATCH_MAX_OPERATIONS = 100
+
+# entity -> schema (schemas.py) for entities that accept offline writes; see routes.py
+BATCH_ENTITIES = {}
+
+_OP_PATH = re.compile(r'^/api/(?P<entity>[a-z_]+)(?:/(?P<key>.+))?$')
+
+def register_batch_entity(entity, schema):
+    BATCH_ENTITIES[entity] = schema
+
+def _result(op_id, status, http_status, message=None, data=None, current=None):
+    result = {'id': op_id, 'status': status, 'http_status': http_status}
+    if message:
+        result['message'] = message
+    if data is not None:
+        result['data'] = data
+    if current is not None:
+        result['current'] = current
+    return result
+
+def _current_row(model, key):
+    columns = list(model.__table__.primary_key.columns)
+    parts = [unquote(p) for p in key.split('/')]
+    if len(parts) != len(columns):
+        return None
+    try:
+        pk = [int(p) if isinstance(c.type, db.Integer) else p for c, p in zip(columns, parts)]
+    except ValueError:
+        return None
+    return db.session.get(model, pk[0] if len(pk) == 1 else tuple(pk))
+
+def _same(a, b):
+    if a is None or b is None:
+        return (a if a is not None else '') == (b if b is not None else '')
+    try:
+        return Decimal(str(a)) == Decimal(str(b))
+    except InvalidOperation:
+        return str(a) == str(b)
+
+def _conflicting_fields(base, current):
+    return [field for field, value in base.items() if field in current and not _same(value, current[field])]
+
+def _dispatch(method, path, body, op_id):
+    headers = {'Content-Type': 'application/json', 'Idempotency-Key': op_id}
+    if request.headers.get('Cookie'):
+        headers['Cookie'] = request.headers['Cookie']
+    if g.get('request_id'):
+        headers[REQUEST_ID_HEADER] = f"{g.request_id}.{op_id}"[:64]
+    # A fresh app context: the sub-request must not share g or the session with the batch request
+    with app.app_context():
+        with app.test_request_context(path, method=method, data=body, headers=headers,
+                                      environ_base={'REMOTE_ADDR': request.remote_addr}):
+            return app.full_dispatch_request()
+
+def _op_id(op):
+    return str(op.get('id') or '')[:100] if isinstance(op, dict) else ''
+
+def run_operation(op):
+    """Apply one queued write. Statuses: applied, duplicate, conflict, rejected, retry."""
+    op_id = _op_id(op)
+    method = str(op.get('method') or '').upper()
+    path = str(op.get('path') or '')
+    body = op.get('body')
+    match = _OP_PATH.match(path)
+    if not op_id or not match or match['entity'] not in BATCH_ENTITIES or not isinstance(body, str):
+        return _result(op_id, 'rejected', 400, 'Unsupported operation.')
+    if (method, bool(match['key'])) not in (('POST', False), ('PUT', True)):
+        return _result(op_id, 'rejected', 400, 'Only creates (POST) and updates (PUT) can be queued.')
+    if method == 'PUT' and isinstance(op.get('base'), dict):
+        schema = BATCH_ENTITIES[match['entity']]
+        row = _current_row(schema.model, match['key'])
+        if row is None:
+            return _result(op_id, 'conflict', 404, 'The row was deleted on the server.')
+        current = schema.dump(row)
+        changed = _conflicting_fields(op['base'], current)
+        if changed:
+            return _result(op_id, 'conflict', 409, f"Changed on the server meanwhile: {', '.join(changed)}.",
+                           current=current)
+    try:
+        response = _dispatch(method, path, body, op_id)
+    except Exception as e:
+        db.session.rollback()
+        log.exception('Batch operation error: %s', e)
+        return _result(op_id, 'retry', 500, 'Server error; try again later.')
+    try:
+        payload = json.loads(response.get_data(as_text=True) or 'null')
+    except ValueError:
+        payload = None
+    message = payload.get('message') if isinstance(payload, dict) else None
+    data = payload.get('data') if isinstance(payload, dict) else None
+    if response.status_code < 300:
+        status = 'duplicate' if response.headers.get('Idempotent-Replayed') else 'applied'
+        return _result(op_id, status, response.status_code, message, data)
+    if response.status_code == 409 and response.headers.get('Retry-After'):
+        return _result(op_id, 'retry', 409, message)
+    if response.status_code >= 500:
+        return _result(op_id, 'retry', response.status_code, message)
+    return _result(op_id, 'rejected', response.status_code, message)
+
+def run_batch(operations):
+    """Apply queued writes in order.
+
+    A conflict or rejection does not stop the others, but a retry does: the
+    operations after it are returned as 'retry' without being attempted.
+    """
+    results = []
+    for index, op in enumerate(operations):
+        result = run_operation(op if isinstance(op, dict) else {})
+        results.append(result)
+        if result['status'] == 'retry':
+            results.extend(_result(_op_id(later), 'retry', None,
+                                   'Not attempted: an earlier operation has to be retried first.')
+                           for later in operations[index + 1:])
+            break
+    return results
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Password-hash cost benchmark.
+
+Times check_password_hash for a range of PBKDF2 iteration counts and scrypt
+work factors on this machine and recommends the strongest setting whose
+verification time stays under the target. Put the result in the
+PASSWORD_HASH_METHOD environment variable; existing users are rehashed with it
+on their next successful login.
+
+Usage:
+    python backend/bench_password_hash.py [--target-ms 250] [--rounds 5]
+"""
+
+import argparse
+import statistics
+import time
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+PBKDF2_ITERATIONS = (100000, 200000, 300000, 400000, 600000, 800000, 1000000, 1500000)
+SCRYPT_N = (8192, 16384, 32768, 65536)
+
+def time_method(method, rounds):
+    """Median milliseconds to verify one password hashed with method."""
+    stored = generate_password_hash('benchmark-password', method=method)
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        check_password_hash(stored, 'benchmark-password')
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def candidates():
+    for iterations in PBKDF2_ITERATIONS:
+        yield 'pbkdf2', iterations, f'pbkdf2:sha256:{iterations}'
+    for n in SCRYPT_N:
+        yield 'scrypt', n, f'scrypt:{n}:8:1'
+
+def main():
+    parser = argparse.ArgumentParser(description='Pick password-hash parameters for a target verification time.')
+    parser.add_argument('--target-ms', type=float, default=250, help='max verification time per login')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    best = {}
+    print("| method | verify ms |")
+    print("|--------|----------:|")
+    for family, cost, method in candidates():
+        try:
+            ms = time_method(method, args.rounds)
+        except (ValueError, MemoryError) as e:
+            print(f"| {method} | unavailable ({e}) |")
+            continue
+        print(f"| {method} | {ms:.0f} |")
+        if ms <= args.target_ms and cost > best.get(family, (0, None))[0]:
+            best[family] = (cost, method)
+
+    print()
+    if not best:
+        print(f"❌ Nothing verifies within {args.target_ms:.0f} ms; raise --target-ms.")
+        return
+    for family, (cost, method) in best.items():
+        print(f"✅ Strongest {family} within {args.target_ms:.0f} ms: PASSWORD_HASH_METHOD={method}")
+    print("Prefer scrypt (memory-hard) when the box has the RAM for concurrent logins.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Concurrent-writer benchmark for the SQLite profiles (see backend/sqlite_profile.py).
+
+Runs the same workload once per profile against a fresh database file: several
+writer processes (standing in for gunicorn workers) each commit small
+transactions that insert a collection-like row and bump a shared per-center
+total, mixed with reads of those totals. Prints commits and reads per second,
+'database is locked' failures and commit latency per profile.
+
+Usage:
+    python backend/bench_sqlite.py [--profiles default,tuned] [--processes 4]
+        [--seconds 10] [--read-ratio 0.5] [--centers 50]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import sqlite_profile
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def make_engine(path, profile):
+    uri = f'sqlite:///{path}'
+    if profile == 'tuned':
+        engine = create_engine(uri, **sqlite_profile.sqlite_engine_options(uri))
+        sqlite_profile.tune_engine(engine)
+        return engine
+    # Stock settings: rollback journal, synchronous=FULL, the driver's 5s lock wait
+    return create_engine(uri)
+
+def setup(path, profile, centers):
+    engine = make_engine(path, profile)
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE bench_collection (id INTEGER PRIMARY KEY, center_id INTEGER, '
+                          'qty REAL, amount_paise INTEGER, created_at REAL)'))
+        conn.execute(text('CREATE INDEX ix_bench_collection_center ON bench_collection (center_id)'))
+        conn.execute(text('CREATE TABLE bench_total (center_id INTEGER PRIMARY KEY, amount_paise INTEGER)'))
+        conn.execute(text('INSERT INTO bench_total VALUES (:c, 0)'), [{'c': c} for c in range(centers)])
+    engine.dispose()
+
+def worker(path, profile, seconds, read_ratio, centers, seed, out):
+    engine = make_engine(path, profile)
+    rng = random.Random(seed)
+    commits, reads, locked, latencies = 0, 0, 0, []
+    stop_at = time.time() + seconds
+    while time.time() < stop_at:
+        center = rng.randrange(centers)
+        started = time.perf_counter()
+        try:
+            if rng.random() < read_ratio:
+                with engine.connect() as conn:
+                    conn.execute(text('SELECT amount_paise FROM bench_total WHERE center_id = :c'), {'c': center}).all()
+                reads += 1
+                continue
+            amount = rng.randrange(100, 100000)
+            with engine.begin() as conn:
+                conn.execute(text('INSERT INTO bench_collection (center_id, qty, amount_paise, created_at) '
+                                  'VALUES (:c, :q, :a, :t)'), {'c': center, 'q': 1.5, 'a': amount, 't': time.time()})
+                conn.execute(text('UPDATE bench_total SET amount_paise = amount_paise + :a WHERE center_id = :c'),
+                             {'a': amount, 'c': center})
+            commits += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+    engine.dispose()
+    out.put({'commits': commits, 'reads': reads, 'locked': locked, 'latencies': latencies})
+
+def bench_profile(profile, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        setup(path, profile, args.centers)
+        out = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(path, profile, args.seconds, args.read_ratio,
+                                                                   args.centers, i, out))
+                     for i in range(args.processes)]
+        for process in processes:
+            process.start()
+        results = [out.get() for _ in processes]
+        for process in processes:
+            process.join()
+    latencies = [ms for r in results for ms in r['latencies']]
+    commits = sum(r['commits'] for r in results)
+    return {
+        'commits_per_s': round(commits / args.seconds, 1),
+        'reads_per_s': round(sum(r['reads'] for r in results) / args.seconds, 1),
+        'locked_errors': sum(r['locked'] for r in results),
+        'commit_p50_ms': _percentile(latencies, 50),
+        'commit_p95_ms': _percentile(latencies, 95),
+        'commit_max_ms': max(latencies) if latencies else None,
+    }
+
+def _fmt(value):
+    return '-' if value is None else f'{value:.1f}'
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the default and tuned SQLite profiles under concurrent writers.')
+    parser.add_argument('--profiles', default='default,tuned')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--seconds', type=int, default=10)
+    parser.add_argument('--read-ratio', type=float, default=0.5)
+    parser.add_argument('--centers', type=int, default=50)
+    parser.add_argument('--json', action='store_true', help='print raw results as JSON')
+    args = parser.parse_args()
+
+    results = {}
+    for profile in args.profiles.split(','):
+        print(f"⏱️  {profile}: {args.processes} process(es), {args.seconds}s ...", file=sys.stderr)
+        results[profile] = bench_profile(profile, args)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print("| profile | commits/s | reads/s | locked errors | commit p50 ms | commit p95 ms | commit max ms |")
+    print("|---------|----------:|--------:|--------------:|--------------:|--------------:|--------------:|")
+    for profile, r in results.items():
+        print(f"| {profile} | {r['commits_per_s']} | {r['reads_per_s']} | {r['locked_errors']} | "
+              f"{_fmt(r['commit_p50_ms'])} | {_fmt(r['commit_p95_ms'])} | {_fmt(r['commit_max_ms'])} |")
+
+if __name__ == '__main__':
+    main()
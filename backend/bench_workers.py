@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the gunicorn worker modes (sync, gthread, gevent).
+
+Starts gunicorn with deployment/gunicorn.conf.py once per mode, serving a tiny
+app with a fast endpoint and a slow one that waits on I/O the way the WhatsApp
+bot POST or a slow query does, then drives it with a mixed load and prints
+throughput and latency per request kind. Results are in
+deployment/WORKER_MODES.md.
+
+Usage:
+    python backend/bench_workers.py [--modes sync,gthread,gevent] [--workers 2]
+        [--clients 40] [--seconds 10] [--slow-ratio 0.1] [--slow-ms 500]
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from flask import Flask, jsonify, request
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+GUNICORN_CONF = os.path.join(os.path.dirname(BACKEND_DIR), 'deployment', 'gunicorn.conf.py')
+
+bench_app = Flask(__name__)
+
+@bench_app.route('/api/bench/fast')
+def bench_fast():
+    return jsonify({'success': True})
+
+@bench_app.route('/api/bench/slow')
+def bench_slow():
+    # Blocking wait on I/O; gevent's monkey patching turns this into a yield
+    time.sleep(int(request.args.get('ms', 500)) / 1000)
+    return jsonify({'success': True})
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _wait_until_up(url, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'gunicorn did not come up at {url}')
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def run_load(base_url, clients, seconds, slow_ratio, slow_ms):
+    """Closed-loop load: each client thread issues one request after another."""
+    results = {'fast': [], 'slow': []}
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + seconds
+
+    def client(seed):
+        rng = random.Random(seed)
+        while time.time() < stop_at:
+            kind = 'slow' if rng.random() < slow_ratio else 'fast'
+            url = f'{base_url}/api/bench/{kind}' + (f'?ms={slow_ms}' if kind == 'slow' else '')
+            started = time.perf_counter()
+            try:
+                urllib.request.urlopen(url, timeout=30).read()
+            except OSError:
+                with lock:
+                    errors[0] += 1
+                continue
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                results[kind].append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = len(results['fast']) + len(results['slow'])
+    return {
+        'requests': total,
+        'rps': round(total / seconds, 1),
+        'errors': errors[0],
+        'fast_p50_ms': _percentile(results['fast'], 50),
+        'fast_p95_ms': _percentile(results['fast'], 95),
+        'fast_p99_ms': _percentile(results['fast'], 99),
+        'slow_p50_ms': _percentile(results['slow'], 50),
+    }
+
+def bench_mode(mode, args):
+    port = _free_port()
+    env = dict(os.environ, WORKER_MODE=mode, WEB_CONCURRENCY=str(args.workers),
+               BIND=f'127.0.0.1:{port}', ACCESS_LOG='/dev/null')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', GUNICORN_CONF, '--chdir', BACKEND_DIR, 'bench_workers:bench_app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        _wait_until_up(base_url + '/api/bench/fast')
+        return run_load(base_url, args.clients, args.seconds, args.slow_ratio, args.slow_ms)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def _fmt(value):
+    return '-' if value is None else f'{value:.0f}'
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare gunicorn worker modes under mixed fast/slow load.')
+    parser.add_argument('--modes', default='sync,gthread,gevent')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=40)
+    parser.add_argument('--seconds', type=int, default=10)
+    parser.add_argument('--slow-ratio', type=float, default=0.1)
+    parser.add_argument('--slow-ms', type=int, default=500)
+    parser.add_argument('--json', action='store_true', help='print raw results as JSON')
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes.split(','):
+        print(f"⏱️  {mode}: {args.workers} worker(s), {args.clients} clients, {args.seconds}s ...", file=sys.stderr)
+        results[mode] = bench_mode(mode, args)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"| mode | req/s | errors | fast p50 ms | fast p95 ms | fast p99 ms | slow p50 ms |")
+    print(f"|------|------:|-------:|------------:|------------:|------------:|------------:|")
+    for mode, r in results.items():
+        print(f"| {mode} | {r['rps']} | {r['errors']} | {_fmt(r['fast_p50_ms'])} | {_fmt(r['fast_p95_ms'])} "
+              f"| {_fmt(r['fast_p99_ms'])} | {_fmt(r['slow_p50_ms'])} |")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import g, has_request_context
+from . import db
+from .events import broker, ensure_listener
+
+try:
+    import redis
+except ImportError:  # the shared backend is optional; the in-process LRU needs nothing
+    redis = None
+
+log = logging.getLogger(__name__)
+
+# Cache for small, rarely changing reference data (center and customer lists).
+#
+# Entries are keyed by the event entity name ('centers', 'customers') and dropped
+# whenever that entity is published from a write path. publish() runs after the
+# commit, so the next read refills from committed data. In-process caches in other
+# gunicorn workers hear the same event through the PostgreSQL LISTEN thread in
+# events.py. With CACHE_REDIS_URL set, all workers share one Redis cache instead.
+# On SQLite without Redis no event reaches the other workers, so their entries
+# only live CACHE_LOCAL_TTL_SECONDS; that bounds how long they serve stale data.
+
+CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', 300))
+CACHE_LOCAL_TTL_SECONDS = int(os.environ.get('CACHE_LOCAL_TTL_SECONDS', 30))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 256))
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+CACHED_ENTITIES = ('centers', 'customers')
+
+class LRUCache:
+    """Thread-safe in-process LRU with a per-entry TTL."""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+class RedisCache:
+    """Shared cache for all workers; values are stored as JSON."""
+
+    name = 'redis'
+    prefix = 'vks:cache:'
+
+    def __init__(self, url, ttl=CACHE_TTL_SECONDS):
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.setex(self.prefix + key, self.ttl if ttl is None else ttl, json.dumps(value, default=str))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(self.prefix + '*'))
+
+class ReferenceCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._generations = {}
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'errors': 0}
+
+    # Helper: entry lifetime; short when other workers cannot hear invalidations
+    def _ttl(self):
+        if self.backend.name == 'memory' and db.engine.dialect.name != 'postgresql':
+            return min(self.backend.ttl, CACHE_LOCAL_TTL_SECONDS)
+        return self.backend.ttl
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get_or_load(self, key, loader):
+        """Cached value for key, or loader() stored under key on a miss.
+
+        loader() reads from the primary: a replica could still be behind the
+        commit that just invalidated the entry.
+        """
+        ensure_listener()
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            log.warning('Cache read error: %s', e)
+            self._count('errors')
+            return loader()
+        if value is not None:
+            self._count('hits')
+            return value
+        self._count('misses')
+        with self._lock:
+            generation = self._generations.get(key, 0)
+        route = g.pop('db_route', None) if has_request_context() else None
+        try:
+            value = loader()
+        finally:
+            if route is not None:
+                g.db_route = route
+        with self._lock:
+            # Skip the store if a write invalidated the key while we were loading
+            if self._generations.get(key, 0) != generation:
+                return value
+        try:
+            self.backend.set(key, value, self._ttl())
+        except Exception as e:
+            log.warning('Cache write error: %s', e)
+            self._count('errors')
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+        self._count('invalidations')
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            log.warning('Cache invalidate error: %s', e)
+            self._count('errors')
+
+    def stats_dict(self):
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else None
+        stats['backend'] = self.backend.name
+        stats['ttl_seconds'] = self._ttl()
+        try:
+            stats['entries'] = self.backend.size()
+        except Exception:
+            stats['entries'] = None
+        return stats
+
+def _make_backend():
+    if CACHE_REDIS_URL and redis is not None:
+        return RedisCache(CACHE_REDIS_URL)
+    if CACHE_REDIS_URL:
+        log.warning('CACHE_REDIS_URL is set but the redis package is not installed; using the in-process cache')
+    return LRUCache()
+
+reference_cache = ReferenceCache(_make_backend())
+
+def _on_event(event):
+    if event.get('entity') in CACHED_ENTITIES:
+        reference_cache.invalidate(event['entity'])
+
+broker.add_observer(_on_event)
@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import queue
+import select
+import threading
+import time
+from sqlalchemy import text
+from . import db
+
+log = logging.getLogger(__name__)
+
+# Live change events for the CRUD grids.
+#
+# Write paths in routes.py call publish() after their commit. Every worker
+# process has an EventBroker that fans events out to its open SSE streams.
+# On PostgreSQL, publish() goes through NOTIFY and a LISTEN thread in each worker
+# feeds its broker, so a save handled by one gunicorn worker reaches clients
+# streaming from all the others. On SQLite events stay in-process.
+
+CHANNEL = 'vks_events'
+# NOTIFY payloads are capped at 8000 bytes; bigger rows are sent as a resync hint
+MAX_NOTIFY_PAYLOAD = 7900
+SUBSCRIBER_QUEUE_SIZE = 256
+HEARTBEAT_SECONDS = 15
+
+# Entity name (the /api/<entity> endpoint) -> access permission needed to receive it
+ENTITY_ACCESS = {
+    'centers': 'CENTER',
+    'collections': 'COLLECTIONS',
+    'sales': 'SALES',
+    'customers': 'SALES',
+    'employees': 'EMPLOYEES',
+    'accounts': 'ACCOUNTS',
+    'center_account_details': 'ACCOUNT_DETAILS',
+}
+
+class Subscription:
+    def __init__(self, entities):
+        self.entities = frozenset(entities)
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+class EventBroker:
+    """In-process pub/sub: one bounded queue per open SSE stream."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._observers = []
+        self._next_id = 0
+
+    def add_observer(self, callback):
+        """Call callback(event) for every event, e.g. to invalidate a cache."""
+        self._observers.append(callback)
+
+    def notify_observers(self, event):
+        for callback in self._observers:
+            try:
+                callback(event)
+            except Exception as e:
+                log.exception('Event observer error: %s', e)
+
+    def subscribe(self, entities):
+        subscription = Subscription(entities)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def deliver(self, event, observe=True):
+        if observe:
+            self.notify_observers(event)
+        with self._lock:
+            self._next_id += 1
+            event = dict(event, id=self._next_id)
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if event['entity'] not in subscription.entities:
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                # A stalled client must not hold events back for everyone else;
+                # it gets a resync and reloads the table instead.
+                subscription.overflowed = True
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+broker = EventBroker()
+_listener_lock = threading.Lock()
+_listener_started = False
+
+def _is_postgres(engine):
+    return engine.dialect.name == 'postgresql'
+
+def publish(entity, action, row):
+    """Announce an insert/update/delete of one row. Call after the commit."""
+    event = {'entity': entity, 'action': action, 'row': row}
+    engine = db.engine
+    if not _is_postgres(engine):
+        broker.deliver(event)
+        return
+    # Observers in this process run now; the NOTIFY echo skips them (same origin)
+    broker.notify_observers(event)
+    payload = json.dumps(dict(event, origin=os.getpid()), default=str)
+    if len(payload.encode('utf-8')) > MAX_NOTIFY_PAYLOAD:
+        payload = json.dumps({'entity': entity, 'action': 'resync', 'row': None, 'origin': os.getpid()})
+    try:
+        with engine.connect() as conn:
+            conn.execute(text('SELECT pg_notify(:channel, :payload)'), {'channel': CHANNEL, 'payload': payload})
+            conn.commit()
+    except Exception as e:
+        # The write itself already committed; live updates are best effort
+        log.warning('Event publish error: %s', e)
+        broker.deliver(event, observe=False)
+
+def _listen_forever(engine):
+    while True:
+        try:
+            raw = engine.raw_connection()
+            raw.detach()  # a dedicated connection, not one borrowed from the pool
+            conn = raw.dbapi_connection
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            while True:
+                if select.select([conn], [], [], HEARTBEAT_SECONDS) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        event = json.loads(notify.payload)
+                    except ValueError:
+                        continue
+                    broker.deliver(event, observe=event.pop('origin', None) != os.getpid())
+        except Exception as e:
+            log.warning('Event listener error, reconnecting: %s', e)
+            time.sleep(2)
+
+def ensure_listener():
+    """Start this worker's LISTEN thread the first time a client subscribes."""
+    global _listener_started
+    engine = db.engine
+    if not _is_postgres(engine) or _listener_started:
+        return
+    with _listener_lock:
+        if _listener_started:
+            return
+        threading.Thread(target=_listen_forever, args=(engine,), name='vks-event-listener', daemon=True).start()
+        _listener_started = True
+
+def _format(event_name, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_name}')
+    lines.append(f'data: {json.dumps(data, default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+def stream(entities):
+    """SSE generator for one client: change events, heartbeats and resync hints.
+
+    Runs after the request context is gone, so it never touches the database;
+    call ensure_listener() in the view first.
+    """
+    subscription = broker.subscribe(entities)
+    try:
+        yield 'retry: 3000\n\n'
+        yield _format('ready', {'entities': sorted(subscription.entities)})
+        while True:
+            if subscription.overflowed:
+                yield _format('resync', {'entities': sorted(subscription.entities)})
+                return
+            try:
+                event = subscription.queue.get(timeout=HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            name = 'resync' if event.get('action') == 'resync' else 'change'
+            yield _format(name, {'entity': event['entity'], 'action': event['action'], 'row': event['row']},
+                          event.get('id'))
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,153 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+import requests
+from sqlalchemy import text
+
+log = logging.getLogger(__name__)
+
+# Two-tier health checks (see /api/health/* in routes.py and app.py).
+#
+#   live  - the process is up and serving requests. Never touches the database
+#           or the network, so load balancers and cron can poll it as often as
+#           they like.
+#   ready - the result of the last background probe: database round trip, pool
+#           saturation, WhatsApp bot reachability and free disk space. Each
+#           worker process runs the probe every HEALTH_PROBE_SECONDS on its own
+#           thread and the endpoint only reads the cached result, so health
+#           traffic adds no database load however often it is polled.
+#
+# A check is 'ok', 'warn' (degraded but still serving) or 'fail'. The process is
+# ready unless a check fails or the cached result is older than
+# HEALTH_STALE_FACTOR probe intervals (the probe itself is hung).
+#
+# Like static_assets.py this module has no package imports, so the standalone
+# backend/app.py uses the same probe: each app creates HealthProbe(app, db).
+
+HEALTH_PROBE_SECONDS = float(os.environ.get('HEALTH_PROBE_SECONDS', 15))
+HEALTH_STALE_FACTOR = 3
+HEALTH_DB_SLOW_MS = float(os.environ.get('HEALTH_DB_SLOW_MS', 500))
+HEALTH_POOL_WARN_RATIO = float(os.environ.get('HEALTH_POOL_WARN_RATIO', 0.9))
+HEALTH_DISK_PATH = os.environ.get('HEALTH_DISK_PATH',
+                                  os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance'))
+HEALTH_DISK_WARN_PERCENT = float(os.environ.get('HEALTH_DISK_WARN_PERCENT', 10))
+HEALTH_DISK_FAIL_PERCENT = float(os.environ.get('HEALTH_DISK_FAIL_PERCENT', 3))
+WHATSAPP_BOT_HEALTH_URL = os.environ.get('WHATSAPP_BOT_HEALTH_URL', 'http://localhost:3001/health')
+HEALTH_BOT_TIMEOUT = float(os.environ.get('HEALTH_BOT_TIMEOUT', 2))
+APP_VERSION = '1.0.0'
+
+def _check(status, **details):
+    return dict(details, status=status)
+
+def check_database(db):
+    started = time.perf_counter()
+    try:
+        with db.engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+    except Exception as e:
+        return _check('fail', error=str(e))
+    latency_ms = round((time.perf_counter() - started) * 1000, 1)
+    return _check('warn' if latency_ms > HEALTH_DB_SLOW_MS else 'ok', latency_ms=latency_ms)
+
+def check_pool(db):
+    pool = db.engine.pool
+    if not hasattr(pool, 'checkedout') or not hasattr(pool, 'size'):
+        return _check('ok', pool=type(pool).__name__)
+    capacity = pool.size() + max(getattr(pool, '_max_overflow', 0), 0)
+    in_use = pool.checkedout()
+    ratio = in_use / capacity if capacity else 0.0
+    return _check('warn' if ratio >= HEALTH_POOL_WARN_RATIO else 'ok',
+                  in_use=in_use, capacity=capacity, saturation=round(ratio, 2))
+
+def check_whatsapp_bot(db):
+    # OTP delivery only; a missing bot degrades employee login but is not fatal
+    try:
+        resp = requests.get(WHATSAPP_BOT_HEALTH_URL, timeout=HEALTH_BOT_TIMEOUT)
+        bot_status = resp.json().get('status') if resp.ok else f'HTTP {resp.status_code}'
+    except (requests.RequestException, ValueError) as e:
+        return _check('warn', error=type(e).__name__)
+    return _check('ok' if bot_status == 'ready' else 'warn', bot=bot_status)
+
+def check_disk(db):
+    usage = shutil.disk_usage(HEALTH_DISK_PATH)
+    free_percent = round(usage.free / usage.total * 100, 1)
+    if free_percent < HEALTH_DISK_FAIL_PERCENT:
+        status = 'fail'
+    elif free_percent < HEALTH_DISK_WARN_PERCENT:
+        status = 'warn'
+    else:
+        status = 'ok'
+    return _check(status, free_percent=free_percent, free_mb=usage.free // (1024 * 1024))
+
+# Pool first: the database check itself holds a connection while it runs
+CHECKS = (
+    ('pool', check_pool),
+    ('database', check_database),
+    ('whatsapp_bot', check_whatsapp_bot),
+    ('disk', check_disk),
+)
+
+class HealthProbe:
+    """Background readiness probe for one Flask app, one thread per worker process."""
+
+    def __init__(self, app, db, interval=HEALTH_PROBE_SECONDS):
+        self.app = app
+        self.db = db
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self.result = None
+        self.checked_at = None  # time.monotonic() of the last completed probe
+
+    def _ensure_thread(self):
+        # Started lazily so each gunicorn worker (after fork) gets its own thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.result = None
+            self.probe()  # the first readiness answer is never 'unknown'
+            threading.Thread(target=self._run, name='vks-health-probe', daemon=True).start()
+            self._pid = os.getpid()
+
+    def probe(self):
+        checks = {}
+        with self.app.app_context():
+            for name, check in CHECKS:
+                try:
+                    checks[name] = check(self.db)
+                except Exception as e:
+                    checks[name] = _check('fail', error=str(e))
+        failed = [name for name, result in checks.items() if result['status'] == 'fail']
+        if failed:
+            log.warning('Readiness probe failed', extra={'checks': failed})
+        self.result = {
+            'status': 'fail' if failed else ('warn' if any(r['status'] == 'warn' for r in checks.values()) else 'ok'),
+            'checked_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'checks': checks,
+        }
+        self.checked_at = time.monotonic()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.probe()
+            except Exception as e:
+                log.warning('Health probe error: %s', e)
+
+    def readiness(self):
+        """(ready, report) from the cached probe result; never runs a check itself after startup."""
+        self._ensure_thread()
+        report = dict(self.result)
+        age = time.monotonic() - self.checked_at
+        report['age_seconds'] = round(age, 1)
+        report['version'] = APP_VERSION
+        if age > self.interval * HEALTH_STALE_FACTOR:
+            report['status'] = 'fail'
+            report['stale'] = True
+        return report['status'] != 'fail', report
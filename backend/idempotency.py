@@ -0,0 +1,187 @@
+import hashlib
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import g, has_request_context, request, Response, jsonify
+from flask_login import current_user
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from . import app, db
+
+# Idempotency-Key support for create endpoints.
+#
+# A POST that carries an Idempotency-Key header first reserves (user, key) in
+# idempotency_record on a connection of its own, so a concurrent duplicate hits
+# the primary key instead of inserting twice. When the view commits, the record
+# is marked 'committed' inside that same transaction. Once the view returns, the
+# response is stored. A replay inside IDEMPOTENCY_TTL_HOURS returns the stored
+# response without running the view again.
+#
+# Each reservation records its owner (host:pid:token) and is a lease of
+# IDEMPOTENCY_LEASE_SECONDS, well past the worker timeout. It is taken over
+# early when the owning process no longer exists (same host), and by anyone
+# once the lease has run out, even if the owner's pid is still alive (a hung
+# worker, or the pid reused by another process). The lease is separate from
+# IDEMPOTENCY_TTL_HOURS, which only governs how long a response is replayed.
+# However slow the original request is, a takeover cannot double-apply it:
+# the 'committed' mark only matches the current owner, so a superseded
+# request fails its commit instead of saving.
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_TTL_HOURS', 24))
+IDEMPOTENCY_LEASE_SECONDS = int(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', 300))
+IDEMPOTENCY_MAX_KEY_LENGTH = 100
+IDEMPOTENCY_PURGE_PROBABILITY = 0.01
+
+class IdempotencyRecord(db.Model):
+    __tablename__ = 'idempotency_record'
+    user_id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(IDEMPOTENCY_MAX_KEY_LENGTH), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(10), nullable=False)  # in_progress, committed, done
+    response_status = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    owner = db.Column(db.String(100), nullable=True)  # host:pid:token of the reserving request
+
+class SupersededReservation(RuntimeError):
+    """The reservation was taken over; this request must not commit its changes."""
+
+_HOST = socket.gethostname()[:60]
+
+def _new_owner():
+    return f'{_HOST}:{os.getpid()}:{uuid.uuid4().hex[:12]}'
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _abandoned(record, now):
+    """Whether an in_progress reservation can be taken over: lease run out or owner gone."""
+    if record.created_at < now - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS):
+        return True
+    host, pid, _ = (record.owner or '::').rsplit(':', 2)
+    # os.kill(pid, 0) is a liveness probe on POSIX only
+    return host == _HOST and pid.isdigit() and os.name == 'posix' and not _process_alive(int(pid))
+
+def _request_hash():
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}\n'.encode('utf-8'))
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+def _reserve(user_id, key, request_hash, owner):
+    """Insert an in_progress record; returns None on success or the existing record."""
+    now = datetime.utcnow()
+    record = {'user_id': user_id, 'key': key, 'request_hash': request_hash, 'status': 'in_progress',
+              'created_at': now, 'expires_at': now + timedelta(hours=IDEMPOTENCY_TTL_HOURS), 'owner': owner}
+    table = IdempotencyRecord.__table__
+    this_key = (table.c.user_id == user_id) & (table.c.key == key)
+    with db.engine.begin() as conn:
+        if random.random() < IDEMPOTENCY_PURGE_PROBABILITY:
+            conn.execute(delete(table).where(table.c.expires_at < now))
+        existing = conn.execute(select(table).where(this_key)).first()
+        if existing is not None and existing.expires_at < now:
+            conn.execute(delete(table).where(this_key, table.c.expires_at < now))
+        elif existing is not None and existing.status == 'in_progress' and _abandoned(existing, now):
+            # Only if it is still the same uncommitted reservation; otherwise report what it became
+            taken = conn.execute(delete(table).where(this_key, table.c.status == 'in_progress',
+                                                     table.c.owner == existing.owner)).rowcount
+            if not taken:
+                return conn.execute(select(table).where(this_key)).first()
+        elif existing is not None:
+            return existing
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(table), record)
+        except IntegrityError:
+            # Another request reserved the key between our read and insert
+            return conn.execute(select(table).where(this_key)).first()
+    return None
+
+def _finish(user_id, key, owner, response):
+    table = IdempotencyRecord.__table__
+    with db.engine.begin() as conn:
+        conn.execute(update(table).where(table.c.user_id == user_id, table.c.key == key,
+                                         table.c.owner == owner).values(
+            status='done', response_status=response.status_code, response_body=response.get_data(as_text=True)))
+
+def _release(user_id, key, owner):
+    """Drop a reservation whose request failed before committing, so it can be retried."""
+    table = IdempotencyRecord.__table__
+    with db.engine.begin() as conn:
+        conn.execute(delete(table).where(table.c.user_id == user_id, table.c.key == key,
+                                         table.c.owner == owner, table.c.status == 'in_progress'))
+
+def _replay(record, request_hash):
+    if record.request_hash != request_hash:
+        return jsonify({'success': False,
+                        'message': 'Idempotency-Key was already used for a different request.'}), 422
+    if record.status == 'done':
+        return Response(record.response_body, record.response_status, mimetype='application/json',
+                        headers={'Idempotent-Replayed': 'true'})
+    if record.status == 'committed':
+        # The first attempt saved its changes but died before storing its response
+        return jsonify({'success': True, 'message': 'This request was already applied.'}), 200
+    resp = jsonify({'success': False, 'message': 'A request with this Idempotency-Key is still in progress.'})
+    resp.headers['Retry-After'] = '1'
+    return resp, 409
+
+def idempotent(view):
+    """Honour an Idempotency-Key header on the POST branch of a view."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+        if request.method != 'POST' or not key:
+            return view(*args, **kwargs)
+        if len(key) > IDEMPOTENCY_MAX_KEY_LENGTH:
+            return jsonify({'success': False, 'message': 'Idempotency-Key is too long.'}), 400
+        user_id = current_user.id
+        request_hash = _request_hash()
+        owner = _new_owner()
+        existing = _reserve(user_id, key, request_hash, owner)
+        if existing is not None:
+            return _replay(existing, request_hash)
+        g.idempotency = (user_id, key, owner)
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except SupersededReservation:
+            db.session.rollback()
+            resp = jsonify({'success': False, 'message': 'This request took too long and was superseded by a retry.'})
+            resp.headers['Retry-After'] = '1'
+            return resp, 409
+        except Exception:
+            _release(user_id, key, owner)
+            raise
+        finally:
+            g.pop('idempotency', None)
+        if response.status_code >= 500:
+            _release(user_id, key, owner)
+        else:
+            _finish(user_id, key, owner, response)
+        return response
+    return wrapper
+
+def _mark_committed(session):
+    # Runs inside the view's own transaction, so the mark commits with its insert
+    if not has_request_context() or 'idempotency' not in g:
+        return
+    user_id, key, owner = g.idempotency
+    marked = session.execute(update(IdempotencyRecord).where(
+        IdempotencyRecord.user_id == user_id, IdempotencyRecord.key == key, IdempotencyRecord.owner == owner,
+        IdempotencyRecord.status.in_(('in_progress', 'committed'))).values(status='committed')).rowcount
+    if not marked:
+        # Raising here aborts the commit, so the view's changes are rolled back
+        raise SupersededReservation(f'Idempotency-Key {key!r} was taken over by another request.')
+
+def init_idempotency(session):
+    event.listen(session, 'before_commit', _mark_committed)
@@ -0,0 +1,334 @@
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from . import app, db
+from .events import publish
+from .schemas import error_message
+
+log = logging.getLogger(__name__)
+
+# Background import jobs.
+#
+# The client uploads all parsed rows once (POST /api/imports). They are stored as
+# import_row records, and an ImportRunner thread in each web worker processes a job
+# IMPORT_CHUNK_SIZE rows at a time. Each chunk commits its new rows, their
+# idempotency keys, the row statuses and the job's next_row checkpoint in one
+# transaction. If a worker dies mid-chunk, that chunk rolls back, the job's
+# heartbeat goes stale, and any runner picks the job up again at next_row.
+# A chunk commits early once it has run for a third of IMPORT_STALE_SECONDS, so
+# a slow chunk keeps the heartbeat fresh. A chunk starts and ends with a
+# conditional UPDATE of the job on (worker, next_row): a worker whose job was
+# re-claimed meanwhile rolls its chunk back and stops, so rows and counters are
+# never applied twice.
+# A row whose idempotency key was already imported by the same user, in this
+# job or in an earlier upload of the same file, is skipped as a duplicate
+# instead of being inserted twice. Each chunk is validated against the
+# entity's schema in one pass first, so invalid rows are rejected with every
+# field error and without a savepoint.
+
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 200))
+IMPORT_MAX_ROWS = int(os.environ.get('IMPORT_MAX_ROWS', 200000))
+IMPORT_STALE_SECONDS = int(os.environ.get('IMPORT_STALE_SECONDS', 60))
+IMPORT_POLL_SECONDS = float(os.environ.get('IMPORT_POLL_SECONDS', 2))
+IMPORT_MAX_CHUNK_FAILURES = 3
+
+# entity -> (schema, create(values) adding a validated row to the session); see routes.py
+IMPORTERS = {}
+
+def register_importer(entity, schema, create):
+    IMPORTERS[entity] = (schema, create)
+
+class ImportJob(db.Model):
+    __tablename__ = 'import_job'
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    username = db.Column(db.String(80), nullable=True)
+    client_key = db.Column(db.String(100), nullable=True)  # fingerprint of the uploaded file
+    status = db.Column(db.String(10), nullable=False, default='queued')  # queued, running, done, failed
+    total_rows = db.Column(db.Integer, nullable=False, default=0)
+    next_row = db.Column(db.Integer, nullable=False, default=0)  # checkpoint: rows below are committed
+    accepted = db.Column(db.Integer, nullable=False, default=0)
+    rejected = db.Column(db.Integer, nullable=False, default=0)
+    duplicates = db.Column(db.Integer, nullable=False, default=0)
+    chunk_failures = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    worker = db.Column(db.String(100), nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    __table_args__ = (
+        db.Index('ix_import_job_status', 'status'),
+        db.Index('ix_import_job_user_entity_key', 'user_id', 'entity', 'client_key'),
+    )
+
+class ImportRow(db.Model):
+    __tablename__ = 'import_row'
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, nullable=False)
+    row_number = db.Column(db.Integer, nullable=False)
+    idempotency_key = db.Column(db.String(128), nullable=False)
+    data = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending, accepted, rejected, duplicate
+    message = db.Column(db.Text, nullable=True)
+    __table_args__ = (
+        db.UniqueConstraint('job_id', 'row_number', name='uq_import_row_job_row'),
+    )
+
+class ImportedKey(db.Model):
+    """Idempotency keys of rows already imported, per user and entity."""
+    __tablename__ = 'imported_row_key'
+    user_id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), primary_key=True)
+    idempotency_key = db.Column(db.String(128), primary_key=True)
+    job_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+def row_key(entity, data, row_number):
+    """Fallback idempotency key when the client sends none: content plus position."""
+    canonical = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{entity}\n{row_number}\n{canonical}'.encode('utf-8')).hexdigest()
+
+def create_job(entity, user, rows, client_key=None):
+    """Store an uploaded import; returns (job, created). Re-uploads resume the existing job.
+
+    rows is a list of {'key': optional idempotency key, 'data': {...}} or plain
+    row dicts.
+    """
+    if client_key:
+        existing = (ImportJob.query
+                    .filter_by(user_id=user.id, entity=entity, client_key=client_key)
+                    .filter(ImportJob.status != 'failed')
+                    .order_by(ImportJob.id.desc())
+                    .first())
+        if existing:
+            return existing, False
+    job = ImportJob(entity=entity, user_id=user.id, username=user.username, client_key=client_key,
+                    status='queued', total_rows=len(rows))
+    db.session.add(job)
+    db.session.flush()
+    records = []
+    for number, row in enumerate(rows):
+        data = row.get('data') if isinstance(row.get('data'), dict) else row
+        key = str(row.get('key') or '') if 'data' in row else ''
+        records.append({
+            'job_id': job.id,
+            'row_number': number,
+            'idempotency_key': key[:128] or row_key(entity, data, number),
+            'data': json.dumps(data, default=str),
+            'status': 'pending',
+        })
+    if records:
+        db.session.execute(ImportRow.__table__.insert(), records)
+    else:
+        job.status = 'done'
+        job.finished_at = datetime.utcnow()
+    db.session.commit()
+    import_runner.wake()
+    return job, True
+
+def job_to_dict(job):
+    processed = job.next_row
+    return {
+        'id': job.id,
+        'entity': job.entity,
+        'status': job.status,
+        'total': job.total_rows,
+        'processed': processed,
+        'accepted': job.accepted,
+        'rejected': job.rejected,
+        'duplicates': job.duplicates,
+        'percent': round(100 * processed / job.total_rows, 1) if job.total_rows else 100.0,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+def rejected_rows(job_id):
+    rows = (ImportRow.query
+            .filter_by(job_id=job_id, status='rejected')
+            .order_by(ImportRow.row_number)
+            .all())
+    return [{'row_number': r.row_number, 'data': json.loads(r.data), 'message': r.message} for r in rows]
+
+class JobLost(RuntimeError):
+    """Another worker re-claimed the job; this worker must stop without committing."""
+
+def _worker_id():
+    # Unique per claim, so a worker that re-claims its own stale job is a new owner
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+def _claim_job():
+    """Atomically take a queued job, or a running one whose worker stopped heart-beating.
+
+    Returns (job, worker id) or (None, None).
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=IMPORT_STALE_SECONDS)
+    claimable = or_(ImportJob.status == 'queued',
+                    (ImportJob.status == 'running') & (ImportJob.heartbeat_at < stale))
+    candidate = (db.session.query(ImportJob.id)
+                 .filter(claimable)
+                 .order_by(ImportJob.id)
+                 .first())
+    if candidate is None:
+        return None, None
+    worker = _worker_id()
+    claimed = db.session.execute(
+        update(ImportJob)
+        .where(ImportJob.id == candidate.id, claimable)
+        .values(status='running', worker=worker, heartbeat_at=now)
+    ).rowcount
+    db.session.commit()
+    return (db.session.get(ImportJob, candidate.id), worker) if claimed else (None, None)
+
+def _checkpoint(job_id, worker, expected_row, **values):
+    """Conditionally update the job in the chunk's transaction; JobLost if another worker owns it now."""
+    owned = db.session.execute(
+        update(ImportJob)
+        .where(ImportJob.id == job_id, ImportJob.worker == worker, ImportJob.next_row == expected_row)
+        .values(heartbeat_at=datetime.utcnow(), **values)
+    ).rowcount
+    if not owned:
+        raise JobLost(f'Import job {job_id} was claimed by another worker.')
+
+def _rejection_message(error):
+    if isinstance(error, IntegrityError):
+        return 'Duplicate or conflicting record.'
+    if isinstance(error, DBAPIError):
+        return f'Invalid value: {str(error.orig)[:200]}'
+    return str(error)
+
+def _process_chunk(job, worker):
+    """Import the next chunk of a job and commit it with the checkpoint. Returns False when done."""
+    schema, create = IMPORTERS[job.entity]
+    job_id, entity, user_id, start_row = job.id, job.entity, job.user_id, job.next_row
+    rows = (ImportRow.query
+            .filter(ImportRow.job_id == job_id, ImportRow.row_number >= start_row)
+            .order_by(ImportRow.row_number)
+            .limit(IMPORT_CHUNK_SIZE)
+            .all())
+    if not rows:
+        _checkpoint(job_id, worker, start_row, status='done', finished_at=datetime.utcnow())
+        db.session.commit()
+        return False
+    # Take the job row first: it checks ownership, locks the row against a re-claim until the
+    # chunk commits, and opens the transaction before any savepoint (pysqlite does not BEGIN
+    # for SAVEPOINT, so a chunk's first insert would otherwise commit on its own)
+    _checkpoint(job_id, worker, start_row)
+    db.session.info['audit_actor'] = (user_id, job.username)
+    deadline = time.monotonic() + IMPORT_STALE_SECONDS / 3
+    counts = {'accepted': 0, 'rejected': 0, 'duplicates': 0}
+    inserted = []
+    next_row = start_row
+    pending = [row for row in rows if row.status == 'pending']
+    validated = dict(zip((row.row_number for row in pending),
+                         schema.validate_many([json.loads(row.data) for row in pending])))
+    for row in rows:
+        if next_row > start_row and time.monotonic() > deadline:
+            # Commit what is done so far so the heartbeat stays fresh
+            break
+        next_row = row.row_number + 1
+        if row.status != 'pending':
+            continue
+        values, errors = validated[row.row_number]
+        if errors:
+            row.status = 'rejected'
+            row.message = error_message(errors)
+            counts['rejected'] += 1
+            continue
+        if db.session.get(ImportedKey, (user_id, entity, row.idempotency_key)):
+            row.status = 'duplicate'
+            counts['duplicates'] += 1
+            continue
+        savepoint = db.session.begin_nested()
+        try:
+            obj = create(values)
+            db.session.add(ImportedKey(user_id=user_id, entity=entity, idempotency_key=row.idempotency_key,
+                                       job_id=job_id))
+            db.session.flush()
+            savepoint.commit()
+        except (ValueError, TypeError, DBAPIError) as e:
+            savepoint.rollback()
+            row.status = 'rejected'
+            row.message = _rejection_message(e)
+            counts['rejected'] += 1
+            continue
+        row.status = 'accepted'
+        counts['accepted'] += 1
+        inserted.append(obj)
+    _checkpoint(job_id, worker, start_row, next_row=next_row, chunk_failures=0,
+                **{name: getattr(ImportJob, name) + n for name, n in counts.items()})
+    db.session.commit()
+    for obj in inserted:
+        publish(entity, 'insert', schema.dump(obj))
+    return True
+
+def run_job(job, worker):
+    job_id = job.id
+    while True:
+        try:
+            if not _process_chunk(db.session.get(ImportJob, job_id), worker):
+                return
+        except JobLost as e:
+            db.session.rollback()
+            log.warning('%s Stopping.', e)
+            return
+        except Exception as e:
+            db.session.rollback()
+            log.exception('Import job %s chunk error: %s', job_id, e)
+            failures = db.session.get(ImportJob, job_id).chunk_failures + 1
+            values = {'chunk_failures': failures}
+            if failures >= IMPORT_MAX_CHUNK_FAILURES:
+                values.update(status='failed', error=str(e), finished_at=datetime.utcnow())
+            owned = db.session.execute(update(ImportJob).where(ImportJob.id == job_id, ImportJob.worker == worker)
+                                       .values(**values)).rowcount
+            db.session.commit()
+            if not owned or failures >= IMPORT_MAX_CHUNK_FAILURES:
+                return
+            time.sleep(1)
+        finally:
+            db.session.info.pop('audit_actor', None)
+
+class ImportRunner:
+    """One background thread per worker process that claims and runs import jobs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name='vks-import-runner', daemon=True).start()
+            self._pid = os.getpid()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                with app.app_context():
+                    job, worker = _claim_job()
+                    if job is not None:
+                        run_job(job, worker)
+                        continue
+            except Exception as e:
+                log.exception('Import runner error: %s', e)
+            self._wake.wait(IMPORT_POLL_SECONDS)
+            self._wake.clear()
+
+import_runner = ImportRunner()
@@ -0,0 +1,221 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from . import db
+from .models import Sale
+from .money import money_column, parse_money, money_json, from_paise
+from .aggregates import paise
+from .partitioning import read_source
+
+# Customer ledger: every sale write posts a signed entry for its customer and keeps
+# the customer's running balance and per-month totals materialized, so the current
+# balance is a single primary-key read instead of a scan over all sales.
+
+class CustomerLedgerEntry(db.Model):
+    __tablename__ = 'customer_ledger_entry'
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, nullable=False)
+    sale_id = db.Column(db.Integer, nullable=True)
+    entry_type = db.Column(db.String(20), nullable=False)  # sale, adjustment, reversal
+    period = db.Column(db.String(7), nullable=False)  # YYYY-MM of the sale date
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    amount = money_column(nullable=False)
+    balance_after = money_column(nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_customer_ledger_entry_customer_id_id', 'customer_id', 'id'),
+    )
+
+class CustomerBalance(db.Model):
+    __tablename__ = 'customer_balance'
+    customer_id = db.Column(db.Integer, primary_key=True)
+    balance = money_column(nullable=False, default=0)
+    total_quantity = db.Column(db.Integer, nullable=False, default=0)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class CustomerPeriodBalance(db.Model):
+    __tablename__ = 'customer_period_balance'
+    customer_id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(7), primary_key=True)
+    amount = money_column(nullable=False, default=0)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+
+def sale_period(date):
+    """Ledger period (YYYY-MM) for a sale date string."""
+    return str(date)[:7]
+
+def sale_amount(quantity, price):
+    return parse_money(price) * int(quantity)
+
+def _insert_ignore(model, values):
+    """Insert a row unless its primary key exists; True if it was inserted."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        statement = pg_insert(model).values(**values).on_conflict_do_nothing()
+    else:
+        statement = insert(model).values(**values).prefix_with('OR IGNORE')
+    return db.session.execute(statement).rowcount == 1
+
+def _add_to_totals(model, pk, deltas, values=None):
+    """Add deltas to a running-totals row, creating it if missing; returns its new totals.
+
+    The row stays locked until commit (PostgreSQL row lock; SQLite serializes
+    writers), so concurrent postings for one customer apply one after another.
+    A missing row is inserted with the deltas by an insert that skips an existing
+    row: when two first postings race, the one that loses falls through to the
+    locked update instead of failing on the primary key.
+    """
+    key = tuple(pk.values())
+    key = key if len(key) > 1 else key[0]
+    row = db.session.get(model, key, with_for_update=True)
+    if row is None:
+        if _insert_ignore(model, {**pk, **deltas, **(values or {})}):
+            return dict(deltas)
+        row = db.session.get(model, key, with_for_update=True)
+    for name, delta in deltas.items():
+        setattr(row, name, getattr(row, name) + delta)
+    for name, value in (values or {}).items():
+        setattr(row, name, value)
+    return {name: getattr(row, name) for name in deltas}
+
+def post_entry(customer_id, period, amount, quantity, entry_type, sale_id=None):
+    """Add one ledger entry and roll it into the customer and period totals.
+
+    Runs in the caller's session; the route's commit makes the sale and its
+    ledger posting durable together.
+    """
+    totals = _add_to_totals(CustomerBalance, {'customer_id': customer_id},
+                            {'balance': amount, 'total_quantity': quantity, 'entry_count': 1},
+                            {'updated_at': datetime.utcnow()})
+    _add_to_totals(CustomerPeriodBalance, {'customer_id': customer_id, 'period': period},
+                   {'amount': amount, 'quantity': quantity})
+
+    entry = CustomerLedgerEntry(
+        customer_id=customer_id,
+        sale_id=sale_id,
+        entry_type=entry_type,
+        period=period,
+        quantity=quantity,
+        amount=amount,
+        balance_after=totals['balance']
+    )
+    db.session.add(entry)
+    return entry
+
+def sale_snapshot(sale):
+    """Capture the ledger-relevant fields of a sale before it is edited."""
+    return {
+        'customer_id': sale.customer_id,
+        'period': sale_period(sale.date),
+        'quantity': int(sale.quantity),
+        'amount': sale_amount(sale.quantity, sale.price)
+    }
+
+def record_sale_created(sale):
+    """Post a new sale. Call after db.session.flush() so sale.id is set."""
+    snap = sale_snapshot(sale)
+    return post_entry(snap['customer_id'], snap['period'], snap['amount'], snap['quantity'], 'sale', sale.id)
+
+def record_sale_updated(sale, before):
+    """Post the difference between a sale's old snapshot and its new values."""
+    after = sale_snapshot(sale)
+    if before['customer_id'] == after['customer_id'] and before['period'] == after['period']:
+        amount = after['amount'] - before['amount']
+        quantity = after['quantity'] - before['quantity']
+        if amount == 0 and quantity == 0:
+            return None
+        return post_entry(after['customer_id'], after['period'], amount, quantity, 'adjustment', sale.id)
+    # Moved to another customer or month: reverse the old posting, post the new one
+    post_entry(before['customer_id'], before['period'], -before['amount'], -before['quantity'], 'reversal', sale.id)
+    return post_entry(after['customer_id'], after['period'], after['amount'], after['quantity'], 'sale', sale.id)
+
+def record_sale_deleted(sale):
+    """Reverse a sale that is about to be deleted."""
+    snap = sale_snapshot(sale)
+    return post_entry(snap['customer_id'], snap['period'], -snap['amount'], -snap['quantity'], 'reversal', sale.id)
+
+def ledger_entry_to_dict(entry):
+    return {
+        'id': entry.id,
+        'sale_id': entry.sale_id,
+        'entry_type': entry.entry_type,
+        'period': entry.period,
+        'quantity': entry.quantity,
+        'amount': money_json(entry.amount),
+        'balance_after': money_json(entry.balance_after),
+        'created_at': entry.created_at.isoformat()
+    }
+
+def get_customer_ledger(customer_id, page=1, per_page=50):
+    """Current balance (one PK read), per-period totals and one page of entries, newest first."""
+    balance = db.session.get(CustomerBalance, customer_id)
+    periods = (CustomerPeriodBalance.query
+               .filter_by(customer_id=customer_id)
+               .order_by(CustomerPeriodBalance.period.desc())
+               .all())
+    entries = (CustomerLedgerEntry.query
+               .filter_by(customer_id=customer_id)
+               .order_by(CustomerLedgerEntry.id.desc())
+               .offset((page - 1) * per_page)
+               .limit(per_page)
+               .all())
+    return {
+        'customer_id': customer_id,
+        'balance': money_json(balance.balance) if balance else 0.0,
+        'total_quantity': balance.total_quantity if balance else 0,
+        'periods': [{'period': p.period, 'amount': money_json(p.amount), 'quantity': p.quantity} for p in periods],
+        'entries': [ledger_entry_to_dict(e) for e in entries],
+        'page': page,
+        'per_page': per_page,
+        'total': balance.entry_count if balance else 0
+    }
+
+def rebuild_ledger():
+    """Rebuild all ledger tables from the Sale table (one entry per existing sale)."""
+    CustomerLedgerEntry.query.delete()
+    CustomerPeriodBalance.query.delete()
+    CustomerBalance.query.delete()
+    # Archived years are still part of the customer's history
+    sales = read_source(Sale.__table__.name)
+    period = func.substr(sales.c.date, 1, 7)
+    amount = func.sum(sales.c.quantity * paise(sales.c.price))
+    rows = db.session.execute(
+        select(sales.c.customer_id, period, amount, func.sum(sales.c.quantity), func.count(sales.c.id))
+        .where(sales.c.customer_id.isnot(None))
+        .group_by(sales.c.customer_id, period)
+    ).all()
+    totals = {}
+    for customer_id, sale_month, month_paise, month_quantity, count in rows:
+        db.session.add(CustomerPeriodBalance(customer_id=customer_id, period=sale_month,
+                                             amount=from_paise(month_paise or 0), quantity=month_quantity or 0))
+        total = totals.setdefault(customer_id, [0, 0, 0])
+        total[0] += int(month_paise or 0)
+        total[1] += month_quantity or 0
+        total[2] += count
+    for customer_id, (balance_paise, quantity, count) in totals.items():
+        db.session.add(CustomerBalance(customer_id=customer_id, balance=from_paise(balance_paise),
+                                       total_quantity=quantity, entry_count=count))
+    # Entries carry their running balance, so they are written in sale order per customer
+    running = {}
+    batch = []
+    ordered = db.session.execute(
+        select(sales.c.id, sales.c.customer_id, sales.c.date, sales.c.quantity, sales.c.price)
+        .where(sales.c.customer_id.isnot(None))
+        .order_by(sales.c.customer_id, sales.c.date, sales.c.id)
+    ).all()
+    for sale_id, customer_id, date, quantity, price in ordered:
+        amount = sale_amount(quantity, price)
+        running[customer_id] = running.get(customer_id, Decimal('0.00')) + amount
+        batch.append({
+            'customer_id': customer_id, 'sale_id': sale_id, 'entry_type': 'sale',
+            'period': sale_period(date), 'quantity': quantity, 'amount': amount,
+            'balance_after': running[customer_id], 'created_at': datetime.utcnow()
+        })
+        if len(batch) >= 1000:
+            db.session.execute(insert(CustomerLedgerEntry), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(CustomerLedgerEntry), batch)
+    db.session.commit()
+    return len(totals)
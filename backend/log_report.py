@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Summarize the backend's JSON logs (see backend/logs.py).
+
+Reads log lines from files or stdin, skips anything that is not a JSON
+record, and prints request counts and latency percentiles per route and
+status, followed by warning/error counts per logger.
+
+Usage:
+    pm2 logs vks-backend --raw --lines 100000 | python backend/log_report.py
+    python backend/log_report.py /var/log/vkswebui/app.log [--top 20]
+"""
+
+import argparse
+import fileinput
+import json
+from collections import Counter, defaultdict
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(lines):
+    """({(route, status): [durations]}, Counter((logger, level)))."""
+    durations = defaultdict(list)
+    problems = Counter()
+    for line in lines:
+        start = line.find('{')
+        if start < 0:
+            continue
+        # Cheap substring checks first; only candidate lines are parsed
+        is_request = '"event": "request"' in line
+        if not is_request and '"level": "WARNING"' not in line and '"level": "ERROR"' not in line \
+                and '"level": "CRITICAL"' not in line:
+            continue
+        try:
+            record = json.loads(line[start:])
+        except ValueError:
+            continue
+        if is_request:
+            key = (record.get('route') or record.get('path'), record.get('status'))
+            durations[key].append(float(record.get('duration_ms') or 0))
+        else:
+            problems[(record.get('logger'), record.get('level'))] += 1
+    return durations, problems
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate backend JSON logs by route and status.')
+    parser.add_argument('files', nargs='*', help='log files (default: stdin)')
+    parser.add_argument('--top', type=int, default=20, help='routes to show, busiest first')
+    args = parser.parse_args()
+
+    durations, problems = summarize(fileinput.input(args.files or ('-',), errors='replace'))
+    if not durations and not problems:
+        print("No JSON log records found (is LOG_FORMAT=json?).")
+        return
+
+    print("| route | status | count | p50 ms | p95 ms | max ms |")
+    print("|-------|-------:|------:|-------:|-------:|-------:|")
+    busiest = sorted(durations.items(), key=lambda item: len(item[1]), reverse=True)[:args.top]
+    for (route, status), values in busiest:
+        values.sort()
+        print(f"| {route} | {status} | {len(values)} | {percentile(values, 50):.1f} | "
+              f"{percentile(values, 95):.1f} | {values[-1]:.1f} |")
+
+    errors = sum(len(v) for (route, status), v in durations.items() if status and int(status) >= 500)
+    total = sum(len(v) for v in durations.values())
+    print()
+    print(f"Requests: {total}, 5xx: {errors}")
+    for (logger, level), count in problems.most_common():
+        print(f"{level:8} {count:6}  {logger}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from flask import g, has_request_context, request
+
+# Structured, non-blocking logging.
+#
+# Records from the backend.* loggers go into a bounded in-memory queue; one
+# QueueListener thread per process formats them as JSON lines and writes them
+# to stderr (or LOG_FILE). A request only ever does a put_nowait(): if the
+# writer falls behind and the queue fills up, records are dropped and counted
+# instead of blocking. Every request also emits one 'request' record with its
+# route, status and latency, tagged with the same request_id as the records
+# logged while it ran (also returned in the X-Request-ID header).
+#
+#   LOG_LEVEL=INFO                                   default level
+#   LOG_LEVELS=backend.routes=DEBUG,backend.cache=WARNING   per-module levels
+#   LOG_FORMAT=json|text    LOG_FILE=/path/to/file    LOG_QUEUE_SIZE=10000
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+LOG_FILE = os.environ.get('LOG_FILE')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+# 'backend' when run as the backend package
+PACKAGE_LOGGER = __name__.rpartition('.')[0] or 'backend'
+ACCESS_LOGGER = f'{PACKAGE_LOGGER}.access'
+# LogRecord attributes that are not user-supplied extra fields
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, request_id and any extra fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class RequestContextFilter(logging.Filter):
+    """Tags records with the current request id (runs in the thread that logs)."""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id') and has_request_context():
+            record.request_id = g.get('request_id')
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of waiting on a full queue.
+
+    prepare() (inherited) merges the message, arguments and traceback in the
+    calling thread, so the writer never touches request objects.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_handler = None
+_listener = None
+
+def _output_handler():
+    handler = logging.FileHandler(LOG_FILE) if LOG_FILE else logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s',
+                                               defaults={'request_id': '-'}))
+    return handler
+
+def parse_levels(spec):
+    """'backend.routes=DEBUG,backend.cache=WARNING' -> {logger: level}."""
+    levels = {}
+    for item in spec.split(','):
+        name, _, level = item.strip().partition('=')
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def _log_request_start():
+    g.request_id = (request.headers.get(REQUEST_ID_HEADER) or '')[:64] or uuid.uuid4().hex
+    g.request_started = time.perf_counter()
+
+def _log_request_end(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    user = g.get('_login_user')
+    logging.getLogger(ACCESS_LOGGER).info('request', extra={
+        'event': 'request',
+        'method': request.method,
+        'path': request.path,
+        'route': request.url_rule.rule if request.url_rule else None,
+        'status': response.status_code,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+        'user_id': getattr(user, 'id', None) if getattr(user, 'is_authenticated', False) else None,
+    })
+    response.headers[REQUEST_ID_HEADER] = g.request_id
+    return response
+
+def init_logging(app):
+    """Route backend.* logging through the background writer and log every request."""
+    global _handler, _listener
+    if _listener is not None:
+        return
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _handler = NonBlockingQueueHandler(log_queue)
+    _handler.addFilter(RequestContextFilter())
+    _listener = logging.handlers.QueueListener(log_queue, _output_handler(), respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    backend_logger = logging.getLogger(PACKAGE_LOGGER)
+    backend_logger.setLevel(LOG_LEVEL)
+    backend_logger.addHandler(_handler)
+    backend_logger.propagate = False
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    app.before_request(_log_request_start)
+    app.after_request(_log_request_end)
+
+def dropped_records():
+    return _handler.dropped if _handler else 0
@@ -0,0 +1,136 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_request_context
+from sqlalchemy import text, select, func
+from . import db
+from .models import Center, Customer
+from .events import broker
+
+log = logging.getLogger(__name__)
+
+# Compact id/name lookups for dropdowns and typeahead.
+#
+# PostgreSQL: prefix search runs in SQL on lower(name), backed by a pg_trgm GIN
+# index that also serves LIKE patterns with a leading wildcard later on.
+# SQLite (dev): each worker keeps a sorted (casefolded name, name, id) list per
+# model and answers prefix queries with a binary search. The list is rebuilt
+# lazily after a create/update/delete of that entity is published. On SQLite
+# those events only reach the worker that made the write, so a list is also
+# rebuilt once it is LOOKUP_TTL_SECONDS old; that bounds how long another
+# worker can miss a new name. As in cache.py, a list loaded while an
+# invalidation came in is used for that one search but not kept.
+
+LOOKUP_DEFAULT_LIMIT = 20
+LOOKUP_MAX_LIMIT = 100
+LOOKUP_MAX_IDS = 500
+LOOKUP_TTL_SECONDS = float(os.environ.get('LOOKUP_TTL_SECONDS', 30))
+
+# Entity name (as published by routes.py) -> model with id and name columns
+LOOKUP_MODELS = {
+    'customers': Customer,
+    'centers': Center,
+}
+
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+def ensure_lookup_indexes():
+    """Create the trigram name indexes on PostgreSQL. Safe to run at every startup."""
+    if not _is_postgres():
+        return
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            for model in LOOKUP_MODELS.values():
+                table = model.__table__.name
+                conn.execute(text(
+                    f'CREATE INDEX IF NOT EXISTS "ix_{table}_name_trgm" ON "{table}" '
+                    f'USING gin (lower(name) gin_trgm_ops)'
+                ))
+    except Exception as e:
+        # Lookups still work without the index, just with a sequential scan
+        log.warning('Lookup index setup error: %s', e)
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+class PrefixIndex:
+    """Sorted in-memory name index for one model, rebuilt when marked stale or expired."""
+
+    def __init__(self, model, ttl=LOOKUP_TTL_SECONDS):
+        self.model = model
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._keys = None
+        self._entries = None
+        self._expires_at = 0.0
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._keys = None
+            self._entries = None
+
+    def _load(self):
+        # Read from the primary so a just-published write is always included
+        route = g.pop('db_route', None) if has_request_context() else None
+        try:
+            rows = db.session.execute(select(self.model.id, self.model.name)).all()
+        finally:
+            if route is not None:
+                g.db_route = route
+        entries = sorted(((name or '').casefold(), name, id_) for id_, name in rows)
+        return [e[0] for e in entries], entries
+
+    def search(self, prefix, limit):
+        with self._lock:
+            keys, entries = self._keys, self._entries
+            if self._expires_at < time.monotonic():
+                keys = None
+            generation = self._generation
+        if keys is None:
+            keys, entries = self._load()
+            with self._lock:
+                # Skip the store if a write invalidated the index while we were loading
+                if self._generation == generation:
+                    self._keys, self._entries = keys, entries
+                    self._expires_at = time.monotonic() + self.ttl
+        prefix = prefix.casefold()
+        results = []
+        for i in range(bisect_left(keys, prefix), len(keys)):
+            if not keys[i].startswith(prefix) or len(results) >= limit:
+                break
+            results.append({'id': entries[i][2], 'name': entries[i][1]})
+        return results
+
+_prefix_indexes = {entity: PrefixIndex(model) for entity, model in LOOKUP_MODELS.items()}
+
+def _on_event(event):
+    index = _prefix_indexes.get(event.get('entity'))
+    if index is not None:
+        index.invalidate()
+
+broker.add_observer(_on_event)
+
+def lookup_by_prefix(entity, q, limit=LOOKUP_DEFAULT_LIMIT):
+    """Up to limit {'id', 'name'} pairs whose name starts with q (case-insensitive), by name."""
+    model = LOOKUP_MODELS[entity]
+    q = (q or '').strip()
+    if not _is_postgres():
+        return _prefix_indexes[entity].search(q, limit)
+    query = select(model.id, model.name).order_by(model.name, model.id).limit(limit)
+    if q:
+        query = query.where(func.lower(model.name).like(_escape_like(q.lower()) + '%', escape='\\'))
+    return [{'id': id_, 'name': name} for id_, name in db.session.execute(query).all()]
+
+def lookup_by_ids(entity, ids):
+    """{'id', 'name'} pairs for the given ids, e.g. to label rows that reference them."""
+    model = LOOKUP_MODELS[entity]
+    if not ids:
+        return []
+    query = select(model.id, model.name).where(model.id.in_(ids)).order_by(model.id)
+    return [{'id': id_, 'name': name} for id_, name in db.session.execute(query).all()]
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Apply schema migrations online (see backend/migrations.py) without dropping data.
+
+Usage:
+    python backend/migrate.py status
+    python backend/migrate.py up [--to VERSION] [--dry-run] [--batch-size N] [--pause SECONDS]
+
+--dry-run lists the pending steps with estimated rows and duration and changes
+nothing. An interrupted run (Ctrl+C, deploy timeout) is safe: run `up` again and
+backfills continue from their last committed batch.
+"""
+
+import argparse
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__) + '/..'))
+from backend import create_app, db
+from backend.migrations import (MIGRATIONS, MIGRATION_BATCH_SIZE, MIGRATION_BATCH_PAUSE_SECONDS,
+                                applied_versions, plan, migrate)
+
+def _duration(seconds):
+    if seconds < 60:
+        return f'{seconds:.1f}s'
+    return f'{seconds // 60:.0f}m {seconds % 60:.0f}s'
+
+def status(engine):
+    applied = applied_versions(engine)
+    for migration in MIGRATIONS:
+        row = applied.get(migration.version)
+        mark = f"✅ applied {row.applied_at:%Y-%m-%d %H:%M} ({row.duration_ms} ms)" if row else '⏳ pending'
+        print(f"{migration.version:>4}  {migration.name:<45} {mark}")
+
+def dry_run(engine, args):
+    steps = plan(engine, args.to, args.batch_size, args.pause)
+    if not steps:
+        print("✅ Schema is up to date.")
+        return
+    print(f"🔍 Dry run: batch size {args.batch_size}, pause {args.pause}s (nothing is changed)")
+    for step in steps:
+        rows = '-' if step['rows'] is None else f"~{step['rows']} rows ({step['source']})"
+        print(f"{step['version']:>4}  ~{_duration(step['seconds']):<8} {rows:<30} {step['step']}")
+    print(f"⏱️  Estimated total: ~{_duration(sum(s['seconds'] for s in steps))}")
+
+def up(engine, args):
+    def report(migration, step):
+        print(f"🔧 {migration.version} {migration.name}: {step.describe()}")
+    applied = migrate(engine, args.to, args.batch_size, args.pause, report)
+    if applied:
+        print(f"✅ Applied migration(s): {', '.join(str(v) for v in applied)}")
+    else:
+        print("✅ Schema is up to date.")
+
+def main():
+    parser = argparse.ArgumentParser(description='Versioned online schema migrations.')
+    parser.add_argument('command', choices=('status', 'up'))
+    parser.add_argument('--to', type=int, help='stop after this version')
+    parser.add_argument('--dry-run', action='store_true', help='estimate pending steps without changing anything')
+    parser.add_argument('--batch-size', type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument('--pause', type=float, default=MIGRATION_BATCH_PAUSE_SECONDS,
+                        help='seconds to sleep between backfill batches')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        engine = db.engine
+    if args.command == 'status':
+        status(engine)
+    elif args.dry_run:
+        dry_run(engine, args)
+    else:
+        up(engine, args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Script to convert money columns from FLOAT to NUMERIC(14, 2) on PostgreSQL.
+Existing values are rounded to paise. SQLite stores NUMERIC and REAL the same
+way, so there is nothing to alter there; exact totals come from the paise
+arithmetic in backend/aggregates.py.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__) + '/..'))
+from sqlalchemy import text
+from backend import create_app, db
+from backend.money import MONEY_PRECISION, MONEY_SCALE
+
+# (table, column) pairs holding rupee amounts. backend/models.py is kept with the
+# deployment, not in this repository: declare the same columns there with
+# money.money_column(...) so they load as Decimal, as the app.py models do.
+MONEY_COLUMNS = [
+    ('collection', 'amount'),
+    ('sale', 'price'),
+    ('account', 'balance'),
+    ('center_account_details', 'AMOUNT'),
+]
+
+def migrate_money_columns():
+    """ALTER every money column to NUMERIC, rounding existing values."""
+    app = create_app()
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            print(f"ℹ️  {db.engine.dialect.name}: column types are not enforced, nothing to migrate.")
+            return
+        numeric = f'NUMERIC({MONEY_PRECISION}, {MONEY_SCALE})'
+        with db.engine.begin() as conn:
+            for table, column in MONEY_COLUMNS:
+                print(f"🔧 {table}.{column} -> {numeric}")
+                conn.execute(text(
+                    f'ALTER TABLE "{table}" ALTER COLUMN "{column}" TYPE {numeric} '
+                    f'USING ROUND("{column}"::numeric, {MONEY_SCALE})'
+                ))
+        print("✅ Money columns migrated.")
+
+if __name__ == "__main__":
+    migrate_money_columns()
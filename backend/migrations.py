@@ -0,0 +1,404 @@
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime
+from sqlalchemy import text, inspect
+from . import db
+from .imports import ImportedKey
+
+log = logging.getLogger(__name__)
+
+# Versioned, online schema migrations (run with backend/migrate.py).
+#
+# create_all() only creates missing tables and recreate_database.py drops
+# everything, so changes to existing tables used to mean downtime or hand-written
+# SQL. Each Migration here has a version and a list of steps, and the versions
+# applied so far are recorded in schema_version. Steps are additive only and are
+# written to run while the app keeps serving:
+#
+#   AddColumn     nullable or constant-default column (metadata-only on
+#                 PostgreSQL 11+ and SQLite, no table rewrite)
+#   AddIndex      CREATE INDEX CONCURRENTLY on PostgreSQL, so writes continue;
+#                 on a partitioned table, per partition and then attached
+#   CreateTables  new tables from models, checkfirst
+#   Backfill      an UPDATE run in key order, MIGRATION_BATCH_SIZE rows per
+#                 transaction with MIGRATION_BATCH_PAUSE_SECONDS between batches
+#   CopyRows      an INSERT ... SELECT into a new table, batched the same way
+#
+# On PostgreSQL, DDL runs with lock_timeout, so a statement gives up instead of
+# queueing behind a long transaction and blocking everyone queued after it.
+# Every step is idempotent. A backfill stores the last key it committed in
+# migration_backfill, in the same transaction as the batch, so an interrupted
+# or failed run resumes where it stopped when run again. A migration is only
+# recorded as applied once all of its steps have finished.
+#
+# A dry run changes nothing: it lists the pending steps with row counts from the
+# planner statistics (pg_class / sqlite_stat1, or the key range when there are
+# none) and an estimated duration.
+
+MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', 10000))
+MIGRATION_BATCH_PAUSE_SECONDS = float(os.environ.get('MIGRATION_BATCH_PAUSE_SECONDS', 0.5))
+MIGRATION_LOCK_TIMEOUT_MS = int(os.environ.get('MIGRATION_LOCK_TIMEOUT_MS', 5000))
+# Throughput assumed by dry runs
+MIGRATION_BACKFILL_ROWS_PER_SECOND = float(os.environ.get('MIGRATION_BACKFILL_ROWS_PER_SECOND', 20000))
+MIGRATION_INDEX_ROWS_PER_SECOND = float(os.environ.get('MIGRATION_INDEX_ROWS_PER_SECOND', 200000))
+MIGRATION_ADVISORY_LOCK_ID = 7305001
+
+class SchemaVersion(db.Model):
+    __tablename__ = 'schema_version'
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    duration_ms = db.Column(db.Integer)
+
+class BackfillProgress(db.Model):
+    __tablename__ = 'migration_backfill'
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    step = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    last_key = db.Column(db.BigInteger)
+    rows_updated = db.Column(db.BigInteger, nullable=False, default=0)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+def is_postgres(engine):
+    return engine.dialect.name == 'postgresql'
+
+# Helper: estimated row count from planner statistics, without scanning the table
+def estimate_rows(conn, table, key='id'):
+    """(rows, source) for a table."""
+    if is_postgres(conn.engine):
+        rows = conn.execute(text(
+            "SELECT GREATEST(COALESCE(MAX(p.reltuples), 0), COALESCE(SUM(c.reltuples), 0))::bigint "
+            "FROM pg_class p LEFT JOIN pg_inherits i ON i.inhparent = p.oid "
+            "LEFT JOIN pg_class c ON c.oid = i.inhrelid WHERE p.relname = :table"
+        ), {'table': table}).scalar()
+        if rows:
+            return int(rows), 'pg_class'
+    elif inspect(conn).has_table('sqlite_stat1'):
+        stat = conn.execute(text('SELECT stat FROM sqlite_stat1 WHERE tbl = :table LIMIT 1'),
+                            {'table': table}).scalar()
+        if stat:
+            return int(stat.split()[0]), 'sqlite_stat1'
+    # No statistics yet: the key range, read from the primary key index
+    low, high = conn.execute(text(f'SELECT MIN("{key}"), MAX("{key}") FROM "{table}"')).one()
+    return (high - low + 1 if low is not None else 0), 'key range'
+
+def _ddl_connection(engine, autocommit=False):
+    conn = engine.connect()
+    if autocommit:
+        conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+    if is_postgres(engine):
+        conn.execute(text(f'SET lock_timeout = {MIGRATION_LOCK_TIMEOUT_MS}'))
+    return conn
+
+class AddColumn:
+    """ALTER TABLE ADD COLUMN; the column must be nullable or have a constant default."""
+
+    def __init__(self, table, column, type_, default=None):
+        self.table = table
+        self.column = column
+        self.type = type_
+        self.default = default  # SQL literal, e.g. "0" or "'pending'"
+
+    def describe(self):
+        return f'add column {self.table}.{self.column}'
+
+    def estimate(self, conn):
+        return {'rows': None, 'seconds': 0.0}
+
+    def run(self, engine, migration, index):
+        if self.column in {c['name'] for c in inspect(engine).get_columns(self.table)}:
+            return
+        ddl = f'ALTER TABLE "{self.table}" ADD COLUMN "{self.column}" {self.type.compile(dialect=engine.dialect)}'
+        if self.default is not None:
+            ddl += f' DEFAULT {self.default}'
+        with _ddl_connection(engine) as conn:
+            conn.execute(text(ddl))
+            conn.commit()
+
+class AddIndex:
+    """CREATE INDEX without blocking writes (CONCURRENTLY on PostgreSQL).
+
+    On a partitioned table the parent index is created ON ONLY the parent, each
+    partition's index is built concurrently and then attached; the parent index
+    becomes valid once every partition has one.
+    """
+
+    def __init__(self, name, table, columns, unique=False):
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.unique = unique
+
+    def describe(self):
+        return f"add index {self.name} on {self.table} ({', '.join(self.columns)})"
+
+    def estimate(self, conn):
+        rows, source = estimate_rows(conn, self.table)
+        return {'rows': rows, 'source': source, 'seconds': rows / MIGRATION_INDEX_ROWS_PER_SECOND}
+
+    def run(self, engine, migration, index):
+        columns = ', '.join(f'"{c}"' for c in self.columns)
+        unique = 'UNIQUE ' if self.unique else ''
+        if not is_postgres(engine):
+            with _ddl_connection(engine) as conn:
+                conn.execute(text(f'CREATE {unique}INDEX IF NOT EXISTS "{self.name}" ON "{self.table}" ({columns})'))
+                conn.commit()
+            return
+        with _ddl_connection(engine, autocommit=True) as conn:
+            self._create(conn, self.table, self.name, f'{unique}INDEX', columns)
+
+    def _create(self, conn, table, name, kind, columns):
+        valid = conn.execute(text(
+            'SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name'
+        ), {'name': name}).scalar()
+        if valid:
+            return
+        if not _partitioned(conn, table):
+            # A failed CONCURRENTLY build leaves an invalid index behind; drop it and build again
+            if valid is False:
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+            conn.execute(text(f'CREATE {kind} CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" ({columns})'))
+            return
+        # A partitioned parent cannot be indexed concurrently: an ON ONLY index takes no
+        # lock on the partitions, and stays invalid until each of them has one attached
+        conn.execute(text(f'CREATE {kind} IF NOT EXISTS "{name}" ON ONLY "{table}" ({columns})'))
+        for partition in _partitions(conn, table):
+            partition_index = _partition_index_name(name, partition)
+            self._create(conn, partition, partition_index, kind, columns)
+            # Attaching an index that is already attached is a no-op, so a re-run resumes here
+            conn.execute(text(f'ALTER INDEX "{name}" ATTACH PARTITION "{partition_index}"'))
+
+# Helper: whether a PostgreSQL table is a partitioned parent
+def _partitioned(conn, table):
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table"
+    ), {'table': table}).scalar())
+
+def _partitions(conn, table):
+    return conn.execute(text(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :table ORDER BY c.relname'
+    ), {'table': table}).scalars().all()
+
+def _partition_index_name(name, partition):
+    """<partition>_<index name>, shortened with a hash past PostgreSQL's 63-character limit."""
+    full = f'{partition}_{name}'
+    if len(full) <= 63:
+        return full
+    return f'{full[:54]}_{hashlib.md5(full.encode()).hexdigest()[:8]}'
+
+class CreateTables:
+    """Create new tables from their models (existing ones are left alone)."""
+
+    def __init__(self, *models):
+        self.models = models
+
+    def describe(self):
+        return 'create tables ' + ', '.join(m.__table__.name for m in self.models)
+
+    def estimate(self, conn):
+        return {'rows': None, 'seconds': 0.0}
+
+    def run(self, engine, migration, index):
+        for model in self.models:
+            model.__table__.create(engine, checkfirst=True)
+
+class Backfill:
+    """UPDATE table SET <assignments> [WHERE <where>] in resumable, throttled key-ordered batches.
+
+    key must be an integer column that is unique and indexed (the primary key).
+    """
+
+    def __init__(self, table, assignments, where=None, key='id', batch_size=None):
+        self.table = table
+        self.assignments = assignments
+        self.where = where
+        self.key = key
+        self.batch_size = batch_size  # overrides the run's batch size for this step
+
+    def describe(self):
+        return f"backfill {self.table}: SET {self.assignments}" + (f' WHERE {self.where}' if self.where else '')
+
+    def statement(self):
+        """The batch statement; :last and :high bound the keys of the batch."""
+        where = f' AND ({self.where})' if self.where else ''
+        return text(f'UPDATE "{self.table}" SET {self.assignments} '
+                    f'WHERE "{self.key}" > :last AND "{self.key}" <= :high{where}')
+
+    def ready(self, engine):
+        return True
+
+    def estimate(self, conn, batch_size=MIGRATION_BATCH_SIZE, pause=MIGRATION_BATCH_PAUSE_SECONDS):
+        rows, source = estimate_rows(conn, self.table, self.key)
+        batches = -(-rows // (self.batch_size or batch_size))
+        return {'rows': rows, 'source': source, 'batches': batches,
+                'seconds': rows / MIGRATION_BACKFILL_ROWS_PER_SECOND + max(batches - 1, 0) * pause}
+
+    def run(self, engine, migration, index, batch_size=MIGRATION_BATCH_SIZE, pause=MIGRATION_BATCH_PAUSE_SECONDS):
+        batch_size = self.batch_size or batch_size
+        if not self.ready(engine):
+            return
+        progress = BackfillProgress.__table__
+        step = (progress.c.version == migration.version) & (progress.c.step == index)
+        with engine.begin() as conn:
+            state = conn.execute(progress.select().where(step)).first()
+            if state is None:
+                conn.execute(progress.insert().values(version=migration.version, step=index, rows_updated=0,
+                                                      updated_at=datetime.utcnow()))
+            elif state.finished_at is not None:
+                return
+        last_key = state.last_key if state is not None else None
+        if last_key is None:
+            with engine.connect() as conn:
+                low = conn.execute(text(f'SELECT MIN("{self.key}") FROM "{self.table}"')).scalar()
+            last_key = low - 1 if low is not None else 0
+        next_batch = text(
+            f'SELECT MAX("{self.key}") FROM (SELECT "{self.key}" FROM "{self.table}" '
+            f'WHERE "{self.key}" > :last ORDER BY "{self.key}" LIMIT :n) batch'
+        )
+        update = self.statement()
+        while True:
+            started = time.perf_counter()
+            with engine.begin() as conn:
+                high = conn.execute(next_batch, {'last': last_key, 'n': batch_size}).scalar()
+                if high is None:
+                    conn.execute(progress.update().where(step).values(finished_at=datetime.utcnow(),
+                                                                      updated_at=datetime.utcnow()))
+                    return
+                updated = conn.execute(update, {'last': last_key, 'high': high}).rowcount
+                conn.execute(progress.update().where(step).values(
+                    last_key=high, rows_updated=progress.c.rows_updated + max(updated, 0),
+                    updated_at=datetime.utcnow()))
+            last_key = high
+            log.info('Backfill batch', extra={'migration': migration.version, 'table': self.table,
+                                               'last_key': high, 'rows': updated,
+                                               'ms': round((time.perf_counter() - started) * 1000, 1)})
+            time.sleep(pause)
+
+class CopyRows(Backfill):
+    """INSERT ... SELECT in resumable batches over the keys of table (the statement uses :last and :high).
+
+    Skipped when source_table does not exist, e.g. on a database created after it was retired.
+    """
+
+    def __init__(self, table, insert_select, source_table, key='id', batch_size=None):
+        super().__init__(table, None, key=key, batch_size=batch_size)
+        self.insert_select = insert_select
+        self.source_table = source_table
+
+    def describe(self):
+        return f'copy rows from {self.source_table}, batched by {self.table}.{self.key}'
+
+    def statement(self):
+        return text(self.insert_select)
+
+    def ready(self, engine):
+        return inspect(engine).has_table(self.source_table)
+
+class Migration:
+    def __init__(self, version, name, *steps):
+        self.version = version
+        self.name = name
+        self.steps = steps
+
+# Append new migrations with the next version; never edit one that has shipped
+MIGRATIONS = (
+    Migration(1, 'collection and sale foreign key indexes',
+        AddIndex('ix_collection_center_id_date', 'collection', ('center_id', 'date')),
+        AddIndex('ix_sale_customer_id_date', 'sale', ('customer_id', 'date'))),
+    # Amounts entered before the money handling fix can carry float noise (100.10000000001)
+    Migration(2, 'round money amounts to paise',
+        Backfill('collection', 'amount = ROUND(CAST(amount AS NUMERIC), 2)',
+                 where='amount <> ROUND(CAST(amount AS NUMERIC), 2)'),
+        Backfill('sale', 'price = ROUND(CAST(price AS NUMERIC), 2)',
+                 where='price <> ROUND(CAST(price AS NUMERIC), 2)'),
+        Backfill('account', 'balance = ROUND(CAST(balance AS NUMERIC), 2)',
+                 where='balance <> ROUND(CAST(balance AS NUMERIC), 2)')),
+    # Idempotency reservations record their owning request (idempotency.py)
+    Migration(3, 'idempotency reservation owner',
+        AddColumn('idempotency_record', 'owner', db.String(100))),
+    # Imported row keys are scoped per user; the retired imported_key table was shared by everyone
+    Migration(4, 'per-user imported row keys',
+        CreateTables(ImportedKey),
+        CopyRows('import_job',
+                 'INSERT INTO imported_row_key (user_id, entity, idempotency_key, job_id, created_at) '
+                 'SELECT j.user_id, k.entity, k.idempotency_key, k.job_id, k.created_at '
+                 'FROM imported_key k JOIN import_job j ON j.id = k.job_id '
+                 'WHERE j.id > :last AND j.id <= :high',
+                 source_table='imported_key', batch_size=5)),
+)
+
+def ensure_migration_tables(engine):
+    SchemaVersion.__table__.create(engine, checkfirst=True)
+    BackfillProgress.__table__.create(engine, checkfirst=True)
+
+def applied_versions(engine):
+    ensure_migration_tables(engine)
+    with engine.connect() as conn:
+        return {row.version: row for row in conn.execute(SchemaVersion.__table__.select())}
+
+def pending_migrations(engine, target=None):
+    applied = applied_versions(engine)
+    return [m for m in MIGRATIONS if m.version not in applied and (target is None or m.version <= target)]
+
+def plan(engine, target=None, batch_size=MIGRATION_BATCH_SIZE, pause=MIGRATION_BATCH_PAUSE_SECONDS):
+    """Dry run: the pending steps with estimated rows and seconds. Changes nothing."""
+    steps = []
+    with engine.connect() as conn:
+        for migration in pending_migrations(engine, target):
+            for step in migration.steps:
+                if isinstance(step, Backfill):
+                    estimate = step.estimate(conn, batch_size, pause)
+                else:
+                    estimate = step.estimate(conn)
+                steps.append(dict(estimate, version=migration.version, migration=migration.name,
+                                  step=step.describe()))
+    return steps
+
+class _RunnerLock:
+    """One migration runner at a time (PostgreSQL advisory lock; SQLite relies on its write lock)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.conn = None
+
+    def __enter__(self):
+        if is_postgres(self.engine):
+            self.conn = self.engine.connect()
+            if not self.conn.execute(text('SELECT pg_try_advisory_lock(:id)'),
+                                     {'id': MIGRATION_ADVISORY_LOCK_ID}).scalar():
+                self.conn.close()
+                raise RuntimeError('Another migration run holds the lock.')
+        return self
+
+    def __exit__(self, *exc):
+        if self.conn is not None:
+            self.conn.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': MIGRATION_ADVISORY_LOCK_ID})
+            self.conn.close()
+
+def migrate(engine, target=None, batch_size=MIGRATION_BATCH_SIZE, pause=MIGRATION_BATCH_PAUSE_SECONDS,
+            report=None):
+    """Apply pending migrations in version order; returns the versions applied.
+
+    report(migration, step) is called before each step.
+    """
+    applied = []
+    with _RunnerLock(engine):
+        for migration in pending_migrations(engine, target):
+            started = time.perf_counter()
+            log.info('Applying migration', extra={'migration': migration.version, 'name': migration.name})
+            for index, step in enumerate(migration.steps):
+                if report:
+                    report(migration, step)
+                if isinstance(step, Backfill):
+                    step.run(engine, migration, index, batch_size, pause)
+                else:
+                    step.run(engine, migration, index)
+            with engine.begin() as conn:
+                conn.execute(SchemaVersion.__table__.insert().values(
+                    version=migration.version, name=migration.name, applied_at=datetime.utcnow(),
+                    duration_ms=int((time.perf_counter() - started) * 1000)))
+            applied.append(migration.version)
+    return applied
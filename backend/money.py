@@ -0,0 +1,46 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from . import db
+
+# Money is stored as NUMERIC(14, 2) (rupees with paise) and handled as Decimal in
+# Python. Sums are computed in integer paise so that neither SQLite (which keeps
+# NUMERIC as REAL) nor Python floats can introduce drift.
+
+MONEY_PRECISION = 14
+MONEY_SCALE = 2
+PAISE = Decimal('0.01')
+
+def money_column(**kwargs):
+    """Column for a money amount: NUMERIC(14, 2), returned as Decimal."""
+    return db.Column(db.Numeric(MONEY_PRECISION, MONEY_SCALE, asdecimal=True), **kwargs)
+
+def parse_money(value):
+    """Convert request input (number or string) to a Decimal rounded to paise.
+
+    Raises ValueError for anything that is not a finite amount.
+    """
+    if isinstance(value, bool) or value is None:
+        raise ValueError('Amount is required.')
+    try:
+        # str() first so a float like 0.1 becomes Decimal('0.1'), not its binary expansion
+        amount = Decimal(str(value).strip().replace(',', ''))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'Invalid amount: {value!r}')
+    if not amount.is_finite():
+        raise ValueError(f'Invalid amount: {value!r}')
+    return amount.quantize(PAISE, rounding=ROUND_HALF_UP)
+
+def to_paise(value):
+    """Money value (Decimal, float, str or int rupees) as an integer number of paise."""
+    if value is None:
+        return 0
+    return int(parse_money(value) * 100)
+
+def from_paise(paise):
+    """Integer paise back to a Decimal rupee amount."""
+    return (Decimal(int(paise)) / 100).quantize(PAISE)
+
+def money_json(value):
+    """Money value for a JSON response (a number with at most two decimals)."""
+    if value is None:
+        return None
+    return float(parse_money(value))
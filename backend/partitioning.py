@@ -0,0 +1,318 @@
+import re
+from datetime import date, datetime
+from sqlalchemy import text, select, table, column, union_all
+from . import db
+
+# Time-based layout for the Collection and Sale tables.
+#
+# PostgreSQL: the tables are range-partitioned by month on their YYYY-MM-DD date
+# column (collection_p2025_01, ...). Archiving a closed financial year merges its
+# monthly partitions into one frozen yearly partition (collection_fy2023) that
+# stays attached, so every query on the parent still sees it.
+#
+# SQLite (dev): there is no partitioning, so archiving moves a closed financial
+# year into a shard table (collection_fy2023) recorded in archive_shard, and
+# read_source() unions the hot table with its shards for list/summary queries.
+
+PARTITIONED_TABLES = ('collection', 'sale')
+DATE_COLUMN = 'date'
+MONTHS_AHEAD = 3
+
+class ArchiveShard(db.Model):
+    __tablename__ = 'archive_shard'
+    id = db.Column(db.Integer, primary_key=True)
+    base_table = db.Column(db.String(50), nullable=False, index=True)
+    shard_table = db.Column(db.String(80), nullable=False, unique=True)
+    financial_year = db.Column(db.Integer, nullable=False)
+    date_from = db.Column(db.String(10), nullable=False)
+    date_to = db.Column(db.String(10), nullable=False)  # exclusive
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+def is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+def financial_year(day):
+    """Starting year of the April-March financial year containing a date or date string."""
+    if isinstance(day, str):
+        day = datetime.strptime(day[:10], '%Y-%m-%d').date()
+    return day.year if day.month >= 4 else day.year - 1
+
+def financial_year_range(fy):
+    """(inclusive start, exclusive end) date strings of financial year fy."""
+    return f'{fy}-04-01', f'{fy + 1}-04-01'
+
+def closed_financial_years(base_table, keep_years=1, today=None):
+    """Financial years with data in base_table that are not archived yet, except the last keep_years."""
+    current = financial_year(today or date.today())
+    # On PostgreSQL the parent still covers archived years (their shards stay attached)
+    oldest = db.session.execute(text(f'SELECT MIN("{DATE_COLUMN}") FROM "{base_table}"')).scalar()
+    if not oldest:
+        return []
+    archived = {fy for (fy,) in db.session.query(ArchiveShard.financial_year)
+                .filter(ArchiveShard.base_table == base_table)}
+    return [fy for fy in range(financial_year(oldest), current - keep_years + 1) if fy not in archived]
+
+def _month_start(year, month):
+    return f'{year:04d}-{month:02d}'
+
+def _next_month(year, month):
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+def _is_partitioned(conn, base_table):
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = :name"
+    ), {'name': base_table}).scalar())
+
+def _create_month_partition(conn, base_table, year, month):
+    next_year, next_month = _next_month(year, month)
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{base_table}_p{year:04d}_{month:02d}" PARTITION OF "{base_table}" '
+        f"FOR VALUES FROM ('{_month_start(year, month)}') TO ('{_month_start(next_year, next_month)}')"
+    ))
+
+def ensure_partitions(months_ahead=MONTHS_AHEAD, today=None):
+    """Create monthly partitions up to months_ahead months from now (PostgreSQL).
+
+    On SQLite this only makes sure the hot tables have a date index. Safe to run
+    at every startup and from cron.
+    """
+    today = today or date.today()
+    with db.engine.begin() as conn:
+        for base_table in PARTITIONED_TABLES:
+            if not is_postgres():
+                conn.execute(text(
+                    f'CREATE INDEX IF NOT EXISTS "ix_{base_table}_{DATE_COLUMN}" ON "{base_table}" ("{DATE_COLUMN}")'
+                ))
+                continue
+            if not _is_partitioned(conn, base_table):
+                continue
+            year, month = today.year, today.month
+            for _ in range(months_ahead + 1):
+                _create_month_partition(conn, base_table, year, month)
+                year, month = _next_month(year, month)
+
+def convert_to_partitioned(base_table):
+    """One-off PostgreSQL conversion of a plain table into a monthly partitioned one.
+
+    The primary key becomes (id, date) because PostgreSQL requires the partition
+    key in every unique constraint. Rows that fall outside the generated monthly
+    partitions (bad or empty dates) land in the _default partition. The id
+    sequence and the outgoing foreign keys (center_id, customer_id) move over to
+    the new table.
+    """
+    legacy = f'{base_table}_legacy'
+    with db.engine.begin() as conn:
+        if _is_partitioned(conn, base_table):
+            return False
+        conn.execute(text(f'ALTER TABLE "{base_table}" RENAME TO "{legacy}"'))
+        # Renaming a table keeps its sequence name, so look it up instead of guessing
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': legacy}).scalar()
+        # LIKE ... INCLUDING CONSTRAINTS copies CHECK and NOT NULL, not foreign keys
+        foreign_keys = conn.execute(text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'"
+        ), {'table': legacy}).all()
+        conn.execute(text(
+            f'CREATE TABLE "{base_table}" (LIKE "{legacy}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("{DATE_COLUMN}")'
+        ))
+        conn.execute(text(f'ALTER TABLE "{base_table}" ADD PRIMARY KEY (id, "{DATE_COLUMN}")'))
+        conn.execute(text(f'CREATE INDEX "ix_{base_table}_{DATE_COLUMN}" ON "{base_table}" ("{DATE_COLUMN}")'))
+        # The copied id default still uses the legacy sequence; re-own it so DROP TABLE keeps it
+        if sequence:
+            conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY "{base_table}".id'))
+        conn.execute(text(f'CREATE TABLE "{base_table}_default" PARTITION OF "{base_table}" DEFAULT'))
+        bounds = conn.execute(text(
+            f'SELECT MIN(SUBSTR("{DATE_COLUMN}", 1, 7)), MAX(SUBSTR("{DATE_COLUMN}", 1, 7)) FROM "{legacy}" '
+            f"WHERE \"{DATE_COLUMN}\" ~ '^[0-9]{{4}}-[0-9]{{2}}'"
+        )).one()
+        today = date.today()
+        first = bounds[0] or _month_start(today.year, today.month)
+        last = max(bounds[1] or first, _month_start(today.year, today.month))
+        year, month = int(first[:4]), int(first[5:7])
+        while _month_start(year, month) <= last:
+            _create_month_partition(conn, base_table, year, month)
+            year, month = _next_month(year, month)
+        conn.execute(text(f'INSERT INTO "{base_table}" SELECT * FROM "{legacy}"'))
+        conn.execute(text(f'DROP TABLE "{legacy}"'))
+        for name, definition in foreign_keys:
+            conn.execute(text(f'ALTER TABLE "{base_table}" ADD CONSTRAINT "{name}" {definition}'))
+    ensure_partitions()
+    return True
+
+def _record_shard(conn, base_table, shard, fy):
+    date_from, date_to = financial_year_range(fy)
+    # Counted from the shard itself, so rows merged by an interrupted run are included
+    row_count = conn.execute(text(f'SELECT COUNT(*) FROM "{shard}"')).scalar()
+    existing = conn.execute(select(ArchiveShard.id).where(ArchiveShard.shard_table == shard)).first()
+    if existing:
+        conn.execute(ArchiveShard.__table__.update()
+                     .where(ArchiveShard.id == existing.id)
+                     .values(row_count=row_count, archived_at=datetime.utcnow()))
+    else:
+        conn.execute(ArchiveShard.__table__.insert().values(
+            base_table=base_table, shard_table=shard, financial_year=fy,
+            date_from=date_from, date_to=date_to, row_count=row_count, archived_at=datetime.utcnow()
+        ))
+
+# Helper: whether a table is currently a partition of some parent
+def _is_attached(conn, name):
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE c.relname = :name"
+    ), {'name': name}).scalar())
+
+def _archive_postgres(base_table, fy, shard):
+    """Merge a year's monthly partitions into its shard one month at a time, then attach the shard.
+
+    Each month is detached in its own short transaction, so the hot parent is
+    only locked (ACCESS EXCLUSIVE) for the detach, then copied and dropped in a
+    second transaction that does not touch the parent. Months already merged
+    are not visible through the parent until the shard is attached at the end.
+    A re-run resumes with the months left, including one detached but not
+    copied yet.
+    """
+    date_from, date_to = financial_year_range(fy)
+    with db.engine.begin() as conn:
+        if not _is_partitioned(conn, base_table):
+            raise RuntimeError(f'{base_table} is not partitioned; run convert_to_partitioned first.')
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{shard}" (LIKE "{base_table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'WITH (fillfactor = 100)'
+        ))
+        # Attached or not: a month detached by an interrupted run is picked up again
+        months = conn.execute(text(
+            "SELECT relname FROM pg_class WHERE relkind = 'r' AND relname ~ :pattern ORDER BY relname"
+        ), {'pattern': f'^{base_table}_p[0-9]{{4}}_[0-9]{{2}}$'}).scalars().all()
+    moved = 0
+    for partition in months:
+        start = f'{partition[-7:-3]}-{partition[-2:]}'  # _pYYYY_MM -> YYYY-MM
+        if not (date_from[:7] <= start < date_to[:7]):
+            continue
+        with db.engine.begin() as conn:
+            if _is_attached(conn, partition):
+                conn.execute(text(f'ALTER TABLE "{base_table}" DETACH PARTITION "{partition}"'))
+        with db.engine.begin() as conn:
+            moved += conn.execute(text(f'INSERT INTO "{shard}" SELECT * FROM "{partition}"')).rowcount
+            conn.execute(text(f'DROP TABLE "{partition}"'))
+    with db.engine.begin() as conn:
+        # Stray rows in the default partition would block attaching the yearly range
+        params = {'a': date_from, 'b': date_to}
+        moved += conn.execute(text(
+            f'INSERT INTO "{shard}" SELECT * FROM "{base_table}_default" '
+            f'WHERE "{DATE_COLUMN}" >= :a AND "{DATE_COLUMN}" < :b'
+        ), params).rowcount
+        conn.execute(text(
+            f'DELETE FROM "{base_table}_default" WHERE "{DATE_COLUMN}" >= :a AND "{DATE_COLUMN}" < :b'
+        ), params)
+        if not _is_attached(conn, shard):
+            conn.execute(text(
+                f'ALTER TABLE "{base_table}" ATTACH PARTITION "{shard}" '
+                f"FOR VALUES FROM ('{date_from[:7]}') TO ('{date_to[:7]}')"
+            ))
+        # Recorded once the shard is attached; closed_financial_years() skips the year from then on
+        _record_shard(conn, base_table, shard, fy)
+    return moved
+
+def _archive_sqlite(conn, base_table, fy, shard):
+    date_from, date_to = financial_year_range(fy)
+    params = {'a': date_from, 'b': date_to}
+    # The row with the highest id stays hot: the tables have no AUTOINCREMENT, so
+    # SQLite would give its id to the next insert once it left the table
+    in_year = (f'"{DATE_COLUMN}" >= :a AND "{DATE_COLUMN}" < :b '
+               f'AND id < (SELECT MAX(id) FROM "{base_table}")')
+    pending = conn.execute(text(f'SELECT COUNT(*) FROM "{base_table}" WHERE {in_year}'), params).scalar()
+    if not pending:
+        return 0
+    # Same columns, types and primary key as the hot table (CREATE TABLE AS would drop them)
+    ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                       {'name': base_table}).scalar()
+    conn.execute(text(re.sub(rf'^CREATE TABLE\s+"?{re.escape(base_table)}"?',
+                             f'CREATE TABLE IF NOT EXISTS "{shard}"', ddl, count=1)))
+    moved = conn.execute(text(f'INSERT INTO "{shard}" SELECT * FROM "{base_table}" WHERE {in_year}'),
+                         params).rowcount
+    conn.execute(text(f'DELETE FROM "{base_table}" WHERE {in_year}'), params)
+    return moved
+
+def archive_financial_year(base_table, fy):
+    """Move one financial year of base_table into its archive shard. Returns rows moved."""
+    if base_table not in PARTITIONED_TABLES:
+        raise ValueError(f'{base_table} is not an archivable table.')
+    shard = f'{base_table}_fy{fy}'
+    if is_postgres():
+        moved = _archive_postgres(base_table, fy, shard)
+        # Archived data never changes again: freeze it once so vacuum can skip it
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text(f'VACUUM (FREEZE, ANALYZE) "{shard}"'))
+            conn.execute(text(f'ANALYZE "{base_table}"'))
+        return moved
+    # On SQLite the freed pages are reused by new rows; a whole-file VACUUM would
+    # block every writer in every worker, so it is left to offline maintenance
+    with db.engine.begin() as conn:
+        moved = _archive_sqlite(conn, base_table, fy, shard)
+        if moved:
+            _record_shard(conn, base_table, shard, fy)
+    return moved
+
+def archive_closed_years(keep_years=1, today=None):
+    """Archive every financial year older than the last keep_years, for both tables."""
+    results = []
+    for base_table in PARTITIONED_TABLES:
+        for fy in closed_financial_years(base_table, keep_years, today):
+            results.append((base_table, fy, archive_financial_year(base_table, fy)))
+    return results
+
+def shard_tables(base_table):
+    """Archive shards that must be read alongside base_table (SQLite only).
+
+    On PostgreSQL archived years are attached partitions, so the parent table
+    already covers them.
+    """
+    if is_postgres():
+        return []
+    shards = (db.session.query(ArchiveShard.shard_table)
+              .filter(ArchiveShard.base_table == base_table)
+              .order_by(ArchiveShard.financial_year)
+              .all())
+    return [shard for (shard,) in shards]
+
+def read_source(base_table):
+    """Selectable over the hot table plus its archive shards, named like the table.
+
+    Aggregates and list queries select from this instead of the model table so
+    archived years stay visible without callers knowing where rows live.
+    """
+    hot = db.metadata.tables[base_table]
+    shards = shard_tables(base_table)
+    if not shards:
+        return hot
+    names = [c.name for c in hot.columns]
+    selects = [select(*[hot.c[name] for name in names])]
+    for shard in shards:
+        shard_table = table(shard, *[column(name) for name in names])
+        selects.append(select(*[shard_table.c[name] for name in names]))
+    return union_all(*selects).subquery(base_table)
+
+def archived_rows(base_table, names=None):
+    """Rows of base_table that live in archive shards (empty on PostgreSQL), optionally only some columns."""
+    hot = db.metadata.tables[base_table]
+    names = names or [c.name for c in hot.columns]
+    rows = []
+    for shard in shard_tables(base_table):
+        shard_table = table(shard, *[column(name) for name in names])
+        rows.extend(db.session.execute(select(*[shard_table.c[name] for name in names])).all())
+    return rows
+
+def archive_status():
+    """Archived shards with their row counts, newest first."""
+    shards = ArchiveShard.query.order_by(ArchiveShard.financial_year.desc(), ArchiveShard.base_table).all()
+    return [{
+        'base_table': s.base_table,
+        'shard_table': s.shard_table,
+        'financial_year': s.financial_year,
+        'date_from': s.date_from,
+        'date_to': s.date_to,
+        'row_count': s.row_count,
+        'archived_at': s.archived_at.isoformat()
+    } for s in shards]
@@ -0,0 +1,191 @@
+from datetime import datetime
+from sqlalchemy import and_, bindparam, case, func, insert, literal, select, update
+from . import db
+from .models import CenterAccountDetails
+from .money import from_paise, money_json
+from .aggregates import paise
+from .partitioning import read_source
+from .audit import record_bulk_update
+
+# Payout runs: what each center is owed for a period, from its collections.
+#
+# A run aggregates collections per center in a single INSERT ... SELECT into
+# payout_line (amounts in integer paise, archived years included) and links each
+# line to the center's account details row (CODE = center id). Runs are
+# versioned per period: re-running a period adds version n+1 and marks the
+# earlier runs superseded, so past figures are never overwritten. Applying the
+# current run copies its amounts into CenterAccountDetails.AMOUNT in bulk.
+
+# Line status: ready (exactly one account row), no_account, multiple_accounts
+LINE_READY = 'ready'
+
+class PayoutRun(db.Model):
+    __tablename__ = 'payout_run'
+    id = db.Column(db.Integer, primary_key=True)
+    date_from = db.Column(db.String(10), nullable=False)
+    date_to = db.Column(db.String(10), nullable=False)  # inclusive
+    version = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(12), nullable=False, default='computed')  # computed, applied, superseded
+    center_count = db.Column(db.Integer, nullable=False, default=0)
+    collection_count = db.Column(db.Integer, nullable=False, default=0)
+    total_paise = db.Column(db.BigInteger, nullable=False, default=0)
+    ready_count = db.Column(db.Integer, nullable=False, default=0)
+    unmatched_count = db.Column(db.Integer, nullable=False, default=0)
+    created_by = db.Column(db.String(80), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    applied_at = db.Column(db.DateTime, nullable=True)
+    __table_args__ = (
+        db.UniqueConstraint('date_from', 'date_to', 'version', name='uq_payout_run_period_version'),
+    )
+
+class PayoutLine(db.Model):
+    __tablename__ = 'payout_line'
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, nullable=False)
+    center_id = db.Column(db.Integer, nullable=False)
+    collection_count = db.Column(db.Integer, nullable=False)
+    amount_paise = db.Column(db.BigInteger, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    # Key of the linked CenterAccountDetails row (set when status is ready)
+    SUB_CODE = db.Column(db.String(50), nullable=True)
+    BANK_ACC_NUMBER = db.Column(db.String(50), nullable=True)
+    NAME = db.Column(db.String(150), nullable=True)
+    IFSC = db.Column(db.String(20), nullable=True)
+    BRANCH = db.Column(db.String(150), nullable=True)
+    __table_args__ = (
+        db.UniqueConstraint('run_id', 'center_id', name='uq_payout_line_run_center'),
+    )
+
+ACCOUNT_KEY_FIELDS = ('BANK_ACC_NUMBER', 'NAME', 'IFSC', 'BRANCH')
+
+def _valid_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d') == value
+    except (TypeError, ValueError):
+        return False
+
+def _line_source(run_id, date_from, date_to):
+    """SELECT producing one payout_line row per center with collections in the period."""
+    src = read_source('collection')
+    totals = (select(src.c.center_id.label('center_id'),
+                     func.count().label('collection_count'),
+                     func.coalesce(func.sum(paise(src.c.amount)), 0).label('amount_paise'))
+              .select_from(src)
+              .where(src.c.center_id.isnot(None), src.c.date >= date_from, src.c.date <= date_to)
+              .group_by(src.c.center_id)
+              .subquery())
+    acc = CenterAccountDetails.__table__
+    # Per-column MIN is only used when the center has exactly one account row
+    accounts = (select(acc.c.CODE.label('code'), func.count().label('n'),
+                       *[func.min(acc.c[f]).label(f) for f in ('SUB_CODE',) + ACCOUNT_KEY_FIELDS])
+                .group_by(acc.c.CODE)
+                .subquery())
+    single = accounts.c.n == 1
+    status = case((accounts.c.n.is_(None), 'no_account'), (single, LINE_READY), else_='multiple_accounts')
+    return (select(literal(run_id), totals.c.center_id, totals.c.collection_count, totals.c.amount_paise, status,
+                   *[case((single, accounts.c[f]), else_=None) for f in ('SUB_CODE',) + ACCOUNT_KEY_FIELDS])
+            .select_from(totals.outerjoin(accounts, accounts.c.code == totals.c.center_id)))
+
+def run_payout(date_from, date_to, username=None):
+    """Compute a new payout run for an inclusive YYYY-MM-DD period and commit it.
+
+    Raises ValueError for a bad period. Earlier runs of the same period are
+    marked superseded.
+    """
+    if not _valid_date(date_from) or not _valid_date(date_to):
+        raise ValueError('from and to must be dates in YYYY-MM-DD format.')
+    if date_from > date_to:
+        raise ValueError('from must not be after to.')
+    period = (PayoutRun.date_from == date_from) & (PayoutRun.date_to == date_to)
+    latest = db.session.query(func.max(PayoutRun.version)).filter(period).scalar() or 0
+    run = PayoutRun(date_from=date_from, date_to=date_to, version=latest + 1, status='computed',
+                    created_by=username)
+    db.session.add(run)
+    db.session.flush()
+    columns = ['run_id', 'center_id', 'collection_count', 'amount_paise', 'status', 'SUB_CODE'] + \
+        list(ACCOUNT_KEY_FIELDS)
+    db.session.execute(insert(PayoutLine.__table__).from_select(columns, _line_source(run.id, date_from, date_to)))
+    lines = PayoutLine.__table__
+    centers, collections, total, ready = db.session.execute(
+        select(func.count(), func.coalesce(func.sum(lines.c.collection_count), 0),
+               func.coalesce(func.sum(lines.c.amount_paise), 0),
+               func.coalesce(func.sum(case((lines.c.status == LINE_READY, 1), else_=0)), 0))
+        .where(lines.c.run_id == run.id)).one()
+    run.center_count = centers
+    run.collection_count = collections
+    run.total_paise = total
+    run.ready_count = ready
+    run.unmatched_count = centers - ready
+    db.session.execute(update(PayoutRun).where(period, PayoutRun.id != run.id)
+                       .values(status='superseded'))
+    db.session.commit()
+    return run
+
+def apply_payout(run):
+    """Write a run's ready amounts into CenterAccountDetails.AMOUNT in bulk; returns rows changed.
+
+    Only the latest run of a period can be applied. Commits.
+    """
+    if run.status == 'superseded':
+        raise ValueError('A newer run exists for this period; apply that one instead.')
+    lines = PayoutLine.__table__
+    acc = CenterAccountDetails.__table__
+    key_match = [acc.c.CODE == lines.c.center_id] + [acc.c[f] == lines.c[f] for f in ACCOUNT_KEY_FIELDS]
+    rows = db.session.execute(
+        select(acc.c.CODE, *[acc.c[f] for f in ACCOUNT_KEY_FIELDS], acc.c.AMOUNT, lines.c.amount_paise)
+        .select_from(lines.join(acc, and_(*key_match)))
+        .where(lines.c.run_id == run.id, lines.c.status == LINE_READY)).all()
+    changed = [r for r in rows if r.AMOUNT is None or money_json(r.AMOUNT) != money_json(from_paise(r.amount_paise))]
+    if changed:
+        db.session.execute(
+            update(acc)
+            .where(acc.c.CODE == bindparam('b_code'),
+                   *[acc.c[f] == bindparam(f'b_{f}') for f in ACCOUNT_KEY_FIELDS])
+            .values(AMOUNT=bindparam('b_amount')),
+            [dict({'b_code': r.CODE, 'b_amount': from_paise(r.amount_paise)},
+                  **{f'b_{f}': r._mapping[acc.c[f]] for f in ACCOUNT_KEY_FIELDS}) for r in changed])
+        # Core bulk UPDATEs bypass the ORM flush hooks, so audit them explicitly
+        record_bulk_update(db.session(), 'center_account_details', [
+            ('/'.join(str(part) for part in (r.CODE,) + tuple(r._mapping[acc.c[f]] for f in ACCOUNT_KEY_FIELDS)),
+             {'AMOUNT': [str(r.AMOUNT) if r.AMOUNT is not None else None, str(from_paise(r.amount_paise))]})
+            for r in changed])
+    run.status = 'applied'
+    run.applied_at = datetime.utcnow()
+    db.session.commit()
+    return len(changed)
+
+def payout_run_to_dict(run):
+    return {
+        'id': run.id,
+        'from': run.date_from,
+        'to': run.date_to,
+        'version': run.version,
+        'status': run.status,
+        'center_count': run.center_count,
+        'collection_count': run.collection_count,
+        'total': money_json(from_paise(run.total_paise)),
+        'ready_count': run.ready_count,
+        'unmatched_count': run.unmatched_count,
+        'created_by': run.created_by,
+        'created_at': run.created_at.isoformat(),
+        'applied_at': run.applied_at.isoformat() if run.applied_at else None
+    }
+
+def payout_line_to_dict(line):
+    return {
+        'center_id': line.center_id,
+        'collection_count': line.collection_count,
+        'amount': money_json(from_paise(line.amount_paise)),
+        'status': line.status,
+        'SUB_CODE': line.SUB_CODE,
+        'BANK_ACC_NUMBER': line.BANK_ACC_NUMBER,
+        'NAME': line.NAME,
+        'IFSC': line.IFSC,
+        'BRANCH': line.BRANCH
+    }
+
+def payout_lines(run_id, status=None):
+    query = PayoutLine.query.filter_by(run_id=run_id)
+    if status:
+        query = query.filter_by(status=status)
+    return [payout_line_to_dict(line) for line in query.order_by(PayoutLine.center_id).all()]
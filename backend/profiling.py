@@ -0,0 +1,359 @@
+import logging
+import marshal
+import os
+import pstats
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import cProfile
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import g, request
+from sqlalchemy import delete, insert, select
+from . import app, db
+
+log = logging.getLogger(__name__)
+
+# On-demand request profiling (admin only, see /api/profiling in routes.py).
+#
+# An admin starts a profile_session for one route with a sample rate. A poller
+# thread in every worker process reads the active session every
+# PROFILE_POLL_SECONDS; the worker that starts or stops a session applies it at
+# once. Requests only read the poller's copy, so with no session running a
+# request pays one attribute check and never touches the database. A sampled
+# request runs under cProfile
+# ('cprofile' mode) or under a background stack sampler ('sample' mode). Each
+# worker keeps its own aggregate and writes it to profile_result once the
+# response has been sent. Downloads merge the results of all workers: pstats
+# for cProfile sessions, collapsed stacks (flamegraph.pl / speedscope input) for
+# sampled ones.
+#
+# Python allows one active profiler per process, so only one request per worker
+# runs under cProfile at a time; a request that is due while another one is
+# being profiled (gthread, gevent), or while some other tool is profiling the
+# process, is simply served unprofiled.
+#
+# The sampler reads real thread stacks, so 'sample' mode needs sync or gthread
+# workers; under gevent use 'cprofile' (which then also sees the greenlets that
+# ran while the sampled request was waiting).
+
+PROFILE_POLL_SECONDS = float(os.environ.get('PROFILE_POLL_SECONDS', 5))
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.005))
+PROFILE_MAX_MINUTES = 60
+PROFILE_MODES = ('cprofile', 'sample')
+
+class ProfileSession(db.Model):
+    __tablename__ = 'profile_session'
+    id = db.Column(db.Integer, primary_key=True)
+    route = db.Column(db.String(200), nullable=False)  # endpoint name or URL rule, e.g. customers or /api/customers
+    mode = db.Column(db.String(10), nullable=False)
+    rate = db.Column(db.Float, nullable=False)
+    max_requests = db.Column(db.Integer, nullable=False)  # per worker process
+    started_by = db.Column(db.String(80), nullable=True)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    stopped_at = db.Column(db.DateTime, nullable=True)
+
+class ProfileResult(db.Model):
+    """One worker's aggregate for a session, replaced on every flush."""
+    __tablename__ = 'profile_result'
+    session_id = db.Column(db.Integer, primary_key=True)
+    worker = db.Column(db.String(100), primary_key=True)
+    requests = db.Column(db.Integer, nullable=False, default=0)
+    data = db.Column(db.LargeBinary, nullable=False)  # marshalled pstats dict or collapsed-stack Counter
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+def _worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+class StackSampler:
+    """Background thread recording the stacks of the threads serving sampled requests."""
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._threads = set()
+        self._lock = threading.Lock()
+        self._running = False
+
+    def add_thread(self, ident):
+        with self._lock:
+            self._threads.add(ident)
+            if not self._running:
+                self._running = True
+                threading.Thread(target=self._run, name='vks-stack-sampler', daemon=True).start()
+
+    def remove_thread(self, ident):
+        with self._lock:
+            self._threads.discard(ident)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._threads:
+                    self._running = False
+                    return
+                threads = set(self._threads)
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                names = []
+                while frame is not None:
+                    names.append(_frame_name(frame))
+                    frame = frame.f_back
+                if names:
+                    with self._lock:
+                        self.stacks[';'.join(reversed(names))] += 1
+            time.sleep(self.interval)
+
+    def take(self):
+        with self._lock:
+            return Counter(self.stacks)
+
+class RequestProfiler:
+    """Per-process state: the active session (polled) and this worker's aggregate."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cprofile_slot = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self.session = None  # dict copy of the active ProfileSession, or None
+        self._reset(None)
+
+    def _reset(self, session_id):
+        self.session_id = session_id
+        self.requests = 0
+        self.stats = None
+        self.sampler = StackSampler()
+
+    def ensure_started(self):
+        # Started lazily so each gunicorn worker (after fork) gets its own poller
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._poll, name='vks-profile-poller', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _poll(self):
+        while True:
+            try:
+                with app.app_context():
+                    self.apply(active_session())
+            except Exception as e:
+                log.warning('Profiler poll error: %s', e)
+            self._wake.wait(PROFILE_POLL_SECONDS)
+            self._wake.clear()
+
+    def apply(self, session):
+        """Make session (a ProfileSession or None) this process's active session."""
+        with self._lock:
+            self.session = profile_session_to_dict(session) if session else None
+            if session and session.id != self.session_id:
+                self._reset(session.id)
+
+    def wants(self, endpoint, rule):
+        session = self.session
+        if session is None or session['route'] not in (endpoint, rule):
+            return False
+        if self.requests >= session['max_requests']:
+            return False
+        return random.random() < session['rate']
+
+    def start_cprofile(self):
+        """An enabled cProfile.Profile, or None when this process is already being profiled."""
+        if not self._cprofile_slot.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool is active in this process
+            self._cprofile_slot.release()
+            return None
+        return profile
+
+    def stop_cprofile(self, profile):
+        profile.disable()
+        self._cprofile_slot.release()
+
+    def add_profile(self, profile):
+        with self._lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+            self.requests += 1
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def snapshot(self):
+        """(session_id, requests, marshalled data) of this worker's aggregate."""
+        with self._lock:
+            if self.session is None or self.session_id is None:
+                return None
+            if self.session['mode'] == 'cprofile':
+                data = marshal.dumps(self.stats.stats if self.stats else {})
+            else:
+                data = marshal.dumps(dict(self.sampler.take()))
+            return self.session_id, self.requests, data
+
+profiler = RequestProfiler()
+
+def active_session():
+    now = datetime.utcnow()
+    return (ProfileSession.query
+            .filter(ProfileSession.stopped_at.is_(None), ProfileSession.expires_at > now)
+            .order_by(ProfileSession.id.desc())
+            .first())
+
+def start_session(route, mode='cprofile', rate=0.1, minutes=10, max_requests=500, username=None):
+    """Stop any running session and start a new one. Raises ValueError for bad settings."""
+    if not route:
+        raise ValueError('route is required (endpoint name or URL rule).')
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"mode must be one of: {', '.join(PROFILE_MODES)}.")
+    rate, minutes, max_requests = float(rate), float(minutes), int(max_requests)
+    if not 0 < rate <= 1:
+        raise ValueError('rate must be between 0 and 1.')
+    if not 0 < minutes <= PROFILE_MAX_MINUTES:
+        raise ValueError(f'minutes must be between 0 and {PROFILE_MAX_MINUTES}.')
+    if max_requests < 1:
+        raise ValueError('max_requests must be at least 1.')
+    stop_session()
+    now = datetime.utcnow()
+    session = ProfileSession(route=route, mode=mode, rate=rate, max_requests=max_requests, started_by=username,
+                             started_at=now, expires_at=now + timedelta(minutes=minutes))
+    db.session.add(session)
+    db.session.commit()
+    profiler.apply(session)
+    return session
+
+def stop_session():
+    now = datetime.utcnow()
+    ProfileSession.query.filter(ProfileSession.stopped_at.is_(None)).update({'stopped_at': now})
+    db.session.commit()
+    profiler.apply(None)
+
+def _flush():
+    snapshot = profiler.snapshot()
+    if snapshot is None:
+        return
+    session_id, requests, data = snapshot
+    worker = _worker_id()
+    table = ProfileResult.__table__
+    try:
+        with app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(delete(table).where(table.c.session_id == session_id, table.c.worker == worker))
+                conn.execute(insert(table), {'session_id': session_id, 'worker': worker, 'requests': requests,
+                                             'data': data, 'updated_at': datetime.utcnow()})
+    except Exception as e:
+        log.warning('Profiler flush error: %s', e)
+
+@app.before_request
+def _start_profile():
+    profiler.ensure_started()
+    if profiler.session is None:
+        return
+    rule = request.url_rule.rule if request.url_rule else None
+    if not profiler.wants(request.endpoint, rule):
+        return
+    if profiler.session['mode'] == 'cprofile':
+        profile = profiler.start_cprofile()
+        if profile is not None:
+            g.profile = profile
+    else:
+        g.profile_thread = threading.get_ident()
+        profiler.sampler.add_thread(g.profile_thread)
+
+@app.after_request
+def _stop_profile(response):
+    profile = g.pop('profile', None)
+    thread = g.pop('profile_thread', None)
+    if profile is not None:
+        profiler.stop_cprofile(profile)
+        profiler.add_profile(profile)
+    elif thread is not None:
+        profiler.sampler.remove_thread(thread)
+        profiler.count_request()
+    else:
+        return response
+    # Written after the response has gone out, so the client does not wait on it
+    response.call_on_close(_flush)
+    return response
+
+@app.teardown_request
+def _abandon_profile(exc):
+    # A view that raised skips after_request; never leave the profiler attached
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.stop_cprofile(profile)
+    thread = g.pop('profile_thread', None)
+    if thread is not None:
+        profiler.sampler.remove_thread(thread)
+
+def profile_session_to_dict(session):
+    return {
+        'id': session.id,
+        'route': session.route,
+        'mode': session.mode,
+        'rate': session.rate,
+        'max_requests': session.max_requests,
+        'started_by': session.started_by,
+        'started_at': session.started_at.isoformat(),
+        'expires_at': session.expires_at.isoformat(),
+        'stopped_at': session.stopped_at.isoformat() if session.stopped_at else None
+    }
+
+def session_summary(session):
+    results = db.session.execute(select(ProfileResult.worker, ProfileResult.requests, ProfileResult.updated_at)
+                                 .where(ProfileResult.session_id == session.id)).all()
+    summary = profile_session_to_dict(session)
+    summary['requests'] = sum(r.requests for r in results)
+    summary['workers'] = [{'worker': r.worker, 'requests': r.requests, 'updated_at': r.updated_at.isoformat()}
+                          for r in results]
+    return summary
+
+def _results(session_id):
+    return [marshal.loads(data) for (data,) in
+            db.session.execute(select(ProfileResult.data).where(ProfileResult.session_id == session_id))]
+
+def merged_pstats(session_id):
+    """All workers' cProfile data merged, as a pstats file (bytes) for snakeviz or python -m pstats."""
+    merged = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, stats in enumerate(_results(session_id)):
+            if not stats:
+                continue
+            path = os.path.join(tmp, f'{i}.prof')
+            with open(path, 'wb') as f:
+                marshal.dump(stats, f)
+            if merged is None:
+                merged = pstats.Stats(path)
+            else:
+                merged.add(path)
+        if merged is None:
+            return None
+        out = os.path.join(tmp, 'merged.prof')
+        merged.dump_stats(out)
+        with open(out, 'rb') as f:
+            return f.read()
+
+def merged_collapsed(session_id):
+    """All workers' sampled stacks as collapsed-stack text ('frame;frame;frame count' per line)."""
+    totals = Counter()
+    for stacks in _results(session_id):
+        totals.update(stacks)
+    return ''.join(f'{stack} {count}\n' for stack, count in totals.most_common())
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+Script to rebuild the customer ledger (entries, running balances and monthly
+totals) from the existing Sale table. Run once after upgrading, or whenever
+sales were changed outside the API.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__) + '/..'))
+from backend import create_app
+from backend.ledger import rebuild_ledger
+
+app = create_app()
+with app.app_context():
+    customers = rebuild_ledger()
+    print(f"✅ Customer ledger rebuilt for {customers} customer(s)")
@@ -0,0 +1,286 @@
+import csv
+import difflib
+import io
+import re
+import zipfile
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import insert
+from . import db
+from .models import CenterAccountDetails
+from .money import to_paise, from_paise, money_json
+from .payouts import PayoutLine, LINE_READY
+
+try:
+    import openpyxl
+    from openpyxl.utils.exceptions import InvalidFileException
+except ImportError:  # without openpyxl only CSV statements can be reconciled
+    openpyxl = None
+
+# Bank statement reconciliation.
+#
+# The expected payouts (a payout run's ready lines, or the current
+# CenterAccountDetails amounts) are loaded once into hash indexes. The
+# statement is then streamed line by line, so its size never affects memory.
+# Each line is matched in this order:
+#   1. exact:   (account number, IFSC, amount in paise)      -> matched
+#   2. account: (account number, IFSC), amount differs       -> mismatched
+#   3. name:    fuzzy name within the (IFSC, amount) block   -> mismatched
+# Comparing names only inside a block keeps the fuzzy pass far from O(n x m).
+# Lines that match nothing are 'unexpected'; expected payouts never seen are
+# 'missing'. Every non-matched row and each match is stored as a
+# reconciliation_item in batches.
+
+RECONCILE_BATCH_SIZE = 1000
+NAME_MATCH_RATIO = 0.85
+
+# Accepted statement headers (compared lower-case, letters and digits only)
+HEADER_ALIASES = {
+    'account': ('account', 'accountno', 'accountnumber', 'accno', 'bankaccnumber', 'beneficiaryaccount',
+                'beneficiaryaccountnumber'),
+    'ifsc': ('ifsc', 'ifsccode', 'beneficiaryifsc'),
+    'amount': ('amount', 'credit', 'creditamount', 'cramount', 'deposit'),
+    'name': ('name', 'beneficiary', 'beneficiaryname', 'accountname'),
+}
+
+class Reconciliation(db.Model):
+    __tablename__ = 'reconciliation'
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=True)
+    payout_run_id = db.Column(db.Integer, nullable=True)  # None: against CenterAccountDetails.AMOUNT
+    statement_lines = db.Column(db.Integer, nullable=False, default=0)
+    matched = db.Column(db.Integer, nullable=False, default=0)
+    mismatched = db.Column(db.Integer, nullable=False, default=0)
+    unexpected = db.Column(db.Integer, nullable=False, default=0)
+    missing = db.Column(db.Integer, nullable=False, default=0)
+    invalid = db.Column(db.Integer, nullable=False, default=0)
+    created_by = db.Column(db.String(80), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ReconciliationItem(db.Model):
+    __tablename__ = 'reconciliation_item'
+    id = db.Column(db.Integer, primary_key=True)
+    reconciliation_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(12), nullable=False)  # matched, mismatched, unexpected, missing, invalid
+    line_number = db.Column(db.Integer, nullable=True)  # statement line (None for missing)
+    center_code = db.Column(db.Integer, nullable=True)
+    account_number = db.Column(db.String(50), nullable=True)
+    ifsc = db.Column(db.String(20), nullable=True)
+    name = db.Column(db.String(150), nullable=True)
+    expected_paise = db.Column(db.BigInteger, nullable=True)
+    statement_paise = db.Column(db.BigInteger, nullable=True)
+    reason = db.Column(db.String(255), nullable=True)
+    __table_args__ = (
+        db.Index('ix_reconciliation_item_rec_status', 'reconciliation_id', 'status'),
+    )
+
+_NOT_HEADER = re.compile(r'[^a-z0-9]')
+_NOT_ACCOUNT = re.compile(r'[^0-9A-Za-z]')
+_NOT_NAME = re.compile(r'[^a-z0-9 ]')
+
+def _header_key(value):
+    return _NOT_HEADER.sub('', str(value or '').lower())
+
+def _norm_account(value):
+    return _NOT_ACCOUNT.sub('', str(value or '')).lstrip('0').upper()
+
+def _norm_ifsc(value):
+    return str(value or '').strip().upper()
+
+def _norm_name(value):
+    return ' '.join(_NOT_NAME.sub(' ', str(value or '').lower()).split())
+
+def _expected_rows(payout_run_id=None):
+    """(code, account, ifsc, name, paise) of every payout expected on the statement."""
+    if payout_run_id is not None:
+        query = (db.session.query(PayoutLine.center_id, PayoutLine.BANK_ACC_NUMBER, PayoutLine.IFSC,
+                                  PayoutLine.NAME, PayoutLine.amount_paise)
+                 .filter(PayoutLine.run_id == payout_run_id, PayoutLine.status == LINE_READY))
+        return [tuple(row) for row in query.yield_per(RECONCILE_BATCH_SIZE)]
+    query = db.session.query(CenterAccountDetails.CODE, CenterAccountDetails.BANK_ACC_NUMBER,
+                             CenterAccountDetails.IFSC, CenterAccountDetails.NAME, CenterAccountDetails.AMOUNT)
+    return [(code, acc, ifsc, name, to_paise(amount))
+            for code, acc, ifsc, name, amount in query.yield_per(RECONCILE_BATCH_SIZE)]
+
+class ExpectedIndex:
+    """Hash indexes over the expected payouts; each one can be consumed once."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.unmatched = set(range(len(rows)))
+        self.by_exact = defaultdict(list)
+        self.by_account = defaultdict(list)
+        self.by_block = defaultdict(list)
+        for i, (code, acc, ifsc, name, amount) in enumerate(rows):
+            account, bank = _norm_account(acc), _norm_ifsc(ifsc)
+            self.by_exact[(account, bank, amount)].append(i)
+            self.by_account[(account, bank)].append(i)
+            self.by_block[(bank, amount)].append(i)
+
+    def _take(self, candidates):
+        for i in candidates:
+            if i in self.unmatched:
+                self.unmatched.discard(i)
+                return i
+        return None
+
+    def match(self, account, ifsc, amount, name):
+        """(status, expected index, reason) for one normalized statement line; name is raw."""
+        i = self._take(self.by_exact.get((account, ifsc, amount), ()))
+        if i is not None:
+            return 'matched', i, None
+        i = self._take(self.by_account.get((account, ifsc), ()))
+        if i is not None:
+            return 'mismatched', i, 'Amount differs.'
+        block = self.by_block.get((ifsc, amount), ())
+        name = _norm_name(name) if block else ''
+        if name:
+            best, best_ratio = None, NAME_MATCH_RATIO
+            for candidate in block:
+                if candidate not in self.unmatched:
+                    continue
+                ratio = difflib.SequenceMatcher(None, name, _norm_name(self.rows[candidate][3])).ratio()
+                if ratio >= best_ratio:
+                    best, best_ratio = candidate, ratio
+            if best is not None:
+                self.unmatched.discard(best)
+                return 'mismatched', best, 'Account number differs; matched on IFSC, amount and name.'
+        return 'unexpected', None, 'No expected payout for this line.'
+
+def _csv_rows(stream):
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    yield from reader
+
+def _xlsx_rows(stream):
+    if openpyxl is None:
+        raise ValueError('XLSX statements need openpyxl installed; upload a CSV instead.')
+    # read_only mode streams rows from the sheet XML instead of loading the workbook
+    try:
+        workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException):
+        raise ValueError('Statement is not a valid XLSX file.')
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if v is None else v for v in row]
+    finally:
+        workbook.close()
+
+def statement_rows(stream, filename):
+    """Yield (line_number, {account, ifsc, amount, name}) from a CSV or XLSX statement."""
+    rows = _xlsx_rows(stream) if filename.lower().endswith('.xlsx') else _csv_rows(stream)
+    positions = None
+    for line_number, row in enumerate(rows, start=1):
+        if positions is None:
+            keys = [_header_key(cell) for cell in row]
+            positions = {field: next((keys.index(a) for a in aliases if a in keys), None)
+                         for field, aliases in HEADER_ALIASES.items()}
+            missing = [f for f in ('account', 'ifsc', 'amount') if positions[f] is None]
+            if missing:
+                raise ValueError(f"Statement header must include: {', '.join(missing)}.")
+            continue
+        if not any(str(cell).strip() for cell in row):
+            continue
+        yield line_number, {field: (row[pos] if pos is not None and pos < len(row) else '')
+                            for field, pos in positions.items()}
+
+class _ItemWriter:
+    """Buffers reconciliation_item rows and inserts them RECONCILE_BATCH_SIZE at a time."""
+
+    def __init__(self, reconciliation_id):
+        self.reconciliation_id = reconciliation_id
+        self.buffer = []
+
+    COLUMNS = ('status', 'line_number', 'center_code', 'account_number', 'ifsc', 'name',
+               'expected_paise', 'statement_paise', 'reason')
+
+    def add(self, **item):
+        # executemany needs the same keys in every row
+        row = {column: item.get(column) for column in self.COLUMNS}
+        row['reconciliation_id'] = self.reconciliation_id
+        self.buffer.append(row)
+        if len(self.buffer) >= RECONCILE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            db.session.execute(insert(ReconciliationItem.__table__), self.buffer)
+            self.buffer = []
+
+def reconcile(stream, filename, payout_run_id=None, username=None):
+    """Match a bank statement against the expected payouts and commit the report.
+
+    Raises ValueError for an unreadable statement.
+    """
+    index = ExpectedIndex(_expected_rows(payout_run_id))
+    rec = Reconciliation(filename=filename, payout_run_id=payout_run_id, created_by=username)
+    db.session.add(rec)
+    db.session.flush()
+    writer = _ItemWriter(rec.id)
+    counts = defaultdict(int)
+    for line_number, line in statement_rows(stream, filename or ''):
+        counts['statement_lines'] += 1
+        account, ifsc = _norm_account(line['account']), _norm_ifsc(line['ifsc'])
+        item = {'line_number': line_number, 'account_number': str(line['account'])[:50], 'ifsc': ifsc[:20],
+                'name': str(line['name'] or '')[:150]}
+        try:
+            amount = to_paise(line['amount'])
+        except ValueError as e:
+            counts['invalid'] += 1
+            writer.add(status='invalid', reason=str(e)[:255], **item)
+            continue
+        status, i, reason = index.match(account, ifsc, amount, line['name'])
+        counts[status] += 1
+        expected = index.rows[i] if i is not None else (None, None, None, None, None)
+        writer.add(status=status, center_code=expected[0], expected_paise=expected[4], statement_paise=amount,
+                   reason=reason, **item)
+    for i in sorted(index.unmatched):
+        code, acc, ifsc, name, amount = index.rows[i]
+        counts['missing'] += 1
+        writer.add(status='missing', line_number=None, center_code=code, account_number=acc, ifsc=ifsc,
+                   name=name, expected_paise=amount, statement_paise=None, reason='Not found on the statement.')
+    writer.flush()
+    for field in ('statement_lines', 'matched', 'mismatched', 'unexpected', 'missing', 'invalid'):
+        setattr(rec, field, counts[field])
+    db.session.commit()
+    return rec
+
+def reconciliation_to_dict(rec):
+    return {
+        'id': rec.id,
+        'filename': rec.filename,
+        'payout_run_id': rec.payout_run_id,
+        'statement_lines': rec.statement_lines,
+        'matched': rec.matched,
+        'mismatched': rec.mismatched,
+        'unexpected': rec.unexpected,
+        'missing': rec.missing,
+        'invalid': rec.invalid,
+        'created_by': rec.created_by,
+        'created_at': rec.created_at.isoformat()
+    }
+
+def reconciliation_item_to_dict(item):
+    return {
+        'status': item.status,
+        'line_number': item.line_number,
+        'center_code': item.center_code,
+        'account_number': item.account_number,
+        'ifsc': item.ifsc,
+        'name': item.name,
+        'expected_amount': money_json(from_paise(item.expected_paise)) if item.expected_paise is not None else None,
+        'statement_amount': money_json(from_paise(item.statement_paise)) if item.statement_paise is not None else None,
+        'reason': item.reason
+    }
+
+def reconciliation_items(reconciliation_id, status=None, page=1, per_page=500):
+    """One page of report rows, optionally only one status."""
+    query = ReconciliationItem.query.filter_by(reconciliation_id=reconciliation_id)
+    if status:
+        query = query.filter_by(status=status)
+    items = query.order_by(ReconciliationItem.id).offset((page - 1) * per_page).limit(per_page + 1).all()
+    return {
+        'items': [reconciliation_item_to_dict(i) for i in items[:per_page]],
+        'page': page,
+        'per_page': per_page,
+        'has_more': len(items) > per_page
+    }
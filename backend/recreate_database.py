@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 """
 Script to recreate the database with the new Customer model and updated Sales table.
-This will delete all existing data and create fresh tables.
+This will delete all existing data and create fresh tables. To change the schema
+of a database that holds data, add a migration to backend/migrations.py and run
+backend/migrate.py instead.
 """
 
 import sys
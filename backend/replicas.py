@@ -0,0 +1,73 @@
+import os
+import random
+import time
+from functools import wraps
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Read-replica routing.
+#
+# DATABASE_REPLICA_URLS lists streaming replicas of the primary, comma separated.
+# Views marked @read_replica send their GET queries to a replica. Writes, flushes,
+# SELECT ... FOR UPDATE and every view that is not marked stay on the primary.
+# After a user commits a change, their reads stay on the primary for
+# REPLICA_STICKY_SECONDS, so a grid reloaded right after a save never shows a
+# replica that has not caught up yet.
+
+REPLICA_BIND_PREFIX = 'replica_'
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+_PRIMARY_UNTIL = 'db_primary_until'
+
+def replica_uris():
+    return [u.strip() for u in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+
+def replica_binds(uris=None):
+    """SQLALCHEMY_BINDS entries for the configured replicas."""
+    uris = replica_uris() if uris is None else uris
+    return {f'{REPLICA_BIND_PREFIX}{i}': uri for i, uri in enumerate(uris)}
+
+def _replica_engines(db):
+    return [engine for key, engine in db.engines.items() if key and key.startswith(REPLICA_BIND_PREFIX)]
+
+def _sticky():
+    return session.get(_PRIMARY_UNTIL, 0) > time.time()
+
+def use_replica():
+    """True if queries in the current request may go to a replica."""
+    return has_request_context() and g.get('db_route') == 'replica' and not _sticky()
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends reads from @read_replica views to a replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and use_replica():
+            engines = _replica_engines(self._db)
+            if engines and not getattr(clause, '_for_update_arg', None):
+                if 'db_replica' not in g:
+                    # One replica per request, so all of its reads see the same snapshot
+                    g.db_replica = random.choice(engines)
+                return g.db_replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def read_replica(view):
+    """Serve the GET branch of a view from a read replica when one is configured."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method == 'GET':
+            g.db_route = 'replica'
+        return view(*args, **kwargs)
+    return wrapper
+
+def init_replica_routing(db):
+    """Make a user's reads stick to the primary for a while after they commit."""
+
+    @event.listens_for(db.session, 'after_flush')
+    def _mark_write(db_session, flush_context):
+        if has_request_context():
+            g.db_wrote = True
+
+    @event.listens_for(db.session, 'after_commit')
+    def _stick_to_primary(db_session):
+        if has_request_context() and g.pop('db_wrote', False):
+            session[_PRIMARY_UNTIL] = time.time() + REPLICA_STICKY_SECONDS
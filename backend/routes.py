@@ -1,15 +1,38 @@
-from flask import request, jsonify, session, abort
+from flask import request, jsonify, session, abort, Response
 from flask_login import login_user, logout_user, login_required, current_user
 from . import app, db, login_manager
 from .models import User, Center, Collection, Sale, Account, CenterAccountDetails, Customer
-from werkzeug.security import generate_password_hash, check_password_hash
+from .schemas import Schema, Field, RowError
+from .replicas import read_replica
+from .idempotency import idempotent
+from .events import publish, stream, ensure_listener, ENTITY_ACCESS
+from .cache import reference_cache
+from .audit import query_audit_log, audit_writer
+from .imports import (register_importer, import_runner, create_job, job_to_dict, rejected_rows,
+                      ImportJob, IMPORTERS, IMPORT_MAX_ROWS)
+from .batch import register_batch_entity, run_batch, BATCH_MAX_OPERATIONS
+from .payouts import PayoutRun, run_payout, apply_payout, payout_run_to_dict, payout_lines
+from .reconciliation import Reconciliation, reconcile, reconciliation_to_dict, reconciliation_items
+from .profiling import (ProfileSession, active_session, start_session, stop_session, session_summary,
+                        merged_pstats, merged_collapsed)
+from .health import HealthProbe
+from .security import login_throttle, client_ip, hash_password, needs_rehash
+from .lookup import lookup_by_prefix, lookup_by_ids, LOOKUP_DEFAULT_LIMIT, LOOKUP_MAX_LIMIT, LOOKUP_MAX_IDS
+from .partitioning import archived_rows, archive_status
+from .aggregates import REPORTS, sql_summary, array_summary
+from .ledger import record_sale_created, record_sale_updated, record_sale_deleted, sale_snapshot, get_customer_ledger
+from werkzeug.security import check_password_hash
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
 import random
 import time
 import requests
 import functools
+import logging
 from flask_cors import CORS
 
+log = logging.getLogger(__name__)
+
 # --- General improvements: docstrings, error handling, validation, status codes, security ---
 
 # Enable CORS
@@ -56,6 +79,34 @@ def success_response(message, data=None, status=200):
         resp['data'] = data
     return jsonify(resp), status
 
+# Helper: the written row, or only its key when the client sent Prefer: return=minimal
+def write_response(message, schema, obj, row, status=200):
+    if 'return=minimal' in request.headers.get('Prefer', ''):
+        resp, status = success_response(message, schema.key(obj), status)
+        resp.headers['Preference-Applied'] = 'return=minimal'
+        return resp, status
+    return success_response(message, row, status)
+
+# Helper: ?fields=a,b as (a tuple of the schema's field names or None for all, None) or (None, error response)
+def requested_fields(schema):
+    spec = request.args.get('fields')
+    if not spec:
+        return None, None
+    try:
+        return schema.project(spec), None
+    except RowError as e:
+        return None, error_response(str(e), e.status, e.fields)
+
+# Helper: list a model, SELECTing only the columns behind the requested fields
+def list_rows(schema, fields):
+    return schema.dump_many(schema.model.query.options(load_only(*schema.columns(fields))).all(), fields)
+
+# Helper: narrow already-serialized rows (e.g. from the reference cache) to the requested fields
+def project_rows(rows, fields):
+    if fields is None:
+        return rows
+    return [{name: row[name] for name in fields} for row in rows]
+
 # Helper: get object or 404
 def get_or_404(model, *pk):
     obj = model.query.get(pk if len(pk) > 1 else pk[0])
@@ -67,17 +118,38 @@ def get_or_404(model, *pk):
 def load_user(user_id):
     return User.query.get(int(user_id))
 
+# Helper: throttled password check shared by login() and request_otp()
+def authenticate(username, password):
+    """Return (user, None) or (None, error response). Throttled attempts are rejected before hashing."""
+    ip = client_ip()
+    wait = login_throttle.retry_after(username, ip)
+    if wait:
+        resp, status = error_response('Too many login attempts. Please try again later.', 429)
+        resp.headers['Retry-After'] = str(wait)
+        return None, (resp, status)
+    login_throttle.record_attempt(ip)
+    user = User.query.filter_by(username=username).first()
+    if not user or not check_password_hash(user.password, password):
+        login_throttle.record_failure(username)
+        return None, error_response('Invalid credentials', 401)
+    login_throttle.record_success(username)
+    if needs_rehash(user.password):
+        # Upgrade the stored hash to the current PASSWORD_HASH_METHOD
+        user.password = hash_password(password)
+        db.session.commit()
+    return user, None
+
 @app.route('/api/login', methods=['POST'])
 def login():
     """Authenticate user and start session."""
     data = request.json
     if not data or 'username' not in data or 'password' not in data:
         return error_response('Missing username or password', 400)
-    user = User.query.filter_by(username=data['username']).first()
-    if user and check_password_hash(user.password, data['password']):
-        login_user(user)
-        return jsonify({'success': True, 'role': user.role, 'username': user.username}), 200
-    return error_response('Invalid credentials', 401)
+    user, error = authenticate(data['username'], data['password'])
+    if error:
+        return error
+    login_user(user)
+    return jsonify({'success': True, 'role': user.role, 'username': user.username}), 200
 
 @app.route('/api/logout')
 @login_required
@@ -97,23 +169,43 @@ def get_user():
     }), 200
 
 # CRUD endpoints for Center, Collection, Sale, Employee(User), Account
+# <ENTITY>_SCHEMA (schemas.py) validates payloads and serializes rows.
+# create_<entity>(values) adds a validated row to the session without committing;
+# the POST endpoints and background imports (imports.py) share them.
 # Example for Center
+CENTER_SCHEMA = Schema(Center,
+    Field('id', dump_only=True),
+    Field('name', required=True),
+    Field('location', required=True))
+center_to_dict = CENTER_SCHEMA.dump
+
+def create_center(values):
+    center = CENTER_SCHEMA.build(values)
+    db.session.add(center)
+    return center
+
 @app.route('/api/centers', methods=['GET', 'POST'])
 @login_required
 @require_access('CENTER')
+@read_replica
+@idempotent
 def centers():
     """List or create centers."""
     if request.method == 'GET':
-        centers = Center.query.all()
-        return jsonify([{'id': c.id, 'name': c.name, 'location': c.location} for c in centers]), 200
+        fields, error = requested_fields(CENTER_SCHEMA)
+        if error:
+            return error
+        centers = reference_cache.get_or_load('centers', lambda: CENTER_SCHEMA.dump_many(Center.query.all()))
+        return jsonify(project_rows(centers, fields)), 200
     if request.method == 'POST':
-        data = request.json
-        if not data.get('name') or not data.get('location'):
-            return error_response('Name and location are required.', 400)
-        center = Center(name=data['name'], location=data['location'])
-        db.session.add(center)
+        try:
+            center = create_center(CENTER_SCHEMA.load(request.json or {}))
+        except RowError as e:
+            return error_response(str(e), e.status, e.fields)
         db.session.commit()
-        return success_response('Center created successfully.', {'id': center.id, 'name': center.name, 'location': center.location}, 201)
+        row = center_to_dict(center)
+        publish('centers', 'insert', row)
+        return write_response('Center created successfully.', CENTER_SCHEMA, center, row, 201)
 
 @app.route('/api/centers/<int:center_id>', methods=['PUT', 'DELETE'])
 @login_required
@@ -124,43 +216,58 @@ def update_center(center_id):
     if not center:
         return error_response('Center not found.', 404)
     if request.method == 'PUT':
-        data = request.json
-        if not data.get('name') or not data.get('location'):
-            return error_response('Name and location are required.', 400)
-        center.name = data['name']
-        center.location = data['location']
+        try:
+            CENTER_SCHEMA.apply(center, CENTER_SCHEMA.load(request.json or {}))
+        except RowError as e:
+            return error_response(str(e), e.status, e.fields)
         db.session.commit()
-        return success_response('Center updated successfully.', {'id': center.id, 'name': center.name, 'location': center.location}, 200)
+        row = center_to_dict(center)
+        publish('centers', 'update', row)
+        return write_response('Center updated successfully.', CENTER_SCHEMA, center, row, 200)
     if request.method == 'DELETE':
+        deleted = center_to_dict(center)
         db.session.delete(center)
         db.session.commit()
+        publish('centers', 'delete', deleted)
         return success_response('Center deleted successfully.', None, 200)
 
 # CRUD for Collections
-def collection_to_dict(collection):
-    return {
-        'id': collection.id,
-        'amount': collection.amount,
-        'date': collection.date,
-        'center_id': collection.center_id
-    }
+COLLECTION_SCHEMA = Schema(Collection,
+    Field('id', dump_only=True),
+    Field('amount', 'money', required=True),
+    Field('date', required=True),
+    Field('center_id', required=True))
+collection_to_dict = COLLECTION_SCHEMA.dump
+
+def create_collection(values):
+    collection = COLLECTION_SCHEMA.build(values)
+    db.session.add(collection)
+    return collection
 
 @app.route('/api/collections', methods=['GET', 'POST'])
 @login_required
 @require_access('COLLECTIONS')
+@read_replica
+@idempotent
 def collections():
     """List or create collections."""
     if request.method == 'GET':
-        collections = Collection.query.all()
-        return jsonify([collection_to_dict(c) for c in collections]), 200
+        fields, error = requested_fields(COLLECTION_SCHEMA)
+        if error:
+            return error
+        columns = COLLECTION_SCHEMA.columns(fields)
+        collections = (Collection.query.options(load_only(*columns)).all()
+                       + archived_rows(Collection.__table__.name, [c.key for c in columns]))
+        return jsonify(COLLECTION_SCHEMA.dump_many(collections, fields)), 200
     if request.method == 'POST':
-        data = request.json
-        if not data.get('amount') or not data.get('date') or not data.get('center_id'):
-            return error_response('Amount, date, and center_id are required.', 400)
-        collection = Collection(amount=data['amount'], date=data['date'], center_id=data['center_id'])
-        db.session.add(collection)
+        try:
+            collection = create_collection(COLLECTION_SCHEMA.load(request.json or {}))
+        except RowError as e:
+            return error_response(str(e), e.status, e.fields)
         db.session.commit()
-        return success_response('Collection created successfully.', collection_to_dict(collection), 201)
+        row = collection_to_dict(collection)
+        publish('collections', 'insert', row)
+        return write_response('Collection created successfully.', COLLECTION_SCHEMA, collection, row, 201)
 
 @app.route('/api/collections/<int:collection_id>', methods=['PUT', 'DELETE'])
 @login_required
@@ -171,48 +278,61 @@ def update_collection(collection_id):
     if not collection:
         return error_response('Collection not found.', 404)
     if request.method == 'PUT':
-        data = request.json
-        if not data.get('amount') or not data.get('date') or not data.get('center_id'):
-            return error_response('Amount, date, and center_id are required.', 400)
-        collection.amount = data['amount']
-        collection.date = data['date']
-        collection.center_id = data['center_id']
+        try:
+            COLLECTION_SCHEMA.apply(collection, COLLECTION_SCHEMA.load(request.json or {}))
+        except RowError as e:
+            return error_response(str(e), e.status, e.fields)
         db.session.commit()
-        return success_response('Collection updated successfully.', collection_to_dict(collection), 200)
+        row = collection_to_dict(collection)
+        publish('collections', 'update', row)
+        return write_response('Collection updated successfully.', COLLECTION_SCHEMA, collection, row, 200)
     if request.method == 'DELETE':
+        deleted = collection_to_dict(collection)
         db.session.delete(collection)
         db.session.commit()
+        publish('collections', 'delete', deleted)
         return success_response('Collection deleted successfully.', None, 200)
 
 # CRUD for Sales
-def sale_to_dict(sale):
-    return {
-        'id': sale.id,
-        'item': sale.item,
-        'quantity': sale.quantity,
-        'price': sale.price,
-        'date': sale.date,
-        'customer_id': sale.customer_id
-    }
+SALE_SCHEMA = Schema(Sale,
+    Field('id', dump_only=True),
+    Field('item', required=True),
+    Field('quantity', required=True),
+    Field('price', 'money', required=True),
+    Field('date', required=True),
+    Field('customer_id', required=True))
+sale_to_dict = SALE_SCHEMA.dump
+
+def create_sale(values):
+    sale = SALE_SCHEMA.build(values)
+    db.session.add(sale)
+    db.session.flush()
+    record_sale_created(sale)
+    return sale
 
 @app.route('/api/sales', methods=['GET', 'POST'])
 @login_required
 @require_access('SALES')
+@read_replica
+@idempotent
 def sales():
     """List or create sales."""
     if request.method == 'GET':
-        sales = Sale.query.all()
-        return jsonify([sale_to_dict(s) for s in sales]), 200
+        fields, error = requested_fields(SALE_SCHEMA)
+        if error:
+            return error
+        columns = SALE_SCHEMA.columns(fields)
+        sales = Sale.query.options(load_only(*columns)).all() + archived_rows(Sale.__table__.name, [c.key for c in columns])
+        return jsonify(SALE_SCHEMA.dump_many(sales, fields)), 200
     if request.method == 'POST':
-        data = request.json
-        required = ['item', 'quantity', 'price', 'date', 'customer_id']
-        for field in required:
-            if not data.get(field):
-                return error_response(f'{field} is required.', 400)
-        sale = Sale(item=data['item'], quantity=data['quantity'], price=data['price'], date=data['date'], customer_id=data['customer_id'])
-        db.session.add(sale)
+        try:
+            sale = create_sale(SALE_SCHEMA.load(request.json or {}))
+        except RowError as e:
+            return error_response(str(e), e.status, e.fields)
         db.session.commit()
-        return success_response('Sale created successfully.', sale_to_dict(sale), 201)
+        row = sale_to_dict(sale)
+        publish('sales', 'insert', row)
+        return write_response('Sale created successfully.', SALE_SCHEMA, sale, row, 201)
 
 @app.route('/api/sales/<int:sale_id>', methods=['PUT', 'DELETE'])
 @login_required
@@ -223,62 +343,64 @@ def update_sale(sale_id):
     if not sale:
         return error_response('Sale not found.', 404)
     if request.method == 'PUT':
-        data = request.json
-        required = ['item', 'quantity', 'price', 'date', 'customer_id']
-        for field in required:
-            if not data.get(field):
-                return error_response(f'{field} is required.', 400)
-        sale.item = data['item']
-        sale.quantity = data['quantity']
-        sale.price = data['price']
-        sale.date = data['date']
-        sale.customer_id = data['customer_id']
+        try:
+            values = SALE_SCHEMA.load(request.json or {})
+        except RowError as e:
+            return error_response(str(e), e.status, e.fields)
+        before = sale_snapshot(sale)
+        SALE_SCHEMA.apply(sale, values)
+        record_sale_updated(sale, before)
         db.session.commit()
-        return success_response('Sale updated successfully.', sale_to_dict(sale), 200)
+        row = sale_to_dict(sale)
+        publish('sales', 'update', row)
+        return write_response('Sale updated successfully.', SALE_SCHEMA, sale, row, 200)
     if request.method == 'DELETE':
+        record_sale_deleted(sale)
+        deleted = sale_to_dict(sale)
         db.session.delete(sale)
         db.session.commit()
+        publish('sales', 'delete', deleted)
         return success_response('Sale deleted successfully.', None, 200)
 
 # CRUD for Customers
-def customer_to_dict(customer):
-    return {
-        'id': customer.id,
-        'name': customer.name,
-        'gst_number': customer.gst_number,
-        'account_number': customer.account_number,
-        'ifsc_code': customer.ifsc_code,
-        'bank': customer.bank,
-        'address': customer.address,
-        'mobile_number': customer.mobile_number
-    }
+CUSTOMER_SCHEMA = Schema(Customer,
+    Field('id', dump_only=True),
+    Field('name', required=True),
+    Field('gst_number'),
+    Field('account_number'),
+    Field('ifsc_code'),
+    Field('bank'),
+    Field('address'),
+    Field('mobile_number', required=True))
+customer_to_dict = CUSTOMER_SCHEMA.dump
+
+def create_customer(values):
+    customer = CUSTOMER_SCHEMA.build(values)
+    db.session.add(customer)
+    return customer
 
 @app.route('/api/customers', methods=['GET', 'POST'])
 @login_required
 @require_access('SALES')
+@read_replica
+@idempotent
 def customers():
     """List or create customers."""
     if request.method == 'GET':
-        customers = Customer.query.all()
-        return jsonify([customer_to_dict(c) for c in customers]), 200
+        fields, error = requested_fields(CUSTOMER_SCHEMA)
+        if error:
+            return error
+        customers = reference_cache.get_or_load('customers', lambda: CUSTOMER_SCHEMA.dump_many(Customer.query.all()))
+        return jsonify(project_rows(customers, fields)), 200
     if request.method == 'POST':
-        data = request.json
-        required = ['name', 'mobile_number']
-        for field in required:
-            if not data.get(field):
-                return error_response(f'{field} is required.', 400)
-        customer = Customer(
-            name=data['name'],
-            gst_number=data.get('gst_number'),
-            account_number=data.get('account_number'),
-            ifsc_code=data.get('ifsc_code'),
-            bank=data.get('bank'),
-            address=data.get('address'),
-            mobile_number=data['mobile_number']
-        )
-        db.session.add(customer)
+        try:
+            customer = create_customer(CUSTOMER_SCHEMA.load(request.json or {}))
+        except RowError as e:
+            return error_response(str(e), e.status, e.fields)
         db.session.commit()
-        return success_response('Customer created successfully.', customer_to_dict(customer), 201)
+        row = customer_to_dict(customer)
+        publish('customers', 'insert', row)
+        return write_response('Customer created successfully.', CUSTOMER_SCHEMA, customer, row, 201)
 
 @app.route('/api/customers/<int:customer_id>', methods=['PUT', 'DELETE'])
 @login_required
@@ -289,79 +411,121 @@ def update_customer(customer_id):
     if not customer:
         return error_response('Customer not found.', 404)
     if request.method == 'PUT':
-        data = request.json
-        required = ['name', 'mobile_number']
-        for field in required:
-            if not data.get(field):
-                return error_response(f'{field} is required.', 400)
-        customer.name = data['name']
-        customer.gst_number = data.get('gst_number')
-        customer.account_number = data.get('account_number')
-        customer.ifsc_code = data.get('ifsc_code')
-        customer.bank = data.get('bank')
-        customer.address = data.get('address')
-        customer.mobile_number = data['mobile_number']
+        try:
+            CUSTOMER_SCHEMA.apply(customer, CUSTOMER_SCHEMA.load(request.json or {}))
+        except RowError as e:
+            return error_response(str(e), e.status, e.fields)
         db.session.commit()
-        return success_response('Customer updated successfully.', customer_to_dict(customer), 200)
+        row = customer_to_dict(customer)
+        publish('customers', 'update', row)
+        return write_response('Customer updated successfully.', CUSTOMER_SCHEMA, customer, row, 200)
     if request.method == 'DELETE':
+        deleted = customer_to_dict(customer)
         db.session.delete(customer)
         db.session.commit()
+        publish('customers', 'delete', deleted)
         return success_response('Customer deleted successfully.', None, 200)
 
+@app.route('/api/customers/<int:customer_id>/ledger', methods=['GET'])
+@login_required
+@require_access('SALES')
+@read_replica
+def customer_ledger(customer_id):
+    """Customer balance, per-month totals and paged ledger entries (newest first)."""
+    if not Customer.query.get(customer_id):
+        return error_response('Customer not found.', 404)
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 50)), 1), 500)
+    except ValueError:
+        return error_response('page and per_page must be integers.', 400)
+    return jsonify(get_customer_ledger(customer_id, page, per_page)), 200
+
+# Helper: id/name lookup response for dropdowns and typeahead
+def lookup_response(entity):
+    """?q= prefix search (limit results) or ?ids=1,2,3 to label known ids."""
+    if 'ids' in request.args:
+        try:
+            ids = [int(i) for i in request.args['ids'].split(',') if i.strip()]
+        except ValueError:
+            return error_response('ids must be a comma separated list of integers.', 400)
+        if len(ids) > LOOKUP_MAX_IDS:
+            return error_response(f'At most {LOOKUP_MAX_IDS} ids per lookup.', 400)
+        return jsonify(lookup_by_ids(entity, ids)), 200
+    try:
+        limit = min(max(int(request.args.get('limit', LOOKUP_DEFAULT_LIMIT)), 1), LOOKUP_MAX_LIMIT)
+    except ValueError:
+        return error_response('limit must be an integer.', 400)
+    return jsonify(lookup_by_prefix(entity, request.args.get('q', ''), limit)), 200
+
+@app.route('/api/customers/lookup', methods=['GET'])
+@login_required
+@require_access('SALES')
+@read_replica
+def customer_lookup():
+    """Customer id/name pairs for the sales customer picker."""
+    return lookup_response('customers')
+
+@app.route('/api/centers/lookup', methods=['GET'])
+@login_required
+@read_replica
+def center_lookup():
+    """Center id/name pairs for center pickers."""
+    if not (check_access('CENTER') or check_access('COLLECTIONS')):
+        return error_response('Access denied. Insufficient permissions.', 403)
+    return lookup_response('centers')
+
 # CRUD for Employees (Users)
-def user_to_dict(user):
-    return {
-        'id': user.id,
-        'username': user.username,
-        'role': user.role,
-        'MobileNumber': user.MobileNumber,
-        'EmailID': user.EmailID,
-        'AccessControl': user.get_access_list()  # Return as array for frontend
-    }
+USER_SCHEMA = Schema(User,
+    Field('id', dump_only=True),
+    Field('username', required=True),
+    Field('password', required=True, load_only=True),
+    Field('role', required=True),
+    Field('MobileNumber', required=True),
+    Field('EmailID', required=True),
+    # Returned as an array for the frontend; stored through set_access_list()
+    Field('AccessControl', 'list', dump=lambda user: user.get_access_list()))
+user_to_dict = USER_SCHEMA.dump
+
+# Helper: set the hashed password and access list that the schema leaves as plain values
+def set_employee_secrets(user, values):
+    user.password = hash_password(values['password'])
+    user.set_access_list(values.get('AccessControl') or [])
+
+def create_employee(values):
+    user = USER_SCHEMA.build({k: v for k, v in values.items() if k not in ('password', 'AccessControl')})
+    set_employee_secrets(user, values)
+    db.session.add(user)
+    return user
 
 @app.route('/api/employees', methods=['GET', 'POST'])
 @login_required
 @require_access('EMPLOYEES')
+@read_replica
+@idempotent
 def employees():
     """List or create employees (admin only)."""
     if current_user.role != 'admin':
         return error_response('Unauthorized', 403)
     if request.method == 'GET':
-        users = User.query.all()
-        result = [user_to_dict(u) for u in users]
-        return jsonify(result), 200
+        fields, error = requested_fields(USER_SCHEMA)
+        if error:
+            return error
+        # Never loads the password hashes
+        return jsonify(list_rows(USER_SCHEMA, fields)), 200
     if request.method == 'POST':
-        data = request.json
-        required = ['username', 'password', 'role', 'MobileNumber', 'EmailID']
-        for field in required:
-            if not data.get(field):
-                return error_response(f'{field} is required.', 400)
         try:
-            hashed_pw = generate_password_hash(data['password'])
-            user = User(
-                username=data['username'],
-                password=hashed_pw,
-                role=data['role'],
-                MobileNumber=data['MobileNumber'],
-                EmailID=data['EmailID']
-            )
-            # Handle AccessControl as array
-            access_control = data.get('AccessControl', [])
-            if isinstance(access_control, list):
-                user.set_access_list(access_control)
-            elif isinstance(access_control, str):
-                user.set_access_list([access_control] if access_control else [])
-            else:
-                user.set_access_list([])
-            
-            db.session.add(user)
+            user = create_employee(USER_SCHEMA.load(request.json or {}))
+        except RowError as e:
+            return error_response(str(e), e.status, e.fields)
+        try:
             db.session.commit()
-            users = User.query.all()
-            result = [user_to_dict(u) for u in users]
-            return success_response('Employee created successfully.', result, 201)
         except IntegrityError:
             db.session.rollback()
             return error_response('Username or email already exists.', 409)
+        row = user_to_dict(user)
+        publish('employees', 'insert', row)
+        return write_response('Employee created successfully.', USER_SCHEMA, user, row, 201)
 
 @app.route('/api/employees/<int:user_id>', methods=['PUT', 'DELETE'])
 @login_required
@@ -374,31 +538,21 @@ def update_employee(user_id):
     if not user:
         return error_response('Employee not found.', 404)
     if request.method == 'PUT':
-        data = request.json
-        required = ['username', 'password', 'role', 'MobileNumber', 'EmailID']
-        for field in required:
-            if not data.get(field):
-                return error_response(f'{field} is required.', 400)
-        user.username = data['username']
-        user.password = generate_password_hash(data['password'])
-        user.role = data['role']
-        user.MobileNumber = data['MobileNumber']
-        user.EmailID = data['EmailID']
-        
-        # Handle AccessControl as array
-        access_control = data.get('AccessControl', [])
-        if isinstance(access_control, list):
-            user.set_access_list(access_control)
-        elif isinstance(access_control, str):
-            user.set_access_list([access_control] if access_control else [])
-        else:
-            user.set_access_list([])
-            
+        try:
+            values = USER_SCHEMA.load(request.json or {})
+        except RowError as e:
+            return error_response(str(e), e.status, e.fields)
+        USER_SCHEMA.apply(user, values)
+        set_employee_secrets(user, values)
         db.session.commit()
-        return success_response('Employee updated successfully.', user_to_dict(user), 200)
+        row = user_to_dict(user)
+        publish('employees', 'update', row)
+        return write_response('Employee updated successfully.', USER_SCHEMA, user, row, 200)
     if request.method == 'DELETE':
+        deleted = user_to_dict(user)
         db.session.delete(user)
         db.session.commit()
+        publish('employees', 'delete', deleted)
         return success_response('Employee deleted successfully.', None, 200)
 
 # Access Control Options endpoint
@@ -421,29 +575,38 @@ def get_access_control_options():
     return jsonify(options), 200
 
 # CRUD for Accounts
-def account_to_dict(account):
-    return {
-        'id': account.id,
-        'name': account.name,
-        'balance': account.balance
-    }
+ACCOUNT_SCHEMA = Schema(Account,
+    Field('id', dump_only=True),
+    Field('name', required=True),
+    Field('balance', 'money', required=True))
+account_to_dict = ACCOUNT_SCHEMA.dump
+
+def create_account(values):
+    account = ACCOUNT_SCHEMA.build(values)
+    db.session.add(account)
+    return account
 
 @app.route('/api/accounts', methods=['GET', 'POST'])
 @login_required
 @require_access('ACCOUNTS')
+@read_replica
+@idempotent
 def accounts():
     """List or create accounts."""
     if request.method == 'GET':
-        accounts = Account.query.all()
-        return jsonify([account_to_dict(a) for a in accounts]), 200
+        fields, error = requested_fields(ACCOUNT_SCHEMA)
+        if error:
+            return error
+        return jsonify(list_rows(ACCOUNT_SCHEMA, fields)), 200
     if request.method == 'POST':
-        data = request.json
-        if not data.get('name') or not data.get('balance'):
-            return error_response('Name and balance are required.', 400)
-        account = Account(name=data['name'], balance=data['balance'])
-        db.session.add(account)
+        try:
+            account = create_account(ACCOUNT_SCHEMA.load(request.json or {}))
+        except RowError as e:
+            return error_response(str(e), e.status, e.fields)
         db.session.commit()
-        return success_response('Account created successfully.', account_to_dict(account), 201)
+        row = account_to_dict(account)
+        publish('accounts', 'insert', row)
+        return write_response('Account created successfully.', ACCOUNT_SCHEMA, account, row, 201)
 
 @app.route('/api/accounts/<int:account_id>', methods=['PUT', 'DELETE'])
 @login_required
@@ -454,53 +617,55 @@ def update_account(account_id):
     if not account:
         return error_response('Account not found.', 404)
     if request.method == 'PUT':
-        data = request.json
-        if not data.get('name') or not data.get('balance'):
-            return error_response('Name and balance are required.', 400)
-        account.name = data['name']
-        account.balance = data['balance']
+        try:
+            ACCOUNT_SCHEMA.apply(account, ACCOUNT_SCHEMA.load(request.json or {}))
+        except RowError as e:
+            return error_response(str(e), e.status, e.fields)
         db.session.commit()
-        return success_response('Account updated successfully.', account_to_dict(account), 200)
+        row = account_to_dict(account)
+        publish('accounts', 'update', row)
+        return write_response('Account updated successfully.', ACCOUNT_SCHEMA, account, row, 200)
     if request.method == 'DELETE':
+        deleted = account_to_dict(account)
         db.session.delete(account)
         db.session.commit()
+        publish('accounts', 'delete', deleted)
         return success_response('Account deleted successfully.', None, 200)
 
-def center_account_to_dict(acc):
-    return {
-        'CODE': acc.CODE,
-        'SUB_CODE': acc.SUB_CODE,
-        'BANK_ACC_NUMBER': acc.BANK_ACC_NUMBER,
-        'NAME': acc.NAME,
-        'IFSC': acc.IFSC,
-        'BRANCH': acc.BRANCH,
-        'AMOUNT': acc.AMOUNT
-    }
+CENTER_ACCOUNT_SCHEMA = Schema(CenterAccountDetails,
+    Field('CODE', required=True),
+    Field('SUB_CODE'),
+    Field('BANK_ACC_NUMBER', required=True),
+    Field('NAME', required=True),
+    Field('IFSC', required=True),
+    Field('BRANCH', required=True),
+    Field('AMOUNT', 'money', required=True))
+# CODE is fixed once created; an update must name the SUB_CODE
+CENTER_ACCOUNT_UPDATE_SCHEMA = CENTER_ACCOUNT_SCHEMA.derive(exclude=('CODE',), required=('SUB_CODE',))
+center_account_to_dict = CENTER_ACCOUNT_SCHEMA.dump
+
+def create_center_account(values):
+    acc = CENTER_ACCOUNT_SCHEMA.build(values)
+    db.session.add(acc)
+    return acc
 
 @app.route('/api/center_account_details', methods=['GET', 'POST'])
 @login_required
 @require_access('ACCOUNT_DETAILS')
+@read_replica
+@idempotent
 def center_account_details():
     """List or create center account details."""
     if request.method == 'GET':
-        accs = CenterAccountDetails.query.all()
-        return jsonify([center_account_to_dict(a) for a in accs]), 200
+        fields, error = requested_fields(CENTER_ACCOUNT_SCHEMA)
+        if error:
+            return error
+        return jsonify(list_rows(CENTER_ACCOUNT_SCHEMA, fields)), 200
     if request.method == 'POST':
-        data = request.json
-        required = ['CODE', 'BANK_ACC_NUMBER', 'NAME', 'IFSC', 'BRANCH', 'AMOUNT']
-        for field in required:
-            if not data.get(field):
-                return error_response(f'{field} is required.', 400)
-        acc = CenterAccountDetails(
-            CODE=data['CODE'],
-            SUB_CODE=data.get('SUB_CODE'),
-            BANK_ACC_NUMBER=data['BANK_ACC_NUMBER'],
-            NAME=data['NAME'],
-            IFSC=data['IFSC'],
-            BRANCH=data['BRANCH'],
-            AMOUNT=data['AMOUNT']
-        )
-        db.session.add(acc)
+        try:
+            acc = create_center_account(CENTER_ACCOUNT_SCHEMA.load(request.json or {}))
+        except RowError as e:
+            return error_response(str(e), e.status, e.fields)
         try:
             db.session.commit()
         except IntegrityError as e:
@@ -509,7 +674,9 @@ def center_account_details():
             if 'UNIQUE constraint failed' in str(e):
                 return error_response('Duplicate record: Center Account Details with this key already exists.', 409)
             return error_response('Database error: Unable to add record.', 409)
-        return success_response('Center account details created successfully.', center_account_to_dict(acc), 201)
+        row = center_account_to_dict(acc)
+        publish('center_account_details', 'insert', row)
+        return write_response('Center account details created successfully.', CENTER_ACCOUNT_SCHEMA, acc, row, 201)
 
 @app.route('/api/center_account_details/<int:code>/<bank_acc_number>/<name>/<ifsc>/<branch>', methods=['PUT', 'DELETE'])
 @login_required
@@ -520,24 +687,332 @@ def update_center_account_details(code, bank_acc_number, name, ifsc, branch):
     if not acc:
         return error_response('Center account details not found.', 404)
     if request.method == 'PUT':
-        data = request.json
-        required = ['SUB_CODE', 'BANK_ACC_NUMBER', 'NAME', 'IFSC', 'BRANCH', 'AMOUNT']
-        for field in required:
-            if not data.get(field):
-                return error_response(f'{field} is required.', 400)
-        acc.SUB_CODE = data['SUB_CODE']
-        acc.BANK_ACC_NUMBER = data['BANK_ACC_NUMBER']
-        acc.NAME = data['NAME']
-        acc.IFSC = data['IFSC']
-        acc.BRANCH = data['BRANCH']
-        acc.AMOUNT = data['AMOUNT']
+        try:
+            values = CENTER_ACCOUNT_UPDATE_SCHEMA.load(request.json or {})
+        except RowError as e:
+            return error_response(str(e), e.status, e.fields)
+        previous = center_account_to_dict(acc)
+        CENTER_ACCOUNT_UPDATE_SCHEMA.apply(acc, values)
         db.session.commit()
-        return success_response('Center account details updated successfully.', center_account_to_dict(acc), 200)
+        # The key columns are editable, so clients drop the old row and add the new one
+        publish('center_account_details', 'delete', previous)
+        row = center_account_to_dict(acc)
+        publish('center_account_details', 'insert', row)
+        return write_response('Center account details updated successfully.', CENTER_ACCOUNT_SCHEMA, acc, row, 200)
     if request.method == 'DELETE':
+        deleted = center_account_to_dict(acc)
         db.session.delete(acc)
         db.session.commit()
+        publish('center_account_details', 'delete', deleted)
         return success_response('Center account details deleted successfully.', None, 200)
 
+# Live updates (Server-Sent Events)
+@app.route('/api/events', methods=['GET'])
+@login_required
+def events_stream():
+    """Stream insert/update/delete events for the requested entities."""
+    requested = [e for e in request.args.get('entities', '').split(',') if e] or list(ENTITY_ACCESS)
+    unknown = [e for e in requested if e not in ENTITY_ACCESS]
+    if unknown:
+        return error_response(f"Unknown entities: {', '.join(unknown)}.", 400)
+    allowed = [e for e in requested if check_access(ENTITY_ACCESS[e])
+               and (e != 'employees' or current_user.role == 'admin')]
+    if not allowed:
+        return error_response('Access denied. Insufficient permissions.', 403)
+    ensure_listener()
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream(allowed), mimetype='text/event-stream', headers=headers)
+
+# Money reports (exact totals computed in paise)
+@app.route('/api/reports/<report>/summary', methods=['GET'])
+@login_required
+@read_replica
+def report_summary(report):
+    """Count, total and average of collections or sales, optionally grouped."""
+    spec = REPORTS.get(report)
+    if not spec:
+        return error_response('Unknown report.', 404)
+    if not check_access(spec['access']):
+        return error_response('Access denied. Insufficient permissions.', 403)
+    group_by = request.args.get('group_by') or None
+    if group_by and group_by not in spec['groups']:
+        return error_response(f"group_by must be one of: {', '.join(spec['groups'])}.", 400)
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    if request.args.get('engine') == 'array':
+        rows = array_summary(report, group_by, date_from, date_to)
+    else:
+        rows = sql_summary(report, group_by, date_from, date_to)
+    return jsonify({'report': report, 'group_by': group_by, 'rows': rows}), 200
+
+@app.route('/api/archive', methods=['GET'])
+@login_required
+@read_replica
+def archive_overview():
+    """List archived financial-year shards of collections and sales (admin only)."""
+    if current_user.role != 'admin':
+        return error_response('Unauthorized', 403)
+    return jsonify(archive_status()), 200
+
+@app.route('/api/audit', methods=['GET'])
+@login_required
+@read_replica
+def audit_log():
+    """Who changed what: audit entries filtered by entity, user and time (admin only)."""
+    if current_user.role != 'admin':
+        return error_response('Unauthorized', 403)
+    entity = request.args.get('entity')
+    if entity and entity not in ENTITY_ACCESS:
+        return error_response(f'Unknown entity: {entity}.', 400)
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 50)), 1), 500)
+        result = query_audit_log(entity, request.args.get('entity_id'), request.args.get('user'),
+                                 request.args.get('from'), request.args.get('to'), page, per_page)
+    except ValueError:
+        return error_response('page/per_page must be integers and from/to ISO dates.', 400)
+    result['writer'] = audit_writer.stats_dict()
+    return jsonify(result), 200
+
+# Background imports: entity -> its schema and create_<entity>()
+register_importer('centers', CENTER_SCHEMA, create_center)
+register_importer('collections', COLLECTION_SCHEMA, create_collection)
+register_importer('sales', SALE_SCHEMA, create_sale)
+register_importer('customers', CUSTOMER_SCHEMA, create_customer)
+register_importer('employees', USER_SCHEMA, create_employee)
+register_importer('accounts', ACCOUNT_SCHEMA, create_account)
+register_importer('center_account_details', CENTER_ACCOUNT_SCHEMA, create_center_account)
+
+@app.route('/api/schemas', methods=['GET'])
+@login_required
+def schemas():
+    """Field names, types, required flags and lengths of every importable entity."""
+    return jsonify({entity: schema.describe() for entity, (schema, create) in IMPORTERS.items()}), 200
+
+# Offline writes replayed through /api/batch: entity -> its schema
+register_batch_entity('centers', CENTER_SCHEMA)
+register_batch_entity('collections', COLLECTION_SCHEMA)
+register_batch_entity('sales', SALE_SCHEMA)
+register_batch_entity('customers', CUSTOMER_SCHEMA)
+register_batch_entity('accounts', ACCOUNT_SCHEMA)
+register_batch_entity('center_account_details', CENTER_ACCOUNT_SCHEMA)
+
+@app.route('/api/batch', methods=['POST'])
+@login_required
+def batch():
+    """Replay writes queued offline: [{id, method, path, body, base}] -> per-operation results."""
+    operations = (request.json or {}).get('operations')
+    if not isinstance(operations, list):
+        return error_response('operations must be a list.', 400)
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return error_response(f'At most {BATCH_MAX_OPERATIONS} operations per batch.', 400)
+    return jsonify({'success': True, 'results': run_batch(operations)}), 200
+
+@app.before_request
+def start_import_runner():
+    import_runner.ensure_started()
+
+# Helper: may the current user import into / read imports of an entity
+def can_import(entity):
+    if entity not in IMPORTERS:
+        return False
+    if entity == 'employees' and current_user.role != 'admin':
+        return False
+    return check_access(ENTITY_ACCESS[entity])
+
+@app.route('/api/imports', methods=['POST'])
+@login_required
+@idempotent
+def start_import():
+    """Upload parsed rows once; they are imported in background chunks."""
+    data = request.json or {}
+    entity = data.get('entity')
+    rows = data.get('rows')
+    if not can_import(entity):
+        return error_response('Access denied or unknown entity.', 403)
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        return error_response('rows must be a list of objects.', 400)
+    if len(rows) > IMPORT_MAX_ROWS:
+        return error_response(f'At most {IMPORT_MAX_ROWS} rows per import.', 400)
+    job, created = create_job(entity, current_user, rows, data.get('client_key'))
+    return success_response('Import started.' if created else 'Import already uploaded; resuming it.',
+                            job_to_dict(job), 202 if created else 200)
+
+@app.route('/api/imports/<int:job_id>', methods=['GET'])
+@login_required
+def import_progress(job_id):
+    """Progress of an import job: processed, accepted, rejected and duplicate counts."""
+    job = ImportJob.query.get(job_id)
+    if not job or (job.user_id != current_user.id and current_user.role != 'admin'):
+        return error_response('Import not found.', 404)
+    return jsonify(job_to_dict(job)), 200
+
+@app.route('/api/imports/<int:job_id>/rejected', methods=['GET'])
+@login_required
+def import_rejected(job_id):
+    """Rejected rows of an import job with the reason for each."""
+    job = ImportJob.query.get(job_id)
+    if not job or (job.user_id != current_user.id and current_user.role != 'admin'):
+        return error_response('Import not found.', 404)
+    return jsonify(rejected_rows(job_id)), 200
+
+@app.route('/api/cache/stats', methods=['GET'])
+@login_required
+def cache_stats():
+    """Hit/miss statistics of the reference-data cache (admin only)."""
+    if current_user.role != 'admin':
+        return error_response('Unauthorized', 403)
+    return jsonify(reference_cache.stats_dict()), 200
+
+# Payout runs: per-center amounts owed for a period, computed from collections
+@app.route('/api/payouts', methods=['GET', 'POST'])
+@login_required
+@require_access('ACCOUNT_DETAILS')
+@read_replica
+@idempotent
+def payouts():
+    """List payout runs (newest first) or compute a new run for {from, to}."""
+    if request.method == 'GET':
+        runs = PayoutRun.query.order_by(PayoutRun.id.desc()).all()
+        return jsonify([payout_run_to_dict(r) for r in runs]), 200
+    data = request.json or {}
+    try:
+        run = run_payout(data.get('from'), data.get('to'), current_user.username)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except IntegrityError:
+        db.session.rollback()
+        return error_response('This period is being computed by another request; try again.', 409)
+    return success_response('Payout run computed.', payout_run_to_dict(run), 201)
+
+@app.route('/api/payouts/<int:run_id>', methods=['GET'])
+@login_required
+@require_access('ACCOUNT_DETAILS')
+@read_replica
+def payout_detail(run_id):
+    """A payout run with its per-center lines (?status=ready|no_account|multiple_accounts)."""
+    run = PayoutRun.query.get(run_id)
+    if not run:
+        return error_response('Payout run not found.', 404)
+    result = payout_run_to_dict(run)
+    result['lines'] = payout_lines(run_id, request.args.get('status'))
+    return jsonify(result), 200
+
+@app.route('/api/payouts/<int:run_id>/apply', methods=['POST'])
+@login_required
+@require_access('ACCOUNT_DETAILS')
+def payout_apply(run_id):
+    """Copy a run's amounts into the matching center account details rows."""
+    run = PayoutRun.query.get(run_id)
+    if not run:
+        return error_response('Payout run not found.', 404)
+    try:
+        changed = apply_payout(run)
+    except ValueError as e:
+        return error_response(str(e), 409)
+    # Too many rows for per-row events; open grids reload instead
+    publish('center_account_details', 'resync', None)
+    return success_response(f'Payout applied to {changed} account rows.', payout_run_to_dict(run), 200)
+
+# Bank statement reconciliation against expected payouts
+@app.route('/api/reconciliations', methods=['GET', 'POST'])
+@login_required
+@require_access('ACCOUNT_DETAILS')
+@read_replica
+def reconciliations():
+    """List reconciliations or reconcile an uploaded statement (multipart: file, payout_run_id)."""
+    if request.method == 'GET':
+        recs = Reconciliation.query.order_by(Reconciliation.id.desc()).all()
+        return jsonify([reconciliation_to_dict(r) for r in recs]), 200
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return error_response('A statement file (CSV or XLSX) is required.', 400)
+    if not upload.filename.lower().endswith(('.csv', '.xlsx')):
+        return error_response('Statement must be a .csv or .xlsx file.', 400)
+    run_id = request.form.get('payout_run_id')
+    if run_id:
+        if not run_id.isdigit() or not PayoutRun.query.get(int(run_id)):
+            return error_response('Payout run not found.', 404)
+        run_id = int(run_id)
+    try:
+        rec = reconcile(upload.stream, upload.filename, run_id or None, current_user.username)
+    except (ValueError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        return error_response(f'Could not read the statement: {e}', 400)
+    return success_response('Statement reconciled.', reconciliation_to_dict(rec), 201)
+
+@app.route('/api/reconciliations/<int:rec_id>', methods=['GET'])
+@login_required
+@require_access('ACCOUNT_DETAILS')
+@read_replica
+def reconciliation_detail(rec_id):
+    """Reconciliation totals and one page of its rows (?status=matched|mismatched|unexpected|missing|invalid)."""
+    rec = Reconciliation.query.get(rec_id)
+    if not rec:
+        return error_response('Reconciliation not found.', 404)
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(2000, max(1, int(request.args.get('per_page', 500))))
+    except ValueError:
+        return error_response('page/per_page must be integers.', 400)
+    result = reconciliation_to_dict(rec)
+    result.update(reconciliation_items(rec_id, request.args.get('status'), page, per_page))
+    return jsonify(result), 200
+
+# Health checks: liveness never touches the database; readiness is the cached background probe
+health_probe = HealthProbe(app, db)
+
+@app.route('/api/health/live', methods=['GET'])
+def health_live():
+    return jsonify({'status': 'ok'}), 200
+
+@app.route('/api/health', methods=['GET'])
+@app.route('/api/health/ready', methods=['GET'])
+def health_ready():
+    ready, report = health_probe.readiness()
+    return jsonify(report), 200 if ready else 503
+
+# On-demand profiling of sampled requests to one route (admin only)
+@app.route('/api/profiling', methods=['GET', 'POST', 'DELETE'])
+@login_required
+def profiling():
+    """Show, start ({route, mode, rate, minutes, max_requests}) or stop the profiling session."""
+    if current_user.role != 'admin':
+        return error_response('Unauthorized', 403)
+    if request.method == 'POST':
+        data = request.json or {}
+        try:
+            session_ = start_session(data.get('route'), data.get('mode', 'cprofile'), data.get('rate', 0.1),
+                                     data.get('minutes', 10), data.get('max_requests', 500), current_user.username)
+        except (TypeError, ValueError) as e:
+            return error_response(str(e), 400)
+        return success_response('Profiling started.', session_summary(session_), 201)
+    if request.method == 'DELETE':
+        stop_session()
+        return success_response('Profiling stopped.')
+    current = active_session()
+    recent = ProfileSession.query.order_by(ProfileSession.id.desc()).limit(20).all()
+    return jsonify({'active': session_summary(current) if current else None,
+                    'sessions': [session_summary(s) for s in recent]}), 200
+
+@app.route('/api/profiling/<int:session_id>/download', methods=['GET'])
+@login_required
+def profiling_download(session_id):
+    """Merged results: pstats file for cprofile sessions, collapsed stacks for sampled ones."""
+    if current_user.role != 'admin':
+        return error_response('Unauthorized', 403)
+    session_ = ProfileSession.query.get(session_id)
+    if not session_:
+        return error_response('Profiling session not found.', 404)
+    if session_.mode == 'cprofile':
+        data = merged_pstats(session_id)
+        if data is None:
+            return error_response('No requests were profiled yet.', 404)
+        return Response(data, mimetype='application/octet-stream', headers={
+            'Content-Disposition': f'attachment; filename=profile_{session_id}.prof'})
+    return Response(merged_collapsed(session_id), mimetype='text/plain', headers={
+        'Content-Disposition': f'attachment; filename=profile_{session_id}.collapsed.txt'})
+
 # In-memory OTP store: {username: {otp, expires_at}}
 otp_store = {}
 
@@ -547,56 +1022,49 @@ WHATSAPP_BOT_API_URL = 'http://localhost:3001/send-message'  # Change to your bo
 # Helper: get admin's WhatsApp number from DB
 def get_admin_whatsapp_number():
     admin = User.query.filter_by(username='admin').first()
-    print(f"Debug: admin found: {admin}")
     if admin:
-        print(f"Debug: admin mobile number: {admin.MobileNumber}")
         if admin.MobileNumber:
             # Remove any + or spaces, just digits
             mobile = ''.join(filter(str.isdigit, str(admin.MobileNumber)))
-            print(f"Debug: formatted mobile: {mobile}")
             return mobile
         else:
-            print("Debug: admin mobile number is None or empty")
+            log.warning('Admin mobile number is not set')
     else:
-        print("Debug: admin user not found")
+        log.warning('Admin user not found')
     return None
 
 # Helper: send WhatsApp message via local WhatsApp Web bot
 # Assumes your bot exposes POST /send-message with JSON: {"phone": "<number>", "message": "..."}
 def send_whatsapp_otp(admin_number, otp, employee_username):
-    print(f"Debug: Sending OTP to {admin_number} for employee {employee_username}")
+    log.debug('Sending OTP for employee', extra={'employee': employee_username})
     message = f'OTP for {employee_username} login: {otp} (valid 60s)'
     payload = {
         'phone': admin_number,
         'message': message
     }
     try:
-        print(f"Debug: Making request to {WHATSAPP_BOT_API_URL} with payload: {payload}")
         resp = requests.post(WHATSAPP_BOT_API_URL, json=payload, timeout=10)
-        print(f"Debug: WhatsApp API response status: {resp.status_code}")
-        print(f"Debug: WhatsApp API response body: {resp.text}")
+        log.debug('WhatsApp bot response', extra={'status': resp.status_code, 'employee': employee_username})
         
         if resp.status_code == 503:
             # WhatsApp bot not ready, but don't fail the OTP process
-            print("Warning: WhatsApp bot not ready, but OTP generated successfully")
+            log.warning('WhatsApp bot not ready; OTP generated but not sent')
             return {'success': False, 'reason': 'whatsapp_not_ready', 'otp': otp}
         elif resp.status_code == 200:
             return {'success': True, 'reason': 'sent'}
         else:
             return {'success': False, 'reason': 'api_error', 'otp': otp}
     except Exception as e:
-        print('WhatsApp bot send error:', e)
+        log.warning('WhatsApp bot send error: %s', e)
         return {'success': False, 'reason': 'connection_error', 'otp': otp}
 
 # Patch: always use admin's number from DB
 import functools
 
 def send_whatsapp_otp_to_admin(otp, employee_username):
-    print(f"Debug: send_whatsapp_otp_to_admin called for employee: {employee_username}")
     admin_number = get_admin_whatsapp_number()
-    print(f"Debug: got admin number: {admin_number}")
     if not admin_number:
-        print('Admin WhatsApp number not found!')
+        log.warning('Admin WhatsApp number not found')
         return {'success': False, 'reason': 'no_admin_number', 'otp': otp}
     return send_whatsapp_otp(admin_number, otp, employee_username)
 
@@ -606,14 +1074,14 @@ def request_otp():
     data = request.json
     if not data or 'username' not in data or 'password' not in data:
         return error_response('Missing username or password', 400)
-    user = User.query.filter_by(username=data['username']).first()
-    if not user or not check_password_hash(user.password, data['password']):
-        return error_response('Invalid credentials', 401)
+    user, error = authenticate(data['username'], data['password'])
+    if error:
+        return error
     
     # TEMPORARILY DISABLED: WhatsApp OTP validation
     # Both admin and employee can login directly with valid credentials
     login_user(user)
-    print(f"🔓 TEMPORARY: Direct login enabled for {user.username} (role: {user.role})")
+    log.info('Direct login without OTP', extra={'username': user.username, 'role': user.role})
     return jsonify({'success': True, 'role': user.role, 'username': user.username, 'otp_required': False}), 200
     
     # ORIGINAL OTP CODE (TEMPORARILY DISABLED):
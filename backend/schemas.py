@@ -0,0 +1,253 @@
+from operator import attrgetter
+from sqlalchemy import Integer, Numeric, Float, String
+from .money import parse_money, money_json
+
+# Declarative per-model schemas (see the *_SCHEMA definitions in routes.py).
+#
+# A Schema lists the API fields of one model. When it is built it reads the
+# model's columns once and compiles each field into a converter (type and
+# length checks, money parsing) plus one attrgetter for serialization, so
+# validating a payload or dumping a row is a loop over prepared callables
+# instead of per-route if-chains.
+#
+# A field is missing only when it is absent, None or '' - never because its
+# value is falsy, so amount 0, balance 0 and quantity 0 are valid. Every field
+# is checked and all errors are returned together ({field: message}).
+# validate_many() runs a whole import chunk field by field.
+#
+# Reads can ask for a subset of fields (?fields=id,name): project() checks the
+# names, columns() lists what to SELECT, and dump(obj, fields) uses a
+# serializer compiled for that subset (cached per distinct subset).
+
+MISSING = (None, '')
+
+# Helper: invalid create payload (API request or import row)
+class RowError(ValueError):
+    def __init__(self, message, status=400, fields=None):
+        super().__init__(message)
+        self.status = status
+        self.fields = fields
+
+class Field:
+    """One API field. kind defaults to the column type: string, integer, number; or money, list."""
+
+    def __init__(self, name, kind=None, required=False, attr=None, dump=None, load_only=False, dump_only=False):
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.attr = attr or name
+        self.dump = dump  # obj -> JSON value, instead of the attribute
+        self.load_only = load_only
+        self.dump_only = dump_only
+        self.max_length = None
+
+def _to_string(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Spreadsheet imports turn codes and phone numbers into numbers
+        return str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+    raise ValueError('must be text.')
+
+def _to_integer(value):
+    if isinstance(value, bool):
+        raise ValueError('must be a whole number.')
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+        return int(value.strip())
+    raise ValueError('must be a whole number.')
+
+def _to_number(value):
+    if isinstance(value, bool):
+        raise ValueError('must be a number.')
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).strip().replace(',', ''))
+    except ValueError:
+        raise ValueError('must be a number.')
+
+def _to_list(value):
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(',') if v.strip()]
+    raise ValueError('must be a list.')
+
+CONVERTERS = {
+    'string': _to_string,
+    'integer': _to_integer,
+    'number': _to_number,
+    'money': parse_money,
+    'list': _to_list,
+}
+
+def _column_kind(column):
+    if isinstance(column.type, Integer):
+        return 'integer'
+    if isinstance(column.type, (Float, Numeric)):
+        return 'number'
+    return 'string'
+
+def _compile_converter(field):
+    convert = CONVERTERS[field.kind]
+    max_length, name = field.max_length, field.name
+
+    def converter(value):
+        try:
+            value = convert(value)
+        except ValueError as e:
+            message = str(e)
+            # Money errors name the amount already ('Invalid amount: ...')
+            raise ValueError(message if field.kind == 'money' else f'{name} {message}')
+        if max_length is not None and len(value) > max_length:
+            raise ValueError(f'{name} must be at most {max_length} characters.')
+        return value
+    return converter
+
+def _compile_dumper(fields):
+    plain = [f for f in fields if f.dump is None and f.kind != 'money']
+    names = tuple(f.name for f in plain)
+    getter = attrgetter(*(f.attr for f in plain)) if plain else (lambda obj: ())
+    if len(plain) == 1:
+        # attrgetter returns a bare value, not a tuple, for a single attribute
+        single = getter
+        getter = lambda obj: (single(obj),)
+    custom = tuple((f.name, f.dump if f.dump else (lambda obj, a=f.attr: money_json(getattr(obj, a))))
+                   for f in fields if f.dump is not None or f.kind == 'money')
+
+    def dump(obj):
+        row = dict(zip(names, getter(obj)))
+        for name, dump_field in custom:
+            row[name] = dump_field(obj)
+        return row
+    return dump
+
+def error_message(errors):
+    """One-line summary of a {field: message} dict."""
+    return ' '.join(errors.values())
+
+class Schema:
+    def __init__(self, model, *fields):
+        self.model = model
+        self.fields = fields
+        columns = model.__table__.columns
+        for field in fields:
+            column = columns.get(field.attr)
+            if field.kind is None:
+                field.kind = _column_kind(column) if column is not None else 'string'
+            if field.kind == 'string' and column is not None and isinstance(column.type, String):
+                field.max_length = column.type.length
+        self._compile()
+
+    def _compile(self):
+        # (name, attr, required, converter, keep '' for an optional text field)
+        self._loaders = tuple((f.name, f.attr, f.required, _compile_converter(f), f.kind == 'string')
+                              for f in self.fields if not f.dump_only)
+        self._dumped = {f.name: f for f in self.fields if not f.load_only}
+        self._dumpers = {None: _compile_dumper(list(self._dumped.values()))}
+
+    def derive(self, exclude=(), required=(), optional=()):
+        """A copy of this schema without some fields or with different required fields."""
+        fields = []
+        for f in self.fields:
+            if f.name in exclude:
+                continue
+            copy = Field(f.name, f.kind, f.required, f.attr, f.dump, f.load_only, f.dump_only)
+            copy.required = (f.required or f.name in required) and f.name not in optional
+            fields.append(copy)
+        return Schema(self.model, *fields)
+
+    def validate(self, data):
+        """(values keyed by model attribute, {field: message})."""
+        values, errors = {}, {}
+        if not isinstance(data, dict):
+            return values, {'_': 'Row must be an object.'}
+        for name, attr, required, convert, keep_empty in self._loaders:
+            value = data.get(name)
+            if value in MISSING:
+                if required:
+                    errors[name] = f'{name} is required.'
+                elif name in data:
+                    values[attr] = value if keep_empty else None
+                continue
+            try:
+                values[attr] = convert(value)
+            except (ValueError, TypeError) as e:
+                errors[name] = str(e)
+        return values, errors
+
+    def validate_many(self, rows):
+        """[(values, errors)] for a batch of rows, checked one field at a time."""
+        results = [({}, {}) if isinstance(row, dict) else ({}, {'_': 'Row must be an object.'}) for row in rows]
+        for name, attr, required, convert, keep_empty in self._loaders:
+            for row, (values, errors) in zip(rows, results):
+                if '_' in errors:
+                    continue
+                value = row.get(name)
+                if value in MISSING:
+                    if required:
+                        errors[name] = f'{name} is required.'
+                    elif name in row:
+                        values[attr] = value if keep_empty else None
+                    continue
+                try:
+                    values[attr] = convert(value)
+                except (ValueError, TypeError) as e:
+                    errors[name] = str(e)
+        return results
+
+    def load(self, data):
+        """Validated values for the model, or RowError listing every invalid field."""
+        values, errors = self.validate(data)
+        if errors:
+            raise RowError(error_message(errors), 400, errors)
+        return values
+
+    def build(self, values):
+        return self.model(**values)
+
+    def apply(self, obj, values):
+        """Full update (PUT): every loadable field is set, absent optional ones to None."""
+        for name, attr, *_ in self._loaders:
+            setattr(obj, attr, values.get(attr))
+
+    def project(self, spec):
+        """'id,name' -> ('id', 'name') in schema order, or RowError for unknown fields."""
+        names = {name.strip() for name in spec.split(',') if name.strip()}
+        unknown = sorted(names - self._dumped.keys())
+        if unknown:
+            raise RowError(f"Unknown fields: {', '.join(unknown)}.", 400,
+                           {'fields': f"Choose from: {', '.join(self._dumped)}."})
+        return tuple(name for name in self._dumped if name in names) or None
+
+    def columns(self, fields=None):
+        """Model attributes to load for these fields (primary keys are always loaded)."""
+        table_columns = self.model.__table__.columns
+        chosen = self._dumped.values() if fields is None else [self._dumped[name] for name in fields]
+        return [getattr(self.model, f.attr) for f in chosen if f.attr in table_columns]
+
+    def key(self, obj):
+        """The primary key of a row as {column: value}."""
+        return {c.key: getattr(obj, c.key) for c in self.model.__table__.primary_key.columns}
+
+    def _dumper(self, fields):
+        dumper = self._dumpers.get(fields)
+        if dumper is None:
+            dumper = self._dumpers[fields] = _compile_dumper([self._dumped[name] for name in fields])
+        return dumper
+
+    def dump(self, obj, fields=None):
+        return self._dumper(fields)(obj)
+
+    def dump_many(self, objs, fields=None):
+        dump = self._dumper(fields)
+        return [dump(obj) for obj in objs]
+
+    def describe(self):
+        """Field metadata for clients building forms and import checks."""
+        return [{'name': f.name, 'type': f.kind, 'required': f.required, 'max_length': f.max_length}
+                for f in self.fields if not f.dump_only]
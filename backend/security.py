@@ -0,0 +1,156 @@
+import functools
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import request
+from sqlalchemy import delete, func, insert, select
+from werkzeug.security import generate_password_hash
+from . import db
+
+try:
+    import redis
+except ImportError:  # the Redis store is optional; the database store needs nothing
+    redis = None
+
+log = logging.getLogger(__name__)
+
+# Login throttling and password-hash cost.
+#
+# Checking a password costs a deliberately slow hash (PBKDF2/scrypt), so login
+# attempts are counted in sliding windows and rejected with 429 *before* any
+# hashing once a limit is hit: per client IP (all attempts) and per username
+# (failed attempts). Windows live in a store shared by every gunicorn worker:
+# Redis when LOGIN_THROTTLE_REDIS_URL is set, otherwise the login_attempt table.
+#
+# PASSWORD_HASH_METHOD selects the hash parameters (tune it with
+# backend/bench_password_hash.py). Stored hashes made with other parameters are
+# upgraded on the user's next successful login.
+
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+LOGIN_IP_MAX_ATTEMPTS = int(os.environ.get('LOGIN_IP_MAX_ATTEMPTS', 30))
+LOGIN_IP_WINDOW_SECONDS = int(os.environ.get('LOGIN_IP_WINDOW_SECONDS', 60))
+LOGIN_USER_MAX_FAILURES = int(os.environ.get('LOGIN_USER_MAX_FAILURES', 5))
+LOGIN_USER_WINDOW_SECONDS = int(os.environ.get('LOGIN_USER_WINDOW_SECONDS', 300))
+LOGIN_THROTTLE_REDIS_URL = os.environ.get('LOGIN_THROTTLE_REDIS_URL')
+TRUSTED_PROXIES = ('127.0.0.1', '::1')
+
+def hash_password(password):
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+@functools.lru_cache(maxsize=None)
+def _method_prefix(method):
+    # Werkzeug fills in defaults ('scrypt' -> 'scrypt:32768:8:1'); compare the full form
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+def needs_rehash(password_hash):
+    """True if a stored hash was made with parameters other than PASSWORD_HASH_METHOD."""
+    return (password_hash or '').split('$', 1)[0] != _method_prefix(PASSWORD_HASH_METHOD)
+
+def client_ip():
+    """Client address; X-Real-IP is only trusted from the local nginx."""
+    if request.remote_addr in TRUSTED_PROXIES and request.headers.get('X-Real-IP'):
+        return request.headers['X-Real-IP']
+    return request.remote_addr or 'unknown'
+
+class LoginAttempt(db.Model):
+    __tablename__ = 'login_attempt'
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(200), nullable=False)
+    attempted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_login_attempt_key_attempted_at', 'key', 'attempted_at'),
+    )
+
+class DatabaseWindowStore:
+    """Sliding windows as rows in login_attempt, on a connection of their own."""
+
+    def count(self, key, window_seconds):
+        since = datetime.utcnow() - timedelta(seconds=window_seconds)
+        with db.engine.connect() as conn:
+            return conn.execute(
+                select(func.count()).select_from(LoginAttempt.__table__)
+                .where(LoginAttempt.key == key, LoginAttempt.attempted_at > since)
+            ).scalar()
+
+    def add(self, key, window_seconds):
+        now = datetime.utcnow()
+        with db.engine.begin() as conn:
+            conn.execute(insert(LoginAttempt), {'key': key, 'attempted_at': now})
+            # Trim this key's expired rows as we go so the table stays small
+            conn.execute(delete(LoginAttempt).where(
+                LoginAttempt.key == key,
+                LoginAttempt.attempted_at <= now - timedelta(seconds=window_seconds)))
+
+    def clear(self, key):
+        with db.engine.begin() as conn:
+            conn.execute(delete(LoginAttempt).where(LoginAttempt.key == key))
+
+class RedisWindowStore:
+    """Sliding windows as Redis sorted sets scored by timestamp."""
+
+    prefix = 'vks:login:'
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+
+    def count(self, key, window_seconds):
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(self.prefix + key, 0, now - window_seconds)
+        pipe.zcard(self.prefix + key)
+        return pipe.execute()[1]
+
+    def add(self, key, window_seconds):
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.zadd(self.prefix + key, {uuid.uuid4().hex: now})
+        pipe.expire(self.prefix + key, window_seconds)
+        pipe.execute()
+
+    def clear(self, key):
+        self.client.delete(self.prefix + key)
+
+class LoginThrottle:
+    def __init__(self, store):
+        self.store = store
+
+    def retry_after(self, username, ip):
+        """Seconds to wait if this attempt must be rejected, else 0. Never hashes."""
+        try:
+            if self.store.count(f'ip:{ip}', LOGIN_IP_WINDOW_SECONDS) >= LOGIN_IP_MAX_ATTEMPTS:
+                return LOGIN_IP_WINDOW_SECONDS
+            if self.store.count(f'user:{username}', LOGIN_USER_WINDOW_SECONDS) >= LOGIN_USER_MAX_FAILURES:
+                return LOGIN_USER_WINDOW_SECONDS
+        except Exception as e:
+            # Fail open: a broken throttle store must not lock everyone out
+            log.warning('Login throttle error: %s', e)
+        return 0
+
+    def record_attempt(self, ip):
+        self._add(f'ip:{ip}', LOGIN_IP_WINDOW_SECONDS)
+
+    def record_failure(self, username):
+        self._add(f'user:{username}', LOGIN_USER_WINDOW_SECONDS)
+
+    def record_success(self, username):
+        try:
+            self.store.clear(f'user:{username}')
+        except Exception as e:
+            log.warning('Login throttle error: %s', e)
+
+    def _add(self, key, window_seconds):
+        try:
+            self.store.add(key, window_seconds)
+        except Exception as e:
+            log.warning('Login throttle error: %s', e)
+
+def _make_store():
+    if LOGIN_THROTTLE_REDIS_URL and redis is not None:
+        return RedisWindowStore(LOGIN_THROTTLE_REDIS_URL)
+    if LOGIN_THROTTLE_REDIS_URL:
+        log.warning('LOGIN_THROTTLE_REDIS_URL is set but the redis package is not installed; using the database')
+    return DatabaseWindowStore()
+
+login_throttle = LoginThrottle(_make_store())
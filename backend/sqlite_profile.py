@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+import time
+from sqlalchemy import event, text
+
+log = logging.getLogger(__name__)
+
+# Tuned SQLite profile for single-box and development deployments.
+#
+# With the stock settings every commit fsyncs a rollback journal and a writer
+# locks out readers for the length of its transaction, so a few gunicorn
+# workers writing at once hit 'database is locked'. The tuned profile (the
+# default whenever DATABASE_URL is SQLite) sets, on every new connection:
+#
+#   journal_mode=WAL         readers never block the writer and vice versa
+#   synchronous=NORMAL       fsync at checkpoints, not at every commit (safe in WAL)
+#   busy_timeout             writers wait for the lock instead of failing
+#   cache_size / mmap_size   page cache per connection and memory-mapped reads
+#   temp_store=MEMORY        sorts and temp indexes stay off disk
+#
+# Each worker also runs a maintenance thread that checkpoints the WAL (PASSIVE,
+# so it never waits on readers), caps its size and runs PRAGMA optimize every
+# SQLITE_MAINTENANCE_SECONDS. SQLITE_PROFILE=default keeps the stock behaviour.
+# backend/bench_sqlite.py compares the two under concurrent writers.
+#
+# This module only depends on SQLAlchemy so the benchmark can load it on its own.
+
+SQLITE_PROFILES = ('tuned', 'default')
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 10000))
+SQLITE_CACHE_MB = int(os.environ.get('SQLITE_CACHE_MB', 64))
+SQLITE_MMAP_MB = int(os.environ.get('SQLITE_MMAP_MB', 256))
+SQLITE_JOURNAL_SIZE_LIMIT_MB = int(os.environ.get('SQLITE_JOURNAL_SIZE_LIMIT_MB', 64))
+SQLITE_MAINTENANCE_SECONDS = float(os.environ.get('SQLITE_MAINTENANCE_SECONDS', 300))
+
+def sqlite_profile(database_uri):
+    """'tuned' or 'default' for SQLite URIs, None for any other database."""
+    if not database_uri.startswith('sqlite'):
+        return None
+    profile = os.environ.get('SQLITE_PROFILE', 'tuned').lower()
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"SQLITE_PROFILE must be one of {', '.join(SQLITE_PROFILES)}, got {profile!r}")
+    return profile
+
+def tuned_pragmas():
+    return (
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('busy_timeout', SQLITE_BUSY_TIMEOUT_MS),
+        ('cache_size', -SQLITE_CACHE_MB * 1024),  # negative = KiB
+        ('mmap_size', SQLITE_MMAP_MB * 1024 * 1024),
+        ('journal_size_limit', SQLITE_JOURNAL_SIZE_LIMIT_MB * 1024 * 1024),
+        ('temp_store', 'MEMORY'),
+    )
+
+def sqlite_engine_options(database_uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for a SQLite URI (empty for the default profile)."""
+    if sqlite_profile(database_uri) != 'tuned':
+        return {}
+    # The driver's own lock wait, matching busy_timeout
+    return {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}}
+
+def apply_pragmas(dbapi_connection, connection_record=None):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in tuned_pragmas():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+def tune_engine(engine):
+    """Apply the tuned pragmas to every connection the engine opens."""
+    event.listen(engine, 'connect', apply_pragmas)
+
+class SqliteMaintenance:
+    """Periodic WAL checkpoint and PRAGMA optimize, one thread per worker process."""
+
+    def __init__(self, engine, interval=SQLITE_MAINTENANCE_SECONDS):
+        self.engine = engine
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_thread(self):
+        # Started lazily so each gunicorn worker (after fork) gets its own thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name='vks-sqlite-maintenance', daemon=True).start()
+            self._pid = os.getpid()
+
+    def run_once(self):
+        """(busy, wal pages, checkpointed pages) from the checkpoint."""
+        with self.engine.connect() as conn:
+            busy, wal_pages, checkpointed = conn.execute(text('PRAGMA wal_checkpoint(PASSIVE)')).one()
+            conn.execute(text('PRAGMA optimize'))
+            conn.commit()
+        log.debug('SQLite maintenance', extra={'busy': busy, 'wal_pages': wal_pages, 'checkpointed': checkpointed})
+        return busy, wal_pages, checkpointed
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception as e:
+                log.warning('SQLite maintenance error: %s', e)
+
+def init_sqlite(app, db):
+    """Tune the primary engine and schedule maintenance when the app runs on SQLite."""
+    if sqlite_profile(app.config['SQLALCHEMY_DATABASE_URI']) != 'tuned':
+        return None
+    with app.app_context():
+        engine = db.engine
+    tune_engine(engine)
+    maintenance = SqliteMaintenance(engine)
+    app.before_request(maintenance.ensure_thread)
+    return maintenance
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Static asset serving for the React build.
+
+The manifest of build files is built once at startup. Hashed files
+(static/js/main.1a2b3c4d.js and friends) are served with far-future immutable
+cache headers and, when the client accepts it, from their precompressed
+.br/.gz siblings. The SPA shell (index.html) is revalidated with an ETag on
+every load, and unknown asset paths get a real 404 instead of the shell.
+
+Usage:
+    python backend/static_assets.py precompress [build_dir]
+    python backend/static_assets.py manifest [build_dir]
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import sys
+
+from flask import abort, request, send_file
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; .gz variants are always produced
+    brotli = None
+
+DEFAULT_STATIC_ROOT = '/var/www/html'
+SHELL_FILE = 'index.html'
+
+# CRA puts a content hash in every build file name: main.1a2b3c4d.js, 453.9f8e7d6c.chunk.js
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,32}\.')
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+SHELL_CACHE = 'no-cache'
+
+# Encodings in order of preference, with the file suffix nginx/our precompress step uses
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+COMPRESSIBLE = {'.js', '.css', '.html', '.svg', '.json', '.txt', '.map', '.ico', '.xml'}
+MIN_COMPRESS_SIZE = 1024
+
+
+def is_hashed(rel_path):
+    """Return True if a build path carries a content hash in its name."""
+    return bool(HASHED_NAME.search(os.path.basename(rel_path)))
+
+
+def _file_etag(full_path):
+    digest = hashlib.sha1()
+    with open(full_path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:20]
+
+
+class AssetManifest:
+    """Snapshot of the build directory taken at startup."""
+
+    def __init__(self, root=None):
+        self.root = os.path.abspath(root or os.environ.get('STATIC_ROOT', DEFAULT_STATIC_ROOT))
+        self.entries = {}
+        self.build()
+
+    def build(self):
+        """Scan the build directory and record every servable file."""
+        entries = {}
+        if os.path.isdir(self.root):
+            for dirpath, _dirnames, filenames in os.walk(self.root):
+                for filename in filenames:
+                    if filename.endswith(('.br', '.gz')):
+                        continue
+                    full_path = os.path.join(dirpath, filename)
+                    rel_path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                    variants = {}
+                    for encoding, suffix in ENCODINGS:
+                        if os.path.isfile(full_path + suffix):
+                            variants[encoding] = full_path + suffix
+                    entries[rel_path] = {
+                        'path': full_path,
+                        'mimetype': mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                        'etag': _file_etag(full_path),
+                        'hashed': is_hashed(rel_path),
+                        'variants': variants,
+                    }
+        self.entries = entries
+        return entries
+
+    @property
+    def has_shell(self):
+        return SHELL_FILE in self.entries
+
+    def _send(self, entry, cache_control):
+        path = entry['path']
+        etag = entry['etag']
+        encoding = None
+        accepted = request.accept_encodings
+        for candidate, _suffix in ENCODINGS:
+            if candidate in entry['variants'] and accepted[candidate]:
+                encoding = candidate
+                path = entry['variants'][candidate]
+                etag = f"{etag}-{candidate}"
+                break
+        response = send_file(path, mimetype=entry['mimetype'], etag=etag, conditional=True,
+                             download_name=os.path.basename(entry['path']))
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if entry['variants']:
+            response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = cache_control
+        return response
+
+    def serve_shell(self):
+        """Send index.html with a short cache lifetime so new deploys are picked up."""
+        entry = self.entries.get(SHELL_FILE)
+        if not entry:
+            abort(404)
+        return self._send(entry, SHELL_CACHE)
+
+    def serve(self, path):
+        """Serve a build file, the SPA shell for client-side routes, or a 404."""
+        rel_path = path.lstrip('/')
+        entry = self.entries.get(rel_path)
+        if entry:
+            return self._send(entry, IMMUTABLE_CACHE if entry['hashed'] else SHELL_CACHE)
+        # Anything that looks like a file (hashed chunk, image, manifest) is a real miss;
+        # only extension-less paths are React Router routes that need the shell.
+        if is_hashed(rel_path) or rel_path.startswith('static/') or os.path.splitext(rel_path)[1]:
+            abort(404)
+        return self.serve_shell()
+
+
+def precompress(root):
+    """Write .gz (and .br when brotli is installed) next to compressible build files."""
+    written = 0
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            full_path = os.path.join(dirpath, filename)
+            if os.path.splitext(filename)[1].lower() not in COMPRESSIBLE:
+                continue
+            if os.path.getsize(full_path) < MIN_COMPRESS_SIZE:
+                continue
+            with open(full_path, 'rb') as fh:
+                data = fh.read()
+            outputs = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                outputs.append(('.br', brotli.compress(data, quality=11)))
+            for suffix, compressed in outputs:
+                if len(compressed) >= len(data):
+                    continue
+                with open(full_path + suffix, 'wb') as out:
+                    out.write(compressed)
+                shutil.copystat(full_path, full_path + suffix)
+                written += 1
+    return written
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'manifest'
+    build_dir = sys.argv[2] if len(sys.argv) > 2 else os.environ.get('STATIC_ROOT', DEFAULT_STATIC_ROOT)
+    if command == 'precompress':
+        count = precompress(build_dir)
+        print(f"✅ Wrote {count} precompressed file(s) in {build_dir}")
+        if brotli is None:
+            print("⚠️  brotli module not installed, only .gz variants were written")
+    elif command == 'manifest':
+        manifest = AssetManifest(build_dir)
+        hashed = sum(1 for e in manifest.entries.values() if e['hashed'])
+        compressed = sum(1 for e in manifest.entries.values() if e['variants'])
+        print(f"📦 {len(manifest.entries)} file(s) in {manifest.root}: {hashed} hashed, {compressed} precompressed")
+    else:
+        print(__doc__)
+        sys.exit(1)
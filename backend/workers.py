@@ -0,0 +1,79 @@
+import os
+
+# Worker modes for running the backend under gunicorn (see deployment/gunicorn.conf.py).
+#
+#   sync    - one request per process (the old behaviour); live update streams
+#             (/api/events) would each pin a whole worker, so it is not the default
+#   gthread - a thread pool per process; slow I/O blocks one thread, not the worker
+#             (the default: needs nothing beyond gunicorn)
+#   gevent  - cooperative greenlets; sockets, requests.post() and (via psycogreen)
+#             psycopg2 yield while waiting, so one process serves many slow calls
+#
+# The DB pool is sized per mode so concurrent requests in one process don't queue
+# on connections, without exceeding PostgreSQL's max_connections across workers.
+
+WORKER_MODES = ('sync', 'gthread', 'gevent')
+
+def worker_mode():
+    mode = os.environ.get('WORKER_MODE', 'gthread').lower()
+    if mode not in WORKER_MODES:
+        raise ValueError(f"WORKER_MODE must be one of {', '.join(WORKER_MODES)}, got {mode!r}")
+    return mode
+
+def _int_env(name, default):
+    return int(os.environ.get(name, default))
+
+def worker_settings(mode=None):
+    """gunicorn worker settings for a mode, overridable through the environment."""
+    mode = mode or worker_mode()
+    cpus = os.cpu_count() or 1
+    settings = {
+        'workers': _int_env('WEB_CONCURRENCY', 2 * cpus + 1 if mode == 'sync' else cpus + 1),
+        'worker_class': mode,
+        'timeout': _int_env('WORKER_TIMEOUT', 60),
+        'graceful_timeout': _int_env('WORKER_GRACEFUL_TIMEOUT', 30),
+        'keepalive': _int_env('WORKER_KEEPALIVE', 5),
+    }
+    if mode == 'gthread':
+        settings['threads'] = _int_env('WORKER_THREADS', 8)
+    elif mode == 'gevent':
+        settings['worker_connections'] = _int_env('WORKER_CONNECTIONS', 500)
+    return settings
+
+def requests_in_flight(mode=None):
+    """How many requests one worker process can have open at once."""
+    settings = worker_settings(mode)
+    if settings['worker_class'] == 'gthread':
+        return settings['threads']
+    if settings['worker_class'] == 'gevent':
+        return settings['worker_connections']
+    return 1
+
+def engine_options(database_uri, mode=None):
+    """SQLALCHEMY_ENGINE_OPTIONS matching the worker mode.
+
+    Pools are per process. In gevent mode the pool, not worker_connections,
+    bounds DB concurrency: greenlets beyond pool_size + max_overflow wait up to
+    pool_timeout for a connection instead of opening hundreds of them.
+    """
+    if not database_uri.startswith('postgresql'):
+        return {}
+    mode = mode or worker_mode()
+    in_flight = requests_in_flight(mode)
+    pool_size = _int_env('DB_POOL_SIZE', min(in_flight, 10))
+    return {
+        'pool_size': pool_size,
+        'max_overflow': _int_env('DB_MAX_OVERFLOW', min(in_flight, 10) if mode != 'sync' else 2),
+        'pool_timeout': _int_env('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': _int_env('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True,
+    }
+
+def patch_psycopg_for_gevent():
+    """Make psycopg2 wait cooperatively so a slow query only parks its greenlet."""
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        return False
+    patch_psycopg()
+    return True
@@ -0,0 +1,9 @@
+"""
+WSGI entry point for gunicorn:
+
+    gunicorn -c deployment/gunicorn.conf.py backend.wsgi:app
+"""
+
+from backend import create_app
+
+app = create_app()
@@ -13,6 +13,7 @@ NC='\033[0m' # No Color
 APP_NAME="vks-backend"
 APP_DIR="/var/www/vkswebui"
 LINES_TO_CHECK=100
+REQUEST_LINES_TO_CHECK=20000
 
 echo -e "${BLUE}📊 VKS Web UI Log Analysis - $(date)${NC}"
 echo "============================================="
@@ -41,6 +42,19 @@ analyze_pm2_logs() {
     fi
 }
 
+# Function to aggregate the backend's JSON request logs by route and status
+analyze_request_logs() {
+    echo -e "\n${BLUE}⏱️ Requests by Route and Status${NC}"
+    echo "------------------------------"
+
+    if pm2 list | grep -q $APP_NAME; then
+        pm2 logs $APP_NAME --lines $REQUEST_LINES_TO_CHECK --raw --nostream 2>/dev/null \
+            | python3 "$APP_DIR/backend/log_report.py" --top 15
+    else
+        echo -e "${RED}❌ PM2 application not found${NC}"
+    fi
+}
+
 # Function to analyze Nginx logs
 analyze_nginx_logs() {
     echo -e "\n${BLUE}🌐 Nginx Logs${NC}"
@@ -195,6 +209,7 @@ provide_suggestions() {
 
 # Main analysis routine
 analyze_pm2_logs
+analyze_request_logs
 analyze_nginx_logs
 analyze_system_logs
 analyze_postgres_logs
@@ -0,0 +1,138 @@
+#!/bin/bash
+# VKS Web UI - Nginx Config Generator (static assets served by Nginx, API by Flask)
+#
+# Precompresses the React build and writes an Nginx site config that serves
+# hashed assets straight from disk with immutable caching, revalidates
+# index.html with ETags, and only proxies /api/ to Flask.
+#
+# Usage: ./generate-nginx-config.sh [output_file]
+#   WEB_ROOT   React build directory (default: /var/www/html)
+#   DOMAIN     Site domain (default: littlesonagrofoods.com)
+#   BACKEND    Flask upstream (default: 127.0.0.1:5000)
+
+set -e
+
+# Colors for output
+GREEN='\033[0;32m'
+YELLOW='\033[1;33m'
+BLUE='\033[0;34m'
+NC='\033[0m' # No Color
+
+DOMAIN="${DOMAIN:-littlesonagrofoods.com}"
+WEB_ROOT="${WEB_ROOT:-/var/www/html}"
+BACKEND="${BACKEND:-127.0.0.1:5000}"
+APP_DIR="${APP_DIR:-/var/www/vkswebui}"
+OUTPUT="${1:-/etc/nginx/sites-available/$DOMAIN}"
+
+echo -e "${BLUE}⚙️ Generating Nginx config for $DOMAIN${NC}"
+
+# Precompress build files so gzip_static/brotli_static have something to serve
+echo "🗜️ Precompressing build files in $WEB_ROOT..."
+python3 "$APP_DIR/backend/static_assets.py" precompress "$WEB_ROOT"
+
+# brotli_static needs the ngx_brotli module; fall back to gzip only without it
+BROTLI_LINE="# brotli_static on;  # install ngx_brotli to enable"
+if command -v nginx &> /dev/null && nginx -V 2>&1 | grep -q brotli; then
+    BROTLI_LINE="brotli_static on;"
+    echo -e "${GREEN}✅ ngx_brotli detected, enabling brotli_static${NC}"
+else
+    echo -e "${YELLOW}⚠️ ngx_brotli not detected, serving .gz variants only${NC}"
+fi
+
+# Nginx drops server-level add_header directives in any location that sets its own,
+# so the security headers are repeated in every location below.
+SECURITY_HEADERS='add_header X-Frame-Options DENY;
+        add_header X-Content-Type-Options nosniff;
+        add_header X-XSS-Protection "1; mode=block";'
+
+cat > "$OUTPUT" << EOF
+server {
+    listen 80;
+    server_name $DOMAIN www.$DOMAIN;
+
+    # Redirect HTTP to HTTPS
+    return 301 https://\$server_name\$request_uri;
+}
+
+server {
+    listen 443 ssl http2;
+    server_name $DOMAIN www.$DOMAIN;
+
+    # SSL Configuration (Let's Encrypt)
+    ssl_certificate /etc/letsencrypt/live/$DOMAIN/fullchain.pem;
+    ssl_certificate_key /etc/letsencrypt/live/$DOMAIN/privkey.pem;
+
+    # SSL Security
+    ssl_protocols TLSv1.2 TLSv1.3;
+    ssl_ciphers ECDHE-RSA-AES128-GCM-SHA256:ECDHE-RSA-AES256-GCM-SHA384;
+    ssl_prefer_server_ciphers off;
+
+    root $WEB_ROOT;
+    etag on;
+
+    # Hashed build assets: precompressed, cached forever, missing files are real 404s
+    location ^~ /static/ {
+        gzip_static on;
+        $BROTLI_LINE
+        try_files \$uri =404;
+        $SECURITY_HEADERS
+        add_header Cache-Control "public, max-age=31536000, immutable";
+        access_log off;
+    }
+
+    # SPA shell: always revalidated so new deploys are picked up immediately
+    location = /index.html {
+        gzip_static on;
+        $BROTLI_LINE
+        $SECURITY_HEADERS
+        add_header Cache-Control "no-cache";
+    }
+
+    # Other top-level build files (favicon, manifest.json, service worker)
+    location ~* \.(ico|png|json|txt|js|css|svg|map|webmanifest)$ {
+        gzip_static on;
+        $BROTLI_LINE
+        try_files \$uri =404;
+        $SECURITY_HEADERS
+        add_header Cache-Control "no-cache";
+    }
+
+    # Client-side routes fall back to the SPA shell without touching Python
+    location / {
+        try_files \$uri /index.html;
+        $SECURITY_HEADERS
+        add_header Cache-Control "no-cache";
+    }
+
+    # API routes to Flask backend
+    location ^~ /api/ {
+        proxy_pass http://$BACKEND;
+        proxy_set_header Host \$host;
+        proxy_set_header X-Real-IP \$remote_addr;
+        proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto \$scheme;
+
+        # WebSocket support (if needed)
+        proxy_http_version 1.1;
+        proxy_set_header Upgrade \$http_upgrade;
+        proxy_set_header Connection "upgrade";
+    }
+
+    # File upload handling
+    client_max_body_size 100M;
+
+    # On-the-fly gzip for API responses (static files use the precompressed variants)
+    gzip on;
+    gzip_vary on;
+    gzip_min_length 1024;
+    gzip_types text/plain text/css text/xml text/javascript application/javascript application/xml+rss application/json;
+
+    # Logs
+    access_log /var/log/nginx/vkswebui_access.log;
+    error_log /var/log/nginx/vkswebui_error.log;
+}
+EOF
+
+echo -e "${GREEN}✅ Nginx config written to $OUTPUT${NC}"
+echo "Next steps:"
+echo "   sudo nginx -t && sudo systemctl reload nginx"
@@ -0,0 +1,33 @@
+# VKS Web UI - gunicorn configuration
+#
+# Usage (from the app directory):
+#   WORKER_MODE=gevent gunicorn -c deployment/gunicorn.conf.py backend.wsgi:app
+#
+# WORKER_MODE picks the worker class (sync, gthread or gevent); see
+# backend/workers.py for the per-mode defaults and environment overrides and
+# deployment/WORKER_MODES.md for when to use which.
+
+import importlib.util
+import os
+
+# Load backend/workers.py on its own: importing the backend package here would
+# build the Flask app in the master process, before gevent patches the workers.
+_workers_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'workers.py')
+_spec = importlib.util.spec_from_file_location('vks_workers', _workers_path)
+_workers = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_workers)
+
+_mode = _workers.worker_mode()
+globals().update(_workers.worker_settings(_mode))
+
+bind = os.environ.get('BIND', '127.0.0.1:5000')
+accesslog = os.environ.get('ACCESS_LOG', '-')
+errorlog = os.environ.get('ERROR_LOG', '-')
+# Import the app in each worker, after gevent has patched the standard library
+preload_app = False
+
+
+def post_worker_init(worker):
+    if _mode == 'gevent':
+        patched = _workers.patch_psycopg_for_gevent()
+        worker.log.info("psycopg2 gevent wait callback %s", "installed" if patched else "NOT installed (pip install psycogreen)")
@@ -14,6 +14,7 @@ NC='\033[0m' # No Color
 APP_NAME="vks-backend"
 APP_DIR="/var/www/vkswebui"
 LOG_FILE="/var/log/vks-health-check.log"
+BACKEND_URL="http://127.0.0.1:5000"
 
 echo -e "${BLUE}🔍 VKS Web UI Health Check - $(date)${NC}"
 echo "================================================="
@@ -65,6 +66,26 @@ check_database() {
     fi
 }
 
+# Function to check the backend's cached readiness probe (database, pool, WhatsApp bot, disk)
+check_backend_ready() {
+    local report
+    if ! curl -s -f -m 5 "$BACKEND_URL/api/health/live" > /dev/null; then
+        echo -e "${RED}❌ Backend is not answering /api/health/live${NC}"
+        log_message "Backend liveness: FAILED"
+        return 1
+    fi
+    if report=$(curl -s -f -m 5 "$BACKEND_URL/api/health/ready"); then
+        echo -e "${GREEN}✅ Backend is ready${NC}"
+        log_message "Backend readiness: OK"
+        echo "$report" | grep -o '"status": *"warn"' > /dev/null && echo -e "${YELLOW}⚠️  Degraded: $report${NC}"
+        return 0
+    else
+        echo -e "${RED}❌ Backend is NOT ready: $report${NC}"
+        log_message "Backend readiness: FAILED $report"
+        return 1
+    fi
+}
+
 # Function to check disk space
 check_disk_space() {
     local usage=$(df -h / | awk 'NR==2 {print $5}' | sed 's/%//')
@@ -158,6 +179,7 @@ check_pm2_app || ((services_failed++))
 echo -e "\n${BLUE}🗄️ Database Connectivity${NC}"
 echo "-------------------------"
 check_database || ((services_failed++))
+check_backend_ready || ((services_failed++))
 
 echo -e "\n${BLUE}💾 System Resources${NC}"
 echo "-------------------"
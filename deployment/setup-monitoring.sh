@@ -17,6 +17,7 @@ cat > /home/monitoring/system-monitor.sh << 'EOF'
 APP_NAME="vks-backend"
 ALERT_EMAIL="admin@your-domain.com"  # Update this
 DOMAIN="your-domain.com"             # Update this
+BACKEND_URL="http://127.0.0.1:5000"
 
 # Check critical services
 check_service() {
@@ -38,6 +39,13 @@ if ! pm2 list | grep -q "$APP_NAME.*online"; then
     pm2 restart $APP_NAME
 fi
 
+# Backend liveness (no DB work) and cached readiness (see backend/health.py)
+if ! curl -s -f -m 5 "$BACKEND_URL/api/health/live" > /dev/null; then
+    echo "ALERT: Backend is not answering /api/health/live at $(date)" >> /var/log/vks-alerts.log
+elif ! READY=$(curl -s -f -m 5 "$BACKEND_URL/api/health/ready"); then
+    echo "ALERT: Backend is not ready at $(date): $READY" >> /var/log/vks-alerts.log
+fi
+
 # Check services
 check_service nginx
 check_service postgresql
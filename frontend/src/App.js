@@ -526,6 +526,118 @@ function getRowKeyFields(row, keyFields) {
   return keyFields.map(k => row[k]).join('/');
 }
 
+const CUSTOMER_LOOKUP_BATCH = 500;
+
+// Server-side field schemas ({entity: [{name, type, required, max_length}]}), fetched once
+let schemasPromise = null;
+function loadSchemas() {
+  if (!schemasPromise) {
+    schemasPromise = fetch(`${API}/schemas`, { credentials: 'include' })
+      .then(res => (res.ok ? res.json() : {}))
+      .catch(() => ({}));
+  }
+  return schemasPromise;
+}
+
+// Missing means empty, not falsy: an amount or balance of 0 is a value
+function isBlank(value) {
+  return value === undefined || value === null || value === '';
+}
+
+// Table windowing: only the rows in view (plus an overscan margin) are rendered
+const TABLE_ROW_HEIGHT = 49;
+const TABLE_OVERSCAN_ROWS = 10;
+const TABLE_VIEWPORT_HEIGHT = '70vh';
+const FILTER_DEBOUNCE_MS = 200;
+
+function useDebouncedValue(value, delay) {
+  const [debounced, setDebounced] = React.useState(value);
+  React.useEffect(() => {
+    const timer = setTimeout(() => setDebounced(value), delay);
+    return () => clearTimeout(timer);
+  }, [value, delay]);
+  return debounced;
+}
+
+// Sort key computed once per row instead of on every comparison
+function sortKey(value) {
+  const raw = value || '';
+  const num = parseFloat(raw);
+  return { num, str: raw.toString().toLowerCase() };
+}
+
+function newIdempotencyKey() {
+  if (window.crypto && window.crypto.randomUUID) return window.crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+}
+
+// Short stable hash of a string (cyrb53), used to recognise a re-uploaded import file
+function fingerprint(str) {
+  let h1 = 0xdeadbeef, h2 = 0x41c6ce57;
+  for (let i = 0; i < str.length; i++) {
+    const ch = str.charCodeAt(i);
+    h1 = Math.imul(h1 ^ ch, 2654435761);
+    h2 = Math.imul(h2 ^ ch, 1597334677);
+  }
+  h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+  h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+  return (h2 >>> 0).toString(16).padStart(8, '0') + (h1 >>> 0).toString(16).padStart(8, '0') + '-' + str.length;
+}
+
+// Typeahead over /api/<endpoint>/lookup: fetches id/name pairs as the user types
+function LookupPicker({ endpoint, className, label, selectedName, onChange }) {
+  const { darkMode } = React.useContext(DarkModeContext);
+  const [query, setQuery] = React.useState(selectedName || '');
+  const [options, setOptions] = React.useState([]);
+  const [open, setOpen] = React.useState(false);
+
+  React.useEffect(() => {
+    setQuery(selectedName || '');
+  }, [selectedName]);
+
+  React.useEffect(() => {
+    if (!open) return undefined;
+    const timer = setTimeout(() => {
+      fetch(`${API}/${endpoint}/lookup?q=${encodeURIComponent(query)}`, { credentials: 'include' })
+        .then(r => r.json())
+        .then(data => setOptions(Array.isArray(data) ? data : []))
+        .catch(() => setOptions([]));
+    }, 200);
+    return () => clearTimeout(timer);
+  }, [query, open, endpoint]);
+
+  return (
+    <div className="relative">
+      <input
+        type="text"
+        className={className}
+        value={query}
+        placeholder={`Search ${label.toLowerCase()}`}
+        onChange={e => { setQuery(e.target.value); setOpen(true); }}
+        onFocus={() => setOpen(true)}
+        onBlur={() => setTimeout(() => setOpen(false), 150)}
+      />
+      {open && options.length > 0 && (
+        <ul className={`absolute z-20 mt-1 w-full max-h-60 overflow-auto rounded-md border shadow-lg ${darkMode ? 'bg-gray-800 border-gray-600 text-white' : 'bg-white border-gray-300'}`}>
+          {options.map(option => (
+            <li
+              key={option.id}
+              className={`px-3 py-2 cursor-pointer ${darkMode ? 'hover:bg-gray-700' : 'hover:bg-blue-50'}`}
+              onMouseDown={() => {
+                setQuery(option.name);
+                setOpen(false);
+                onChange(option);
+              }}
+            >
+              {option.name}
+            </li>
+          ))}
+        </ul>
+      )}
+    </div>
+  );
+}
+
 function CrudTable({ endpoint, columns, canEdit = true }) {
   const { darkMode } = React.useContext(DarkModeContext);
   const [rows, setRows] = React.useState([]);
@@ -536,6 +648,66 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
   const [importing, setImporting] = React.useState(false);
   const [rejectedRows, setRejectedRows] = React.useState([]);
   const fileInputRef = React.useRef();
+  const addKeyRef = React.useRef(null);
+  const [importJob, setImportJob] = React.useState(null);
+  const importStorageKey = `vks_import_${endpoint}`;
+
+  // Follow the running import (also one left over from a closed tab) until it finishes
+  React.useEffect(() => {
+    const saved = localStorage.getItem(importStorageKey);
+    setImporting(!!saved);
+    setImportJob(saved ? { id: Number(saved), status: 'queued' } : null);
+  }, [endpoint]);
+
+  React.useEffect(() => {
+    if (!importJob || importJob.status === 'done' || importJob.status === 'failed') return undefined;
+    const timer = setTimeout(async () => {
+      try {
+        const res = await fetch(`${API}/imports/${importJob.id}`, { credentials: 'include' });
+        if (res.status === 404) {
+          localStorage.removeItem(importStorageKey);
+          setImportJob(null);
+          setImporting(false);
+          return;
+        }
+        const job = await res.json();
+        setImportJob(job);
+        if (job.status === 'done' || job.status === 'failed') finishImport(job);
+      } catch {
+        setImportJob({ ...importJob });  // retry on the next tick
+      }
+    }, 1000);
+    return () => clearTimeout(timer);
+  }, [importJob]);
+
+  const finishImport = async (job) => {
+    localStorage.removeItem(importStorageKey);
+    setImporting(false);
+    fetch(`${API}/${endpoint}`, { credentials: 'include' })
+      .then(r => r.json())
+      .then(data => { if (Array.isArray(data)) setRows(data); })
+      .catch(() => {});
+    if (job.status === 'failed') {
+      showToast(`Import stopped: ${job.error || 'server error'}`, 'error');
+      return;
+    }
+    showToast(`Imported ${job.accepted} rows` + (job.duplicates ? `, ${job.duplicates} already present` : ''), 'success');
+    if (job.rejected) {
+      try {
+        const res = await fetch(`${API}/imports/${job.id}/rejected`, { credentials: 'include' });
+        const rows = await res.json();
+        const serverRejected = (Array.isArray(rows) ? rows : []).map(r => {
+          const row = {};
+          columns.forEach(col => { row[col.label] = r.data[col.key] ?? ''; });
+          return { ...row, originalData: row, Reason: r.message };
+        });
+        setRejectedRows(current => [...current, ...serverRejected]);
+        showToast(`${job.rejected} rows rejected`, 'error');
+      } catch {
+        showToast(`${job.rejected} rows rejected`, 'error');
+      }
+    }
+  };
 
   const handleImport = async (e) => {
     const file = e.target.files[0];
@@ -567,8 +739,10 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
         setImporting(false);
         return;
       }
-      let validRows = [];
+      let mappedRows = [];
       let rejected = [];
+      const schema = (await loadSchemas())[endpoint];
+      const requiredKeys = schema ? new Set(schema.filter(f => f.required).map(f => f.name)) : null;
       // Get header values for comparison
       const headerLabels = columns.map(col => col.label);
       for (const row of importedRows) {
@@ -581,8 +755,8 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
         columns.forEach(col => {
           mappedRow[col.key] = row[col.label] ?? row[col.key] ?? '';
         });
-        // Basic validation: all required fields present
-        let missing = columns.filter(col => !mappedRow[col.key]);
+        // Basic validation: required fields present (the server checks types and lengths)
+        let missing = columns.filter(col => (!requiredKeys || requiredKeys.has(col.key)) && isBlank(mappedRow[col.key]));
         if (missing.length) {
           rejected.push({ 
             ...row, 
@@ -591,43 +765,44 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
           });
           continue;
         }
-        // Try to insert
-        try {
-          const res = await fetch(`${API}/${endpoint}`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            credentials: 'include',
-            body: JSON.stringify(mappedRow)
-          });
-          let result;
-          try { result = await res.json(); } catch { result = null; }
-          if (res.ok && result && result.success) {
-            validRows.push(result.data || result);
-          } else {
-            const msg = (result && result.message) ? result.message : 'Insert failed';
-            rejected.push({ 
-              ...row, 
-              originalData: row,
-              Reason: msg 
-            });
-          }
-        } catch (err) {
-          rejected.push({ 
-            ...row, 
-            originalData: row,
-            Reason: 'Network error: ' + err.message 
-          });
-        }
-      }
-      if (validRows.length) {
-        setRows([...rows, ...validRows]);
-        showToast(`Imported ${validRows.length} rows`, 'success');
+        mappedRows.push({ row, data: mappedRow });
       }
       if (rejected.length) {
         setRejectedRows(rejected);
         showToast(`${rejected.length} rows rejected`, 'error');
       }
-      setImporting(false);
+      if (!mappedRows.length) {
+        setImporting(false);
+        return;
+      }
+      // Upload once; the server imports in chunks and skips rows it already has,
+      // so re-uploading the same file after a failure never duplicates rows.
+      const fileKey = fingerprint(JSON.stringify(mappedRows.map(r => r.data)));
+      try {
+        const res = await fetch(`${API}/imports`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          credentials: 'include',
+          body: JSON.stringify({
+            entity: endpoint,
+            client_key: fileKey,
+            rows: mappedRows.map((r, i) => ({ key: `${fileKey}:${i}`, data: r.data }))
+          })
+        });
+        let result;
+        try { result = await res.json(); } catch { result = null; }
+        if (!res.ok || !result || !result.success) {
+          const msg = (result && result.message) ? result.message : 'Import failed';
+          showToast(msg, 'error');
+          setImporting(false);
+          return;
+        }
+        localStorage.setItem(importStorageKey, String(result.data.id));
+        setImportJob(result.data);
+      } catch (err) {
+        showToast('Network error: ' + err.message, 'error');
+        setImporting(false);
+      }
     };
     if (file.name.endsWith('.xlsx')) reader.readAsBinaryString(file);
     else reader.readAsText(file);
@@ -713,7 +888,12 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
     XLSX.writeFile(wb, `${endpoint}.xlsx`);
   };
   const [page, setPage] = React.useState(1);
-  const [rowsPerPage, setRowsPerPage] = React.useState(10);
+  // 0 = all rows in one scrollable, windowed list
+  const [rowsPerPage, setRowsPerPage] = React.useState(0);
+  const [scrollTop, setScrollTop] = React.useState(0);
+  const [viewportHeight, setViewportHeight] = React.useState(600);
+  const scrollRef = React.useRef(null);
+  const scrollFrameRef = React.useRef(null);
   const [editKey, setEditKey] = React.useState(null);
   const [editRow, setEditRow] = React.useState({});
   const [adding, setAdding] = React.useState(false);
@@ -760,17 +940,130 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
         .catch(() => setAccessControlOptions([]));
     }
     
-    // Fetch customers data if this is sales endpoint or any endpoint that needs customer dropdown
-    if (endpoint === 'sales' || columns.some(col => col.type === 'select' && col.endpoint === 'customers')) {
-      fetch(`${API}/customers`, { credentials: 'include' })
+    // Customer names are looked up by id as rows load (see below), not downloaded in full
+    setCustomers([]);
+  }, [endpoint]);
+
+  // Label customer_id cells: fetch id/name pairs only for ids we have not seen yet
+  const usesCustomerLookup = columns.some(col => col.type === 'select' && col.endpoint === 'customers');
+  React.useEffect(() => {
+    if (!usesCustomerLookup) return;
+    const known = new Set(customers.map(c => String(c.id)));
+    const missing = [...new Set(rows.map(r => r.customer_id).filter(id => id !== undefined && id !== null && id !== ''))]
+      .filter(id => !known.has(String(id)));
+    for (let i = 0; i < missing.length; i += CUSTOMER_LOOKUP_BATCH) {
+      const ids = missing.slice(i, i + CUSTOMER_LOOKUP_BATCH).join(',');
+      fetch(`${API}/customers/lookup?ids=${ids}`, { credentials: 'include' })
         .then(r => r.json())
         .then(data => {
-          setCustomers(Array.isArray(data) ? data : []);
+          if (Array.isArray(data) && data.length) rememberCustomers(data);
         })
-        .catch(() => setCustomers([]));
+        .catch(() => {});
     }
+  }, [rows, usesCustomerLookup]);
+
+  const rememberCustomers = (list) => {
+    setCustomers(current => {
+      const byId = new Map(current.map(c => [String(c.id), c]));
+      list.forEach(c => byId.set(String(c.id), c));
+      return [...byId.values()];
+    });
+  };
+
+  // Offline writes replayed by the service worker: report the outcome and reload
+  React.useEffect(() => {
+    if (!navigator.serviceWorker) return undefined;
+    const onMessage = (e) => {
+      const msg = e.data || {};
+      if (msg.type !== 'OUTBOX_SYNCED') return;
+      const mine = item => item.path && item.path.split('/')[2] === endpoint;
+      const problems = [...(msg.conflicts || []), ...(msg.rejected || [])].filter(mine);
+      if (problems.length) {
+        setRejectedRows(current => [...current, ...problems.map(p => {
+          const row = {};
+          columns.forEach(col => { row[col.label] = (p.data && p.data[col.key]) ?? ''; });
+          return { ...row, originalData: row, Reason: `${p.status === 'conflict' ? 'Conflict' : 'Rejected'}: ${p.message || ''}` };
+        })]);
+      }
+      showToast(`Synced ${(msg.applied || 0) + (msg.duplicate || 0)} offline changes` +
+        (problems.length ? `, ${problems.length} need attention` : ''), problems.length ? 'error' : 'success');
+      fetch(`${API}/${endpoint}`, { credentials: 'include' })
+        .then(r => r.json())
+        .then(data => { if (Array.isArray(data)) setRows(data); })
+        .catch(() => {});
+    };
+    navigator.serviceWorker.addEventListener('message', onMessage);
+    return () => navigator.serviceWorker.removeEventListener('message', onMessage);
   }, [endpoint]);
 
+  // Live updates: apply other users' inserts/updates/deletes as they happen
+  React.useEffect(() => {
+    if (typeof EventSource === 'undefined') return undefined;
+    const source = new EventSource(`${API}/events?entities=${endpoint}`, { withCredentials: true });
+    const reload = () => {
+      fetch(`${API}/${endpoint}`, { credentials: 'include' })
+        .then(r => r.json())
+        .then(data => {
+          if (Array.isArray(data)) setRows(data);
+        })
+        .catch(() => {});
+    };
+    let connected = false;
+    source.addEventListener('ready', () => {
+      // Every 'ready' after the first is a reconnect: changes made while the
+      // stream was down were never sent, so reload the table
+      if (connected) reload();
+      connected = true;
+    });
+    source.addEventListener('change', e => {
+      let event;
+      try {
+        event = JSON.parse(e.data);
+      } catch {
+        return;
+      }
+      if (event.entity !== endpoint || !event.row) return;
+      const key = getRowKey(event.row, columns);
+      setRows(current => {
+        if (event.action === 'delete') {
+          return current.filter(r => getRowKey(r, columns) !== key);
+        }
+        const exists = current.some(r => getRowKey(r, columns) === key);
+        if (exists) {
+          return current.map(r => getRowKey(r, columns) === key ? event.row : r);
+        }
+        return [...current, event.row];
+      });
+    });
+    // Too many changes were missed; reload the whole table once
+    source.addEventListener('resync', reload);
+    return () => source.close();
+  }, [endpoint]);
+
+  // Track the scroll viewport's height for the windowed table body
+  React.useEffect(() => {
+    const measure = () => {
+      if (scrollRef.current) setViewportHeight(scrollRef.current.clientHeight || 600);
+    };
+    measure();
+    window.addEventListener('resize', measure);
+    return () => {
+      window.removeEventListener('resize', measure);
+      if (scrollFrameRef.current) cancelAnimationFrame(scrollFrameRef.current);
+    };
+  }, []);
+
+  // Back to the top whenever the visible set of rows is replaced
+  React.useEffect(() => {
+    if (scrollRef.current) scrollRef.current.scrollTop = 0;
+    setScrollTop(0);
+  }, [endpoint, page, rowsPerPage, filters, filterConditions, sortConfig]);
+
+  // The add-row form sits after the last row; bring it into view
+  React.useEffect(() => {
+    if (adding && scrollRef.current) scrollRef.current.scrollTop = scrollRef.current.scrollHeight;
+  }, [adding]);
+
   const showToast = (msg, type = 'success') => {
     setToast({ msg, type });
     setTimeout(() => setToast(null), 2000);
@@ -836,9 +1129,11 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
     }
     if (row.id) payload.id = row.id;
     setLoading(true);
+    // X-Row-Base: the row as this user last saw it, so an offline edit replayed later
+    // is reported as a conflict if someone else changed the row meanwhile
     const res = await fetch(url, {
       method: 'PUT',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', 'X-Row-Base': encodeURIComponent(JSON.stringify(row)) },
       credentials: 'include',
       body: JSON.stringify(payload)
     });
@@ -851,11 +1146,11 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
     }
     if (res.ok && result && result.success) {
       // Update the row with the response data
-      const updatedItem = result.data || result;
+      const updatedItem = result.queued ? { ...row, ...result.data } : (result.data || result);
       setRows(rows.map(r => getRowKey(r, columns) === editKey ? updatedItem : r));
       setEditKey(null);
       setEditRow({});
-      showToast('Saved!', 'success');
+      showToast(result.queued ? 'Saved offline, will sync later' : 'Saved!', 'success');
     } else {
       const msg = (result && result.message) ? result.message : 'Save failed';
       setError(msg);
@@ -888,12 +1183,22 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
   const handleAdd = async () => {
     setError('');
     setLoading(true);
-    const res = await fetch(`${API}/${endpoint}`, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      credentials: 'include',
-      body: JSON.stringify(newRow)
-    });
+    // Reuse the key when retrying after a network error so the server never saves the row twice
+    if (!addKeyRef.current) addKeyRef.current = newIdempotencyKey();
+    let res;
+    try {
+      res = await fetch(`${API}/${endpoint}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'Idempotency-Key': addKeyRef.current },
+        credentials: 'include',
+        body: JSON.stringify(newRow)
+      });
+    } catch (err) {
+      setLoading(false);
+      showToast('Network error, press Add again to retry', 'error');
+      return;
+    }
+    addKeyRef.current = null;
     setLoading(false);
     let result;
     try {
@@ -902,17 +1207,14 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
       result = null;
     }
     if (res.ok && result && result.success) {
-      // For employees endpoint, we get the full list back, so use that
-      if (endpoint === 'employees' && Array.isArray(result.data)) {
-        setRows(result.data);
-      } else {
-        // For other endpoints, add the new item to existing rows
-        const newItem = result.data || result;
-        setRows([...rows, newItem]);
-      }
+      // Every create returns just the new row
+      const newItem = result.data || result;
+      // The live update for this insert may already have added it
+      const newKey = getRowKey(newItem, columns);
+      setRows(current => [...current.filter(r => getRowKey(r, columns) !== newKey), newItem]);
       setAdding(false);
       setNewRow({});
-      showToast('Added!', 'success');
+      showToast(result.queued ? 'Saved offline, will sync later' : 'Added!', 'success');
     } else {
       const msg = (result && result.message) ? result.message : 'Add failed';
       setError(msg);
@@ -925,7 +1227,7 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
   const displayCellValue = (col, value) => {
     // Handle customer_id display as customer name
     if (col.key === 'customer_id' && col.type === 'select' && col.endpoint === 'customers') {
-      const customer = customers.find(c => c.id === value);
+      const customer = customersById.get(String(value));
       return customer ? customer.name : value || 'N/A';
     }
     
@@ -969,19 +1271,18 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
     if (col.type === 'select') {
       // Handle customer dropdown
       if (col.endpoint === 'customers') {
+        const selected = customers.find(c => String(c[col.valueKey]) === String(value));
         return (
-          <select
+          <LookupPicker
+            endpoint="customers"
             className={inputClassName}
-            value={value || ''}
-            onChange={(e) => onChange(e.target.value)}
-          >
-            <option value="">Select {col.label}</option>
-            {customers.map(customer => (
-              <option key={customer[col.valueKey]} value={customer[col.valueKey]}>
-                {customer[col.displayKey]}
-              </option>
-            ))}
-          </select>
+            label={col.label}
+            selectedName={selected ? selected[col.displayKey] : ''}
+            onChange={(item) => {
+              rememberCustomers([item]);
+              onChange(item[col.valueKey]);
+            }}
+          />
         );
       }
       
@@ -1016,22 +1317,34 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
     );
   };
 
-  // Filtering logic
-  const filteredRows = rows.filter(row =>
-    columns.every(col => {
-      const filter = filters[col.key]?.toLowerCase() || '';
-      if (!filter) return true;
-      const value = (row[col.key] || '').toString().toLowerCase();
-      const condition = filterConditions[col.key] || 'contains';
-      
-      switch (condition) {
-        case 'startswith':
-          return value.startsWith(filter);
-        case 'contains':
-        default:
-          return value.includes(filter);
-      }
-    })
+  // Filtering logic: recomputed only when the rows or the (debounced) filters change
+  const debouncedFilters = useDebouncedValue(filters, FILTER_DEBOUNCE_MS);
+  const filteredRows = React.useMemo(() => {
+    const active = columns
+      .map(col => ({
+        key: col.key,
+        filter: debouncedFilters[col.key]?.toLowerCase() || '',
+        condition: filterConditions[col.key] || 'contains'
+      }))
+      .filter(f => f.filter);
+    if (!active.length) return rows;
+    return rows.filter(row =>
+      active.every(({ key, filter, condition }) => {
+        const value = (row[key] || '').toString().toLowerCase();
+        switch (condition) {
+          case 'startswith':
+            return value.startsWith(filter);
+          case 'contains':
+          default:
+            return value.includes(filter);
+        }
+      })
+    );
+  }, [rows, columns, debouncedFilters, filterConditions]);
+
+  const customersById = React.useMemo(
+    () => new Map(customers.map(c => [String(c.id), c])),
+    [customers]
   );
 
   // MultiSelect AccessControl Component
@@ -1107,31 +1420,45 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
   // Sorting logic
   const sortedRows = React.useMemo(() => {
     if (!sortConfig.key) return filteredRows;
-    
-    return [...filteredRows].sort((a, b) => {
-      const aValue = a[sortConfig.key] || '';
-      const bValue = b[sortConfig.key] || '';
-      
+    const dir = sortConfig.direction === 'asc' ? 1 : -1;
+    const keyed = filteredRows.map(row => ({ row, k: sortKey(row[sortConfig.key]) }));
+    keyed.sort((a, b) => {
       // Handle numeric sorting
-      const aNum = parseFloat(aValue);
-      const bNum = parseFloat(bValue);
-      if (!isNaN(aNum) && !isNaN(bNum)) {
-        return sortConfig.direction === 'asc' ? aNum - bNum : bNum - aNum;
+      if (!isNaN(a.k.num) && !isNaN(b.k.num)) {
+        return (a.k.num - b.k.num) * dir;
       }
-      
       // Handle string sorting
-      const aStr = aValue.toString().toLowerCase();
-      const bStr = bValue.toString().toLowerCase();
-      
-      if (aStr < bStr) return sortConfig.direction === 'asc' ? -1 : 1;
-      if (aStr > bStr) return sortConfig.direction === 'asc' ? 1 : -1;
+      if (a.k.str < b.k.str) return -dir;
+      if (a.k.str > b.k.str) return dir;
       return 0;
     });
+    return keyed.map(item => item.row);
   }, [filteredRows, sortConfig]);
 
   // Pagination logic
-  const totalPages = Math.max(1, Math.ceil(sortedRows.length / rowsPerPage));
-  const pagedRows = sortedRows.slice((page - 1) * rowsPerPage, page * rowsPerPage);
+  const totalPages = rowsPerPage ? Math.max(1, Math.ceil(sortedRows.length / rowsPerPage)) : 1;
+  const pagedRows = React.useMemo(
+    () => rowsPerPage ? sortedRows.slice((page - 1) * rowsPerPage, page * rowsPerPage) : sortedRows,
+    [sortedRows, page, rowsPerPage]
+  );
+
+  // Windowing: render only the slice of pagedRows inside the scroll viewport
+  const firstVisible = Math.max(0, Math.floor(scrollTop / TABLE_ROW_HEIGHT) - TABLE_OVERSCAN_ROWS);
+  const lastVisible = Math.min(pagedRows.length,
+    Math.ceil((scrollTop + viewportHeight) / TABLE_ROW_HEIGHT) + TABLE_OVERSCAN_ROWS);
+  const visibleRows = pagedRows.slice(firstVisible, lastVisible);
+  const topPadding = firstVisible * TABLE_ROW_HEIGHT;
+  const bottomPadding = (pagedRows.length - lastVisible) * TABLE_ROW_HEIGHT;
+
+  const handleScroll = (e) => {
+    const top = e.currentTarget.scrollTop;
+    // At most one re-render per animation frame while scrolling
+    if (scrollFrameRef.current) return;
+    scrollFrameRef.current = requestAnimationFrame(() => {
+      scrollFrameRef.current = null;
+      setScrollTop(top);
+    });
+  };
 
   return (
     <div className="p-4 sm:p-6 lg:p-8 transition-all duration-300">
@@ -1230,7 +1557,9 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
                   onClick={() => fileInputRef.current && fileInputRef.current.click()}
                 >
                   <Upload size={16}/>
-                  {importing ? 'Importing...' : 'Import'}
+                  {importing
+                    ? (importJob && importJob.total ? `Importing ${importJob.percent}%` : 'Importing...')
+                    : 'Import'}
                 </button>
                 <input
                   type="file"
@@ -1278,7 +1607,12 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
       )}
       
       <div className={`card-shadow hover:card-shadow-hover transition-all duration-300 rounded-2xl overflow-hidden ${darkMode ? 'bg-gray-800/80 border border-gray-700' : 'bg-white border border-gray-100'} backdrop-blur-xl`}>
-        <div className="overflow-x-auto">
+        <div
+          className="overflow-auto"
+          ref={scrollRef}
+          onScroll={handleScroll}
+          style={{ maxHeight: TABLE_VIEWPORT_HEIGHT }}
+        >
         <table className="min-w-full">
           <thead className={`sticky top-0 z-10 ${darkMode ? 'bg-gray-900/70' : 'bg-gray-100/70'}`}>
             <tr>
@@ -1315,10 +1649,11 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
             </tr>
           </thead>
           <tbody>
-            {pagedRows.map((row, i) => {
+            {topPadding > 0 && <tr style={{ height: topPadding }} aria-hidden="true" />}
+            {visibleRows.map((row, i) => {
               const rowKey = getRowKey(row, columns);
               return (
-                <tr key={rowKey} className={`border-b transition-colors duration-200 ${darkMode ? 'border-gray-700 hover:bg-gray-700/50' : 'border-gray-200 hover:bg-blue-50/50'}`}>
+                <tr key={rowKey} style={{ height: TABLE_ROW_HEIGHT }} className={`border-b transition-colors duration-200 ${darkMode ? 'border-gray-700 hover:bg-gray-700/50' : 'border-gray-200 hover:bg-blue-50/50'}`}>
                   {columns.map(col => (
                     <td key={col.key} className={`p-3 ${darkMode ? 'text-gray-300' : 'text-gray-700'}`}>
                       {editKey === rowKey ? (
@@ -1359,6 +1694,7 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
                 </tr>
               );
             })}
+            {bottomPadding > 0 && <tr style={{ height: bottomPadding }} aria-hidden="true" />}
             {adding && (
               <tr className={`${darkMode ? 'bg-gray-700/50' : 'bg-yellow-50/50'}`}>
                 {columns.map(col => (
@@ -1383,7 +1719,8 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
             )}
           </tbody>
         </table>
-        
+        </div>
+        <div>
         {/* Enhanced Pagination */}
         <div className={`flex flex-col sm:flex-row items-center justify-between p-6 ${darkMode ? 'bg-gray-900/30 border-gray-700' : 'bg-gray-50/50 border-gray-200'} border-t backdrop-blur-sm`}>
           <div className="flex items-center gap-3 mb-4 sm:mb-0">
@@ -1418,6 +1755,7 @@ function CrudTable({ endpoint, columns, canEdit = true }) {
               onChange={e => { setRowsPerPage(Number(e.target.value)); setPage(1); }}
             >
               {[10, 20, 50, 100].map(n => <option key={n} value={n}>{n}</option>)}
+              <option value={0}>All</option>
             </select>
           </div>
         </div>
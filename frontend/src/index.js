@@ -12,10 +12,16 @@ root.render(
   </React.StrictMode>
 );
 
-// If you want your app to work offline and load faster, you can change
-// unregister() to register() below. Note this comes with some pitfalls.
-// Learn more about service workers: https://cra.link/PWA
-serviceWorkerRegistration.unregister();
+// The service worker caches the app shell and queues grid writes made while
+// offline (see service-worker.js). Learn more about service workers: https://cra.link/PWA
+serviceWorkerRegistration.register();
+
+// Replay queued offline writes as soon as the connection comes back
+window.addEventListener('online', () => {
+  if (navigator.serviceWorker && navigator.serviceWorker.controller) {
+    navigator.serviceWorker.controller.postMessage({ type: 'REPLAY_OUTBOX' });
+  }
+});
 
 // If you want to start measuring performance in your app, pass a function
 // to log results (for example: reportWebVitals(console.log))
@@ -70,3 +70,183 @@ self.addEventListener('message', (event) => {
 });
 
 // Any other custom service worker logic can go here.
+
+// Offline outbox.
+//
+// Creates (POST) and updates (PUT) to the grid endpoints that fail because the
+// network is down are stored in IndexedDB and answered with 202 {queued: true}.
+// When the connection comes back (Background Sync, the page's 'online' event or
+// the next successful write), they are replayed in order, OUTBOX_BATCH_SIZE at
+// a time, through POST /api/batch. Each operation keeps the request's
+// Idempotency-Key, so a write that did reach the server is never applied twice.
+// Updates carry the row as the user last saw it (X-Row-Base), and the server
+// reports a conflict instead of overwriting someone else's change.
+const OUTBOX_DB = 'vks-outbox';
+const OUTBOX_STORE = 'operations';
+const OUTBOX_SYNC_TAG = 'vks-outbox';
+const OUTBOX_BATCH_SIZE = 50;
+const QUEUEABLE_PATH = /^\/api\/(centers|collections|sales|customers|accounts|center_account_details)(\/.*)?$/;
+
+function openOutbox() {
+  return new Promise((resolve, reject) => {
+    const request = indexedDB.open(OUTBOX_DB, 1);
+    request.onupgradeneeded = () => {
+      request.result.createObjectStore(OUTBOX_STORE, { keyPath: 'seq', autoIncrement: true });
+    };
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+// Run fn(store) in one transaction; resolves with the result of the request fn returns, if any
+async function withOutbox(mode, fn) {
+  const db = await openOutbox();
+  return new Promise((resolve, reject) => {
+    const tx = db.transaction(OUTBOX_STORE, mode);
+    const request = fn(tx.objectStore(OUTBOX_STORE));
+    tx.oncomplete = () => {
+      db.close();
+      resolve(request ? request.result : undefined);
+    };
+    tx.onerror = () => {
+      db.close();
+      reject(tx.error);
+    };
+  });
+}
+
+function parseJSON(text) {
+  try {
+    return text ? JSON.parse(text) : null;
+  } catch (err) {
+    return null;
+  }
+}
+
+function newOperationId() {
+  if (self.crypto && self.crypto.randomUUID) return self.crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+async function notifyClients(message) {
+  const clients = await self.clients.matchAll({ type: 'window' });
+  clients.forEach(client => client.postMessage(message));
+}
+
+async function requestReplay() {
+  if (self.registration.sync) {
+    try {
+      await self.registration.sync.register(OUTBOX_SYNC_TAG);
+    } catch (err) {
+      // Background Sync unavailable; the page's 'online' event triggers the replay
+    }
+  }
+}
+
+async function queueableWrite({ request }) {
+  const body = await request.clone().text();
+  try {
+    const response = await fetch(request);
+    // We are online again: flush anything queued earlier
+    withOutbox('readonly', store => store.count()).then(pending => { if (pending) replayOutbox(); });
+    return response;
+  } catch (err) {
+    const base = request.headers.get('X-Row-Base');
+    await withOutbox('readwrite', store => store.add({
+      id: request.headers.get('Idempotency-Key') || newOperationId(),
+      method: request.method,
+      path: new URL(request.url).pathname,
+      body,
+      base: base ? parseJSON(decodeURIComponent(base)) : null,
+      queuedAt: Date.now(),
+    }));
+    await requestReplay();
+    const pending = await withOutbox('readonly', store => store.count());
+    notifyClients({ type: 'OUTBOX_QUEUED', pending });
+    return new Response(JSON.stringify({
+      success: true,
+      queued: true,
+      message: 'Saved offline. It will sync when the connection is back.',
+      data: parseJSON(body),
+    }), { status: 202, headers: { 'Content-Type': 'application/json' } });
+  }
+}
+
+const isQueueable = ({ url }) => url.origin === self.location.origin && QUEUEABLE_PATH.test(url.pathname);
+registerRoute(isQueueable, queueableWrite, 'POST');
+registerRoute(isQueueable, queueableWrite, 'PUT');
+
+let replaying = null;
+
+function replayOutbox() {
+  if (!replaying) {
+    replaying = replayBatches().finally(() => { replaying = null; });
+  }
+  return replaying;
+}
+
+async function replayBatches() {
+  const summary = { applied: 0, duplicate: 0, conflicts: [], rejected: [] };
+  let processed = 0;
+  for (;;) {
+    const operations = (await withOutbox('readonly', store => store.getAll())).slice(0, OUTBOX_BATCH_SIZE);
+    if (!operations.length) break;
+    let results;
+    try {
+      const response = await fetch('/api/batch', {
+        method: 'POST',
+        credentials: 'include',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          operations: operations.map(({ id, method, path, body, base }) => ({ id, method, path, body, base })),
+        }),
+      });
+      if (!response.ok) break;  // e.g. logged out: keep everything for later
+      results = (await response.json()).results || [];
+    } catch (err) {
+      break;  // still offline
+    }
+    const finished = [];
+    let retryLater = false;
+    // Stop at the first retry: it and everything queued after it stay in order,
+    // so the retried write is never replayed over newer writes to the same row
+    for (let i = 0; i < results.length; i += 1) {
+      const result = results[i];
+      const operation = operations[i];
+      if (!operation) break;
+      if (result.status === 'retry') {
+        retryLater = true;
+        break;
+      }
+      finished.push(operation.seq);
+      if (result.status === 'conflict' || result.status === 'rejected') {
+        summary[result.status === 'conflict' ? 'conflicts' : 'rejected'].push({
+          ...result,
+          path: operation.path,
+          data: parseJSON(operation.body),
+        });
+      } else {
+        summary[result.status] = (summary[result.status] || 0) + 1;
+      }
+    }
+    await withOutbox('readwrite', store => { finished.forEach(seq => store.delete(seq)); });
+    processed += finished.length;
+    if (retryLater || !finished.length) break;
+  }
+  if (processed) {
+    const pending = await withOutbox('readonly', store => store.count());
+    notifyClients({ type: 'OUTBOX_SYNCED', pending, ...summary });
+  }
+}
+
+self.addEventListener('sync', (event) => {
+  if (event.tag === OUTBOX_SYNC_TAG) {
+    event.waitUntil(replayOutbox());
+  }
+});
+
+self.addEventListener('message', (event) => {
+  if (event.data && event.data.type === 'REPLAY_OUTBOX') {
+    event.waitUntil(replayOutbox());
+  }
+});
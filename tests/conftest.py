@@ -0,0 +1,272 @@
+"""
+Shared fixtures for the API tests.
+
+The backend is imported against a throwaway SQLite file, seeded once through
+the API, and the seeded file is restored (SQLite backup API) before every test,
+so each test sees the same rows whatever earlier tests wrote.
+
+query_counter counts the SQL statements executed and the rows fetched by the
+test's own thread (background threads such as the import runner and the audit
+writer are ignored). Rows are counted by a sqlite3 cursor subclass installed on
+every connection through the engine's do_connect event.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_TMP = tempfile.mkdtemp(prefix='vks-tests-')
+DB_PATH = os.path.join(_TMP, 'test.db')
+SEEDED_PATH = os.path.join(_TMP, 'seeded.db')
+
+# Before the backend is imported: it reads these at import time
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+os.environ['SQLITE_PROFILE'] = 'default'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ['PROFILE_POLL_SECONDS'] = '86400'
+# Logins and seeded employees should not spend seconds on key stretching
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+sys.path.insert(0, ROOT)
+
+# backend/models.py is not part of this repository and the backend cannot be
+# imported without it; the budgets are only meaningful against the real models
+HAVE_MODELS = os.path.exists(os.path.join(ROOT, 'backend', 'models.py'))
+
+from sqlalchemy import event  # noqa: E402
+if HAVE_MODELS:
+    from backend import create_app, db  # noqa: E402
+    from backend.models import User  # noqa: E402
+    from backend.audit import audit_writer  # noqa: E402
+    from backend.cache import reference_cache, CACHED_ENTITIES  # noqa: E402
+    from backend.security import hash_password  # noqa: E402
+else:
+    collect_ignore_glob = ['test_*.py']
+
+def pytest_report_header(config):
+    if not HAVE_MODELS:
+        return 'backend/models.py is not in this checkout: no tests collected (the suite needs the real model module)'
+
+BUDGETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_budgets.json')
+# Latency is noisy, so it only fails far beyond the recorded value
+LATENCY_FACTOR = float(os.environ.get('QUERY_BUDGET_LATENCY_FACTOR', 5))
+LATENCY_SLACK_MS = float(os.environ.get('QUERY_BUDGET_LATENCY_SLACK_MS', 50))
+
+SEED_SIZES = {'centers': 20, 'customers': 30, 'collections': 60, 'sales': 60, 'accounts': 10,
+              'center_account_details': 10, 'employees': 5}
+ITEMS = ('Milk', 'Cream', 'Butter', 'Others')
+
+def pytest_addoption(parser):
+    parser.addoption('--update-query-budgets', action='store_true',
+                     help='record the measured statements/rows/latency as the new budgets instead of checking them')
+
+class QueryCounter:
+    """Statements and rows fetched by the measuring thread."""
+
+    def __init__(self):
+        self.thread = None
+        self.statements = []
+        self.rows = 0
+
+    def on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self.thread:
+            self.statements.append(statement)
+
+    def add_rows(self, n):
+        if threading.get_ident() == self.thread:
+            self.rows += n
+
+    @contextmanager
+    def measure(self):
+        self.statements, self.rows = [], 0
+        self.thread = threading.get_ident()
+        try:
+            yield self
+        finally:
+            self.thread = None
+
+    def repeated(self, limit=3):
+        """The most repeated statements, the usual sign of an N+1 loop."""
+        return [(count, statement.split('\n')[0][:120])
+                for statement, count in Counter(self.statements).most_common(limit) if count > 1]
+
+counter = QueryCounter()
+
+class CountingCursor(sqlite3.Cursor):
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            counter.add_rows(1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = super().fetchmany(*args, **kwargs)
+        counter.add_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        counter.add_rows(len(rows))
+        return rows
+
+class CountingConnection(sqlite3.Connection):
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+def _instrument(engine):
+    @event.listens_for(engine, 'do_connect')
+    def _counting_connection(dialect, connection_record, cargs, cparams):
+        cparams['factory'] = CountingConnection
+    event.listen(engine, 'before_cursor_execute', counter.on_execute)
+    # Reconnect so every pooled connection uses the counting cursor
+    engine.dispose()
+
+def _seed(client):
+    def post(path, body):
+        response = client.post(path, json=body)
+        assert response.status_code == 201, (path, response.get_data(as_text=True))
+
+    for i in range(1, SEED_SIZES['centers'] + 1):
+        post('/api/centers', {'name': f'Center {i:02d}', 'location': f'Village {i % 7}'})
+    for i in range(1, SEED_SIZES['customers'] + 1):
+        post('/api/customers', {'name': f'Customer {i:02d}', 'mobile_number': f'98765{i:05d}',
+                                'bank': 'SBI', 'ifsc_code': f'SBIN000{i:04d}', 'account_number': f'1000{i:06d}'})
+    for i in range(SEED_SIZES['collections']):
+        post('/api/collections', {'amount': 100 + i * 12.5, 'date': f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}',
+                                  'center_id': i % SEED_SIZES['centers'] + 1})
+    for i in range(SEED_SIZES['sales']):
+        post('/api/sales', {'item': ITEMS[i % len(ITEMS)], 'quantity': i % 9 + 1, 'price': 45.5,
+                            'date': f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}',
+                            'customer_id': i % SEED_SIZES['customers'] + 1})
+    for i in range(1, SEED_SIZES['accounts'] + 1):
+        post('/api/accounts', {'name': f'Account {i:02d}', 'balance': i * 1000})
+    for i in range(1, SEED_SIZES['center_account_details'] + 1):
+        post('/api/center_account_details', {'CODE': i, 'SUB_CODE': f'S{i}', 'BANK_ACC_NUMBER': f'2000{i:06d}',
+                                             'NAME': f'Center {i:02d}', 'IFSC': f'SBIN000{i:04d}',
+                                             'BRANCH': 'Main', 'AMOUNT': 0})
+    for i in range(1, SEED_SIZES['employees'] + 1):
+        post('/api/employees', {'username': f'employee{i}', 'password': 'secret', 'role': 'employee',
+                                'MobileNumber': f'90000{i:05d}', 'EmailID': f'employee{i}@example.com',
+                                'AccessControl': ['CENTER', 'COLLECTIONS']})
+
+def _restore(app):
+    source = sqlite3.connect(SEEDED_PATH)
+    with app.app_context():
+        raw = db.engine.raw_connection()
+        try:
+            source.backup(raw.driver_connection)
+        finally:
+            raw.close()
+            source.close()
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        _instrument(db.engine)
+        admin = User(username='admin', password=hash_password('admin'), role='admin',
+                     MobileNumber='9000000000', EmailID='admin@example.com')
+        admin.set_access_list(['FULL'])
+        db.session.add(admin)
+        db.session.commit()
+    return app
+
+@pytest.fixture(scope='session')
+def client(app):
+    """Admin client, logged in once; the seed data is created through it."""
+    client = app.test_client()
+    assert client.post('/api/login', json={'username': 'admin', 'password': 'admin'}).status_code == 200
+    _seed(client)
+    audit_writer.flush()
+    with app.app_context():
+        raw = db.engine.raw_connection()
+        try:
+            target = sqlite3.connect(SEEDED_PATH)
+            raw.driver_connection.backup(target)
+            target.close()
+        finally:
+            raw.close()
+    return client
+
+@pytest.fixture
+def seeded(app, client):
+    """Restore the seed data and empty the reference caches before a test."""
+    audit_writer.flush()
+    _restore(app)
+    for entity in CACHED_ENTITIES:
+        reference_cache.invalidate(entity)
+    return client
+
+@pytest.fixture
+def query_counter():
+    return counter
+
+class Budgets:
+    """Recorded per-endpoint budgets (query_budgets.json): checked, or rewritten with --update-query-budgets."""
+
+    def __init__(self, path, update):
+        self.path = path
+        self.update = update
+        self.measured = {}
+        try:
+            with open(path) as f:
+                self.recorded = json.load(f)
+        except FileNotFoundError:
+            self.recorded = {}
+
+    def check(self, name, measurement, counter):
+        self.measured[name] = measurement
+        if self.update:
+            return
+        budget = self.recorded.get(name)
+        if budget is None:
+            pytest.fail(f'No budget recorded for {name!r}; run pytest --update-query-budgets and commit '
+                        f'tests/query_budgets.json.')
+        problems = []
+        for key in ('statements', 'rows'):
+            if measurement[key] > budget[key]:
+                problems.append(f"{key}: {measurement[key]} > budget {budget[key]}")
+        latency_limit = max(budget['ms'] * LATENCY_FACTOR, budget['ms'] + LATENCY_SLACK_MS)
+        if measurement['ms'] > latency_limit:
+            problems.append(f"ms: {measurement['ms']} > {latency_limit:.1f} (recorded {budget['ms']})")
+        if problems:
+            repeated = ''.join(f'\n  {count}x {statement}' for count, statement in counter.repeated())
+            pytest.fail(f"{name} is over budget: {'; '.join(problems)}"
+                        + (f'\nRepeated statements:{repeated}' if repeated else ''))
+
+    def save(self):
+        merged = dict(self.recorded)
+        merged.update(self.measured)
+        with open(self.path, 'w') as f:
+            json.dump(dict(sorted(merged.items())), f, indent=2)
+            f.write('\n')
+
+@pytest.fixture(scope='session')
+def budgets(request):
+    budgets = Budgets(BUDGETS_PATH, request.config.getoption('--update-query-budgets'))
+    yield budgets
+    if budgets.update and budgets.measured:
+        budgets.save()
+
+@pytest.fixture
+def measure(seeded, query_counter, budgets):
+    """measure(name, method, path, body=None) -> response, checked against the budget for name."""
+    def run(name, method, path, body=None):
+        with query_counter.measure():
+            started = time.perf_counter()
+            response = seeded.open(path, method=method, json=body)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        assert response.status_code < 400, f'{name}: {response.status_code} {response.get_data(as_text=True)}'
+        budgets.check(name, {'statements': len(query_counter.statements), 'rows': query_counter.rows,
+                             'ms': round(elapsed_ms, 1)}, query_counter)
+        return response
+    return run
@@ -0,0 +1,30 @@
+"""Audit entries follow the transaction: written on commit, dropped on rollback."""
+
+from backend import db
+from backend.audit import AuditLog, audit_writer
+from backend.models import Center
+
+def _audited_names(names):
+    audit_writer.flush()
+    rows = AuditLog.query.filter_by(entity='centers', action='insert').all()
+    return sorted(name for name in names if any(name in row.changes for row in rows))
+
+def test_rolled_back_savepoint_keeps_outer_entries(app, seeded):
+    with app.app_context():
+        db.session.add(Center(name='Audit Outer', location='Kept'))
+        db.session.flush()
+        savepoint = db.session.begin_nested()
+        db.session.add(Center(name='Audit Savepoint', location='Rolled back'))
+        db.session.flush()
+        savepoint.rollback()
+        db.session.commit()
+        assert _audited_names(['Audit Outer', 'Audit Savepoint']) == ['Audit Outer']
+
+def test_rolled_back_transaction_writes_nothing(app, seeded):
+    with app.app_context():
+        db.session.add(Center(name='Audit Discarded', location='Rolled back'))
+        db.session.flush()
+        db.session.rollback()
+        db.session.add(Center(name='Audit Next', location='Kept'))
+        db.session.commit()
+        assert _audited_names(['Audit Discarded', 'Audit Next']) == ['Audit Next']
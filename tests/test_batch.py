@@ -0,0 +1,29 @@
+"""Offline write replay through /api/batch."""
+
+import json
+
+from backend import batch
+
+def _op(op_id, name):
+    return {'id': op_id, 'method': 'POST', 'path': '/api/centers',
+            'body': json.dumps({'name': name, 'location': 'Offline'})}
+
+def test_sub_requests_keep_the_batch_request_id(seeded):
+    response = seeded.post('/api/batch', json={'operations': [_op('op-1', 'Batch A'), _op('op-2', 'Batch B')]},
+                           headers={'X-Request-ID': 'outer-batch'})
+    assert [r['status'] for r in response.get_json()['results']] == ['applied', 'applied']
+    assert response.headers['X-Request-ID'] == 'outer-batch'
+
+def test_batch_stops_at_first_retry(seeded, monkeypatch):
+    dispatch = batch._dispatch
+
+    def flaky(method, path, body, op_id):
+        if op_id == 'op-2':
+            raise RuntimeError('database unavailable')
+        return dispatch(method, path, body, op_id)
+    monkeypatch.setattr(batch, '_dispatch', flaky)
+    operations = [_op('op-1', 'Retry A'), _op('op-2', 'Retry B'), _op('op-3', 'Retry C')]
+    results = seeded.post('/api/batch', json={'operations': operations}).get_json()['results']
+    assert [(r['id'], r['status']) for r in results] == [('op-1', 'applied'), ('op-2', 'retry'), ('op-3', 'retry')]
+    names = [c['name'] for c in seeded.get('/api/centers').get_json()]
+    assert 'Retry A' in names and 'Retry C' not in names
@@ -0,0 +1,13 @@
+"""Reference cache on SQLite: entries other workers cannot invalidate expire quickly."""
+
+from backend import cache
+from backend.cache import reference_cache
+
+def test_memory_entries_use_the_local_ttl_without_notify(app, seeded, monkeypatch):
+    monkeypatch.setattr(cache, 'CACHE_LOCAL_TTL_SECONDS', -1)
+    loads = []
+    with app.app_context():
+        for _ in range(2):
+            reference_cache.get_or_load('ttl-test', lambda: loads.append(1) or ['row'])
+        reference_cache.invalidate('ttl-test')
+    assert len(loads) == 2
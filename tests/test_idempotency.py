@@ -0,0 +1,60 @@
+"""Idempotency-Key reservations: taken over from dead owners or once their lease runs out."""
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+
+from backend import db, idempotency
+from backend.idempotency import IdempotencyRecord
+
+CENTER = {'name': 'Idempotent Center', 'location': 'Village 1'}
+BODY = json.dumps(CENTER)
+BODY_HASH = hashlib.sha256(f'POST /api/centers\n{BODY}'.encode('utf-8')).hexdigest()
+
+def _reservation(app, key, owner, age_seconds=0):
+    created = datetime.utcnow() - timedelta(seconds=age_seconds)
+    with app.app_context(), db.engine.begin() as conn:
+        conn.execute(insert(IdempotencyRecord), {
+            'user_id': 1, 'key': key, 'request_hash': BODY_HASH, 'status': 'in_progress', 'owner': owner,
+            'created_at': created, 'expires_at': datetime.utcnow() + timedelta(hours=1)})
+
+def _center_names(client):
+    return [c['name'] for c in client.get('/api/centers').get_json()]
+
+def _post(client, key):
+    return client.post('/api/centers', data=BODY, content_type='application/json', headers={'Idempotency-Key': key})
+
+def test_running_request_keeps_its_reservation(app, seeded):
+    # Within its lease and its process is alive: still in progress
+    _reservation(app, 'slow', idempotency._new_owner(), age_seconds=idempotency.IDEMPOTENCY_LEASE_SECONDS - 60)
+    response = _post(seeded, 'slow')
+    assert response.status_code == 409 and response.headers['Retry-After']
+    assert CENTER['name'] not in _center_names(seeded)
+
+def test_expired_lease_is_taken_over_from_a_live_process(app, seeded):
+    # A hung worker (or a reused pid) must not hold the key until the replay TTL
+    _reservation(app, 'hung', idempotency._new_owner(), age_seconds=idempotency.IDEMPOTENCY_LEASE_SECONDS + 60)
+    assert _post(seeded, 'hung').status_code == 201
+    assert _center_names(seeded).count(CENTER['name']) == 1
+
+def test_reservation_of_a_dead_process_is_taken_over(app, seeded, monkeypatch):
+    monkeypatch.setattr(idempotency, '_process_alive', lambda pid: False)
+    _reservation(app, 'crashed', f'{idempotency._HOST}:12345:dead')
+    assert _post(seeded, 'crashed').status_code == 201
+    assert _center_names(seeded).count(CENTER['name']) == 1
+
+def test_superseded_request_does_not_commit(app, seeded, monkeypatch):
+    reserve = idempotency._reserve
+
+    def taken_over_meanwhile(user_id, key, request_hash, owner):
+        existing = reserve(user_id, key, request_hash, owner)
+        table = IdempotencyRecord.__table__
+        with db.engine.begin() as conn:
+            conn.execute(update(table).where(table.c.key == key).values(owner='other-host:1:retry'))
+        return existing
+    monkeypatch.setattr(idempotency, '_reserve', taken_over_meanwhile)
+    response = _post(seeded, 'superseded')
+    assert response.status_code == 409
+    assert CENTER['name'] not in _center_names(seeded)
@@ -0,0 +1,40 @@
+"""Background import jobs: checkpoints owned by the claiming worker, keys scoped per user."""
+
+from backend import db, imports
+from backend.imports import ImportJob, create_job, run_job
+from backend.models import Center, User
+
+def _rows(*names):
+    return [{'key': f'key-{name}', 'data': {'name': name, 'location': 'Imported'}} for name in names]
+
+def _claim(monkeypatch):
+    # Keep the background runner away from the jobs the test runs itself
+    claim = imports._claim_job
+    monkeypatch.setattr(imports, '_claim_job', lambda: (None, None))
+    return claim
+
+def _center_count(name):
+    return Center.query.filter_by(name=name).count()
+
+def test_chunk_of_a_reclaimed_job_is_rolled_back(app, seeded, monkeypatch):
+    claim = _claim(monkeypatch)
+    with app.app_context():
+        create_job('centers', db.session.get(User, 1), _rows('Lost A', 'Lost B'))
+        job, worker = claim()
+        db.session.execute(db.update(ImportJob).where(ImportJob.id == job.id).values(worker='another-worker'))
+        db.session.commit()
+        run_job(job, worker)
+        job = db.session.get(ImportJob, job.id)
+        assert (job.next_row, job.accepted, job.worker) == (0, 0, 'another-worker')
+        assert _center_count('Lost A') == 0
+
+def test_same_key_from_another_user_is_not_a_duplicate(app, seeded, monkeypatch):
+    claim = _claim(monkeypatch)
+    with app.app_context():
+        for user_id in (1, 2, 1):
+            create_job('centers', db.session.get(User, user_id), _rows('Shared Key'))
+            job, worker = claim()
+            run_job(job, worker)
+        jobs = ImportJob.query.order_by(ImportJob.id).all()[-3:]
+        assert [(j.status, j.accepted, j.duplicates) for j in jobs] == [('done', 1, 0), ('done', 1, 0), ('done', 0, 1)]
+        assert _center_count('Shared Key') == 2
@@ -0,0 +1,37 @@
+"""Customer ledger totals under concurrent first postings."""
+
+from decimal import Decimal
+
+from backend import db, ledger
+from backend.ledger import CustomerBalance, CustomerPeriodBalance, post_entry
+
+CUSTOMER_ID = 9001
+
+def test_first_posting_that_loses_the_insert_adds_to_the_other_row(app, seeded, monkeypatch):
+    insert_ignore = ledger._insert_ignore
+
+    def racing_insert(model, values):
+        if model is CustomerBalance:
+            # Another worker posts for the same new customer between our read and our insert
+            with db.engine.begin() as conn:
+                conn.execute(CustomerBalance.__table__.insert().values(
+                    customer_id=CUSTOMER_ID, balance=Decimal('5.00'), total_quantity=1, entry_count=1))
+        return insert_ignore(model, values)
+    monkeypatch.setattr(ledger, '_insert_ignore', racing_insert)
+    with app.app_context():
+        entry = post_entry(CUSTOMER_ID, '2026-10', Decimal('7.50'), 2, 'sale')
+        db.session.commit()
+        balance = db.session.get(CustomerBalance, CUSTOMER_ID)
+        period = db.session.get(CustomerPeriodBalance, (CUSTOMER_ID, '2026-10'))
+        assert (balance.balance, balance.total_quantity, balance.entry_count) == (Decimal('12.50'), 3, 2)
+        assert (period.amount, period.quantity) == (Decimal('7.50'), 2)
+        assert entry.balance_after == Decimal('12.50')
+
+def test_first_posting_creates_the_totals(app, seeded):
+    with app.app_context():
+        post_entry(CUSTOMER_ID, '2026-10', Decimal('7.50'), 2, 'sale')
+        post_entry(CUSTOMER_ID, '2026-10', Decimal('-2.50'), -1, 'adjustment')
+        db.session.commit()
+        balance = db.session.get(CustomerBalance, CUSTOMER_ID)
+        assert (balance.balance, balance.total_quantity, balance.entry_count) == (Decimal('5.00'), 1, 2)
+        assert db.session.get(CustomerPeriodBalance, (CUSTOMER_ID, '2026-10')).amount == Decimal('5.00')
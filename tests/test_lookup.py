@@ -0,0 +1,33 @@
+"""In-memory prefix lookups (SQLite): expiry and invalidation while loading."""
+
+from backend import db
+from backend.lookup import PrefixIndex
+from backend.models import Center
+
+def _add_center(name):
+    # A write from another worker: committed, but no event reaches this process
+    db.session.add(Center(name=name, location='Elsewhere'))
+    db.session.commit()
+
+def test_expired_index_sees_writes_from_other_workers(app, seeded):
+    with app.app_context():
+        fresh, expiring = PrefixIndex(Center), PrefixIndex(Center, ttl=0)
+        assert fresh.search('Lookup', 5) == expiring.search('Lookup', 5) == []
+        _add_center('Lookup Remote')
+        assert fresh.search('Lookup', 5) == []
+        assert [r['name'] for r in expiring.search('Lookup', 5)] == ['Lookup Remote']
+
+def test_index_loaded_during_an_invalidation_is_not_kept(app, seeded, monkeypatch):
+    with app.app_context():
+        index = PrefixIndex(Center)
+        load = index._load
+
+        def racing_load():
+            loaded = load()
+            _add_center('Lookup Racing')
+            index.invalidate()
+            return loaded
+        monkeypatch.setattr(index, '_load', racing_load)
+        assert index.search('Lookup', 5) == []
+        monkeypatch.setattr(index, '_load', load)
+        assert [r['name'] for r in index.search('Lookup', 5)] == ['Lookup Racing']
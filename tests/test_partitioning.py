@@ -0,0 +1,23 @@
+"""Archiving closed financial years on SQLite: shard schema, id reuse, re-runs."""
+
+from datetime import date
+
+from backend import db
+from backend.models import Collection
+from backend.partitioning import archive_closed_years, closed_financial_years
+
+TODAY = date(2026, 10, 19)
+
+def _columns(table):
+    return [(r[1], r[2], r[5]) for r in db.session.execute(db.text(f'PRAGMA table_info("{table}")'))]
+
+def test_shard_keeps_the_schema_and_the_newest_id_stays_hot(app, seeded):
+    with app.app_context():
+        newest = db.session.query(db.func.max(Collection.id)).scalar()
+        archived = archive_closed_years(today=TODAY)
+        assert sum(moved for table, _, moved in archived if table == 'collection')
+        shard = f'collection_fy{archived[0][1]}'
+        assert _columns(shard) == _columns('collection')
+        assert db.session.get(Collection, newest) is not None
+        assert archived[0][1] not in closed_financial_years('collection', today=TODAY)
+        assert all(moved == 0 for _, _, moved in archive_closed_years(today=TODAY))
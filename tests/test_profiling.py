@@ -0,0 +1,49 @@
+"""On-demand cProfile sampling: one profiled request per process, never a failed request."""
+
+import cProfile
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import db
+from backend.profiling import ProfileSession, profiler, start_session, stop_session
+
+@pytest.fixture
+def cprofile_session(app, seeded):
+    with app.app_context():
+        start_session('centers', mode='cprofile', rate=1, minutes=1)
+    yield seeded
+    with app.app_context():
+        stop_session()
+
+def _profiled(client):
+    before = profiler.requests
+    assert client.get('/api/centers').status_code == 200
+    return profiler.requests - before
+
+def test_request_is_served_unprofiled_while_another_is_profiled(cprofile_session):
+    busy = profiler.start_cprofile()
+    try:
+        assert _profiled(cprofile_session) == 0
+    finally:
+        profiler.stop_cprofile(busy)
+    assert _profiled(cprofile_session) == 1
+
+def test_request_is_served_when_another_profiler_is_active(cprofile_session, monkeypatch):
+    def enable(self):
+        raise ValueError('Another profiling tool is already active')
+    monkeypatch.setattr(cProfile.Profile, 'enable', enable)
+    assert _profiled(cprofile_session) == 0
+    monkeypatch.undo()
+    assert _profiled(cprofile_session) == 1
+
+def test_requests_never_poll_for_sessions(app, seeded, query_counter):
+    with app.app_context():
+        # Started by another worker: this process only learns of it from its poller thread
+        now = datetime.utcnow()
+        db.session.add(ProfileSession(route='health_live', mode='cprofile', rate=1, max_requests=10,
+                                      started_at=now, expires_at=now + timedelta(minutes=1)))
+        db.session.commit()
+    with query_counter.measure():
+        assert seeded.get('/api/health/live').status_code == 200
+    assert query_counter.statements == []
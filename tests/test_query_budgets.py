@@ -0,0 +1,81 @@
+"""
+Per-endpoint query budgets.
+
+Each case runs one request against the seeded database and compares the SQL
+statements executed, rows fetched and wall time with tests/query_budgets.json.
+A new N+1 loop or a list that starts loading far more rows fails here before it
+reaches production. When a change legitimately moves a number, rerun with
+--update-query-budgets and commit the updated file with the change.
+"""
+
+import pytest
+
+PERIOD = {'from': '2024-01-01', 'to': '2024-12-31'}
+
+READS = [
+    '/api/user',
+    '/api/centers',
+    '/api/centers?fields=id,name',
+    '/api/centers/lookup?q=Cen',
+    '/api/collections',
+    '/api/collections?fields=id,amount',
+    '/api/sales',
+    '/api/customers',
+    '/api/customers/lookup?q=Cus',
+    '/api/customers/1/ledger',
+    '/api/employees',
+    '/api/access_control_options',
+    '/api/accounts',
+    '/api/center_account_details',
+    '/api/reports/collections/summary',
+    '/api/reports/collections/summary?group_by=center',
+    '/api/reports/sales/summary?group_by=customer',
+    '/api/reports/sales/summary?group_by=month',
+    '/api/payouts',
+    '/api/archive',
+    '/api/schemas',
+    '/api/health/live',
+]
+
+CAD_KEY = '/api/center_account_details/1/2000000001/Center 01/SBIN0000001/Main'
+
+WRITES = [
+    ('POST', '/api/centers', {'name': 'Center 99', 'location': 'Village 9'}),
+    ('PUT', '/api/centers/1', {'name': 'Center 01', 'location': 'Village 8'}),
+    ('DELETE', '/api/centers/20', None),
+    ('POST', '/api/collections', {'amount': 250.75, 'date': '2024-06-15', 'center_id': 3}),
+    ('PUT', '/api/collections/1', {'amount': 300, 'date': '2024-01-01', 'center_id': 1}),
+    ('DELETE', '/api/collections/1', None),
+    ('POST', '/api/sales', {'item': 'Milk', 'quantity': 4, 'price': 45.5, 'date': '2024-06-15', 'customer_id': 2}),
+    ('PUT', '/api/sales/1', {'item': 'Cream', 'quantity': 2, 'price': 60, 'date': '2024-01-01', 'customer_id': 1}),
+    ('DELETE', '/api/sales/1', None),
+    ('POST', '/api/customers', {'name': 'Customer 99', 'mobile_number': '9876599999'}),
+    ('PUT', '/api/customers/1', {'name': 'Customer 01', 'mobile_number': '9876500001', 'bank': 'HDFC'}),
+    ('POST', '/api/accounts', {'name': 'Account 99', 'balance': 0}),
+    ('PUT', '/api/accounts/1', {'name': 'Account 01', 'balance': 1500}),
+    ('DELETE', '/api/accounts/10', None),
+    ('POST', '/api/center_account_details', {'CODE': 99, 'SUB_CODE': 'S99', 'BANK_ACC_NUMBER': '2000000099',
+                                             'NAME': 'Center 99', 'IFSC': 'SBIN0000099', 'BRANCH': 'Main',
+                                             'AMOUNT': 0}),
+    ('PUT', CAD_KEY, {'SUB_CODE': 'S1', 'BANK_ACC_NUMBER': '2000000001', 'NAME': 'Center 01',
+                      'IFSC': 'SBIN0000001', 'BRANCH': 'Main', 'AMOUNT': 500}),
+    ('DELETE', CAD_KEY, None),
+    ('POST', '/api/employees', {'username': 'employee99', 'password': 'secret', 'role': 'employee',
+                                'MobileNumber': '9000099999', 'EmailID': 'employee99@example.com',
+                                'AccessControl': ['SALES']}),
+    ('DELETE', '/api/employees/6', None),
+    ('POST', '/api/payouts', PERIOD),
+]
+
+@pytest.mark.parametrize('path', READS)
+def test_read_budget(measure, path):
+    measure(f'GET {path}', 'GET', path)
+
+@pytest.mark.parametrize('method, path, body', WRITES, ids=[f'{m} {p}' for m, p, _ in WRITES])
+def test_write_budget(measure, method, path, body):
+    measure(f'{method} {path}', method, path, body)
+
+def test_cached_read_budget(measure, seeded):
+    # The second read of a reference list is served from the cache
+    seeded.get('/api/centers')
+    measure('GET /api/centers (cached)', 'GET', '/api/centers')